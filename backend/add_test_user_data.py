@@ -10,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'metro_project.settings')
 django.setup()
 
 from metro.models import User, Journey, Payment
+from metro.seeding import PAYMENT_METHODS, ROUTES
 
 def add_test_user_data():
     try:
@@ -20,23 +21,6 @@ def add_test_user_data():
         print("Test user not found. Please register a user with email testuser@example.com first.")
         return
     
-    # Sample routes
-    routes = [
-        "Uttara North - Motijheel",
-        "Agargaon - Uttara Center",
-        "Pallabi - Agargaon",
-        "Mirpur 10 - Farmgate",
-        "Kazipara - Shahbagh",
-        "Uttara South - Pallabi",
-        "Mirpur 11 - Motijheel",
-        "Uttara Center - Shahbagh",
-        "Agargaon - Kazipara",
-        "Pallabi - Farmgate"
-    ]
-    
-    # Sample payment methods
-    payment_methods = ['bKash', 'Nagad', 'Rocket', 'Card']
-    
     # Create payments for the test user
     payments_data = []
     # Create 5 payments
@@ -48,7 +32,7 @@ def add_test_user_data():
         # Create payment
         payment = Payment.objects.create(
             user=test_user,
-            method=random.choice(payment_methods),
+            method=random.choice(PAYMENT_METHODS),
             reference=f"REF{random.randint(10000000, 99999999)}",
             amount=Decimal(random.choice([60, 100, 120, 150])),
             timestamp=payment_date
@@ -76,7 +60,7 @@ def add_test_user_data():
         # Create journey
         journey = Journey.objects.create(
             user=test_user,
-            route=random.choice(routes),
+            route=random.choice(ROUTES),
             date=journey_date.date(),
             fare=Decimal(random.choice([60, 100, 120, 150])),
             payment=payment
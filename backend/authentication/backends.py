@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+
+class EmailBackend(ModelBackend):
+    """Authenticate with an email address (or a username) in a single query.
+
+    The login form only has an email field, but older accounts may sign in
+    with their username there, so both columns are matched at once and an
+    email match wins.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+        UserModel = get_user_model()
+        candidates = list(UserModel._default_manager.filter(Q(email=email) | Q(username=email))[:2])
+        user = next((u for u in candidates if u.email == email), candidates[0] if candidates else None)
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -1,7 +1,11 @@
+import logging
+
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 from metro.models import User
 
+logger = logging.getLogger(__name__)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -28,23 +32,8 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField()
 
     def validate(self, data):
-        print(f"Login attempt with email: {data['email']}")
-        
-        # First try to find user by email
-        try:
-            user_obj = User.objects.get(email=data['email'])
-            username = user_obj.username
-        except User.DoesNotExist:
-            # If not found by email, use the email as username
-            username = data['email']
-            print(f"User not found by email, trying username: {username}")
-        
-        # Try to authenticate
-        user = authenticate(username=username, password=data['password'])
-        
-        if user and user.is_active:
-            print(f"Authentication successful for user: {username}")
-            return user
-            
-        print(f"Authentication failed for email: {data['email']}")
-        raise serializers.ValidationError("Incorrect Credentials") 
\ No newline at end of file
+        user = authenticate(self.context.get('request'), email=data['email'], password=data['password'])
+        if user is None:
+            logger.info("Authentication failed", extra={'email': data['email']})
+            raise serializers.ValidationError("Incorrect Credentials")
+        return user
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .token_cache import token_cache
+
+User = get_user_model()
+
+# Cached tokens carry a copy of their user, so any stored change to it (a
+# password, is_active, is_admin, the name /api/auth/user/ shows) must evict
+# them. Logins only touch last_login, which nothing reads from the cache.
+UNCACHED_FIELDS = {'last_login'}
+
+
+def cached_fields(update_fields=None):
+    names = {field.attname for field in User._meta.concrete_fields} - UNCACHED_FIELDS
+    return names if update_fields is None else names & set(update_fields)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(pre_save, sender=User)
+def remember_cached_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._cached_fields_changed = False
+    # New users have no tokens yet.
+    if raw or instance.pk is None:
+        return
+    names = sorted(cached_fields(update_fields))
+    if not names:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list(*names).first()
+    instance._cached_fields_changed = previous != tuple(getattr(instance, name) for name in names)
+
+
+@receiver(post_save, sender=User)
+def forget_changed_user_tokens(sender, instance, **kwargs):
+    if getattr(instance, '_cached_fields_changed', False):
+        forget_user_tokens(sender, instance)
+
+
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    keys = Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    token_cache.invalidate_user(instance.pk, keys=list(keys) if token_cache.shared is not None else ())
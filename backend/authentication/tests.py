@@ -1,3 +1,183 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from metro.models import User
+from .hashers import TunableArgon2PasswordHasher
+from .throttling import SlidingWindowCounter, TokenBucketStore, limiter
+from .token_cache import LRUCache, token_cache
+
+
+class LRUCacheTests(APITestCase):
+    def test_evicts_least_recently_used_and_expired_entries(self):
+        now = [0.0]
+        cache = LRUCache(max_size=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 11
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.reset()
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeat_requests_skip_the_token_lookup(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/user/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.data['email'], 'rider@example.com')
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get('/api/auth/user/')
+        self.assertEqual(self.client.post('/api/auth/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_deactivating_user_evicts_cached_token(self):
+        self.client.get('/api/auth/user/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_password_change_evicts_cached_token(self):
+        self.client.get('/api/auth/user/')
+        self.user.set_password('new-pass12345')
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/user/')
+
+    def test_only_changed_user_fields_evict_cached_tokens(self):
+        with mock.patch.object(token_cache, 'invalidate_user') as invalidate_user:
+            # Every login stores last_login alone: no lookup, no eviction.
+            with self.assertNumQueries(1):
+                self.user.save(update_fields=['last_login'])
+            self.user.save()
+            self.assertFalse(invalidate_user.called)
+            self.user.name = 'Renamed'
+            self.user.save()
+            self.assertEqual(invalidate_user.call_count, 1)
+
+
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+
+    def test_email_login_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(email='rider@example.com', password='pass12345'), self.user)
+
+    def test_username_in_email_field_still_works(self):
+        self.assertEqual(authenticate(email='rider', password='pass12345'), self.user)
+
+    def test_rejects_wrong_password_and_inactive_users(self):
+        self.assertIsNone(authenticate(email='rider@example.com', password='wrong'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(authenticate(email='rider@example.com', password='pass12345'))
+
+    def test_login_endpoint(self):
+        response = self.client.post('/api/auth/login/', {'email': 'rider@example.com', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'rider@example.com')
+        response = self.client.post('/api/auth/login/', {'email': 'rider@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(ARGON2_TIME_COST=1, ARGON2_MEMORY_COST=512, ARGON2_PARALLELISM=1)
+    def test_tunable_argon2_reads_cost_from_settings(self):
+        hasher = TunableArgon2PasswordHasher()
+        self.assertEqual((hasher.time_cost, hasher.memory_cost, hasher.parallelism), (1, 512, 1))
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottleStoreTests(TestCase):
+    def test_token_bucket_allows_bursts_then_refills(self):
+        now = [0.0]
+        store = TokenBucketStore(shards=4, clock=lambda: now[0])
+        self.assertEqual([store.hit('a', 3, 3) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(store.hit('a', 3, 3), 1.0)
+        self.assertEqual(store.hit('b', 3, 3), 0)
+        now[0] = 1.0
+        self.assertEqual(store.hit('a', 3, 3), 0)
+        self.assertGreater(store.hit('a', 3, 3), 0)
+
+    def test_idle_buckets_are_evicted_first(self):
+        now = [0.0]
+        store = TokenBucketStore(shards=1, max_keys_per_shard=2, clock=lambda: now[0])
+        store.hit('idle', 10, 10)
+        now[0] = 5.0
+        store.hit('busy', 1, 60)
+        store.hit('new', 1, 60)
+        self.assertEqual(len(store), 2)
+        self.assertGreater(store.hit('busy', 1, 60), 0)
+
+    def test_sliding_window_weighs_the_previous_window(self):
+        now = [100.0]
+        counter = SlidingWindowCounter(LocMemCache('throttle-tests', {}), clock=lambda: now[0])
+        self.assertEqual([counter.hit('a', 4, 10) for _ in range(4)], [0, 0, 0, 0])
+        self.assertGreater(counter.hit('a', 4, 10), 0)
+        # Halfway into the next window, half of the previous five hits (the
+        # rejected one included) still count: 2.5 + 1 fits, 2.5 + 2 doesn't.
+        now[0] = 115.0
+        self.assertEqual(counter.hit('a', 4, 10), 0)
+        self.assertEqual(counter.hit('a', 4, 10), 5.0)
+
+
+@throttle_rates(**{'login': '3/min', 'login-account': '2/min', 'write': '2/min'})
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        limiter.reset()
+        self.addCleanup(limiter.reset)
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+
+    def login(self, email, address='10.0.0.1', **extra):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': 'wrong'}, format='json',
+                                REMOTE_ADDR=address, **extra)
+
+    def test_account_is_throttled_across_addresses_before_any_query_or_hashing(self):
+        self.assertEqual(self.login('rider@example.com', '10.0.0.1').status_code, 400)
+        self.assertEqual(self.login('Rider@Example.com', '10.0.0.2').status_code, 400)
+        with mock.patch('authentication.serializers.authenticate') as check, self.assertNumQueries(0):
+            response = self.login('rider@example.com', '10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        check.assert_not_called()
+        self.assertEqual(self.login('someone@example.com', '10.0.0.3').status_code, 400)
+
+    def test_address_is_throttled_across_accounts_and_the_token_endpoint(self):
+        self.login('a@example.com', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        self.login('b@example.com', HTTP_X_FORWARDED_FOR='2.2.2.2')
+        response = self.client.post('/api/auth/token/', {'username': 'c', 'password': 'wrong'}, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.login('d@example.com').status_code, 429)
+        self.assertEqual(self.login('d@example.com', '10.0.0.2').status_code, 400)
+
+    def test_api_writes_are_budgeted_per_user(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+        for user, expected in ((self.user, [201, 201, 429]), (other, [201])):
+            self.client.force_authenticate(user)
+            statuses = [
+                self.client.post('/api/feedback/', {'user': user.id, 'rating': 5, 'comment': 'ok'}).status_code
+                for _ in expected
+            ]
+            self.assertEqual(statuses, expected)
+        self.assertEqual(self.client.get('/api/feedback/').status_code, 200)
 
-# Create your tests here.
@@ -0,0 +1,207 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    # Lock-striped shards of the in-process bucket table; a power of two.
+    'SHARDS': 64,
+    # Buckets kept per shard before idle ones are dropped.
+    'MAX_KEYS_PER_SHARD': 4096,
+    # Optional django cache alias shared by every worker (e.g. Redis or
+    # Memcached), so a limit holds across processes rather than per process.
+    'SHARED_CACHE': None,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLE', {})}
+
+
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 60)``, in the format of DRF's DEFAULT_THROTTLE_RATES."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """Token buckets keyed by string, in lock-striped shards so threads rarely wait on each other.
+
+    A bucket holds up to ``capacity`` tokens and regains ``capacity`` per
+    ``period``; each hit takes one. Buckets that have refilled completely
+    carry no information and are dropped when a shard grows too large.
+    """
+
+    def __init__(self, shards=64, max_keys_per_shard=4096, clock=time.monotonic):
+        if shards & (shards - 1):
+            raise ValueError('shards must be a power of two.')
+        self.mask = shards - 1
+        self.max_keys_per_shard = max_keys_per_shard
+        self.clock = clock
+        # Each shard: lock, {key: (tokens, updated_at, full_at)}.
+        self.shards = [(threading.Lock(), {}) for _ in range(shards)]
+
+    def hit(self, key, capacity, period):
+        """Take a token; returns 0 when allowed, else the seconds until one is available."""
+        lock, buckets = self.shards[hash(key) & self.mask]
+        per_second = capacity / period
+        with lock:
+            now = self.clock()
+            bucket = buckets.get(key)
+            tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * per_second)
+            if tokens < 1:
+                buckets[key] = (tokens, now, now + (capacity - tokens) / per_second)
+                return (1 - tokens) / per_second
+            tokens -= 1
+            buckets[key] = (tokens, now, now + (capacity - tokens) / per_second)
+            if len(buckets) > self.max_keys_per_shard:
+                self.evict(buckets, now)
+            return 0.0
+
+    def evict(self, buckets, now):
+        for key in [key for key, (_, _, full_at) in buckets.items() if full_at <= now]:
+            del buckets[key]
+        # Still full of active keys (e.g. a spoofed-IP flood): drop the oldest half.
+        if len(buckets) > self.max_keys_per_shard:
+            for key in list(buckets)[:len(buckets) // 2]:
+                del buckets[key]
+
+    def clear(self):
+        for lock, buckets in self.shards:
+            with lock:
+                buckets.clear()
+
+    def __len__(self):
+        return sum(len(buckets) for _, buckets in self.shards)
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window limit kept in a shared django cache.
+
+    Counts hits in fixed windows and weighs the previous window by how much
+    of it still overlaps the sliding one: two cache round trips per hit, and
+    counters that expire on their own.
+    """
+
+    key_prefix = 'throttle:'
+
+    def __init__(self, cache, clock=time.time):
+        self.cache = cache
+        self.clock = clock
+
+    def hit(self, key, limit, period):
+        now = self.clock()
+        window, offset = divmod(now, period)
+        current = f'{self.key_prefix}{key}:{int(window)}'
+        previous = f'{self.key_prefix}{key}:{int(window) - 1}'
+        if self.cache.add(current, 1, period * 2):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(current)
+            except ValueError:
+                # Expired between add() and incr().
+                self.cache.set(current, 1, period * 2)
+                count = 1
+        weight = 1 - offset / period
+        estimate = (self.cache.get(previous) or 0) * weight + count
+        if estimate <= limit:
+            return 0.0
+        return period - offset
+
+
+class Limiter:
+    """Per-process token buckets, backed by the shared counter when ``SHARED_CACHE`` is set.
+
+    The local bucket is checked first: a client over its limit in this
+    process alone is over it everywhere, so floods are turned away without
+    a round trip to the shared cache.
+    """
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            config = get_config()
+            self._local = TokenBucketStore(config['SHARDS'], config['MAX_KEYS_PER_SHARD'])
+        return self._local
+
+    @property
+    def shared(self):
+        alias = get_config()['SHARED_CACHE']
+        return SlidingWindowCounter(caches[alias]) if alias else None
+
+    def hit(self, key, rate):
+        count, period = parse_rate(rate)
+        wait = self.local.hit(key, count, period)
+        if wait:
+            return wait
+        shared = self.shared
+        return shared.hit(key, count, period) if shared is not None else 0.0
+
+    def reset(self):
+        self._local = None
+
+
+limiter = Limiter()
+
+
+class BucketThrottle(BaseThrottle):
+    """DRF throttle over ``limiter``: ``get_scope`` picks the rate, ``get_ident`` whose budget is spent."""
+
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        ident = self.get_ident(request) if rate else None
+        self.delay = limiter.hit(f'{scope}:{ident}', rate) if ident else 0.0
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class EndpointClassThrottle(BucketThrottle):
+    """``read`` or ``write`` budget per user, or per IP address for anonymous requests."""
+
+    def get_scope(self, request, view):
+        return 'read' if request.method in ('GET', 'HEAD', 'OPTIONS') else 'write'
+
+    def get_ident(self, request):
+        user = request.user
+        if user.is_authenticated:
+            return f'user-{user.pk}'
+        return f'ip-{super().get_ident(request)}'
+
+
+class ScopedIPThrottle(BucketThrottle):
+    """The view's ``throttle_scope`` budget per IP address."""
+
+    def get_scope(self, request, view):
+        return getattr(view, 'throttle_scope', None)
+
+
+class ScopedAccountThrottle(BucketThrottle):
+    """The ``<throttle_scope>-account`` budget per account named in the request body.
+
+    Caps guesses against one account however many addresses they come from.
+    The body is parsed here, but nothing is looked up.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        self.account_field = getattr(view, 'throttle_account_field', 'email')
+        return f'{scope}-account' if scope else None
+
+    def get_ident(self, request):
+        value = request.data.get(self.account_field) if hasattr(request.data, 'get') else None
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
@@ -0,0 +1,145 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULTS = {
+    # Entries kept in each worker's in-process LRU.
+    'MAX_SIZE': 10000,
+    # Seconds a worker may keep serving a token without re-checking; this
+    # bounds how stale another worker's view can be after an invalidation.
+    'LOCAL_TTL': 30,
+    # Optional django cache alias (e.g. a shared Redis/Memcached cache)
+    # consulted before the database.
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def detached(token):
+    """Shallow copies of the token and its user, so requests never share instances."""
+    user = copy.copy(token.user)
+    token = copy.copy(token)
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """Two-tier token -> Token(user) cache: per-process LRU, then an optional shared cache."""
+
+    key_prefix = 'authtoken:'
+
+    def __init__(self):
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            config = get_config()
+            self._local = LRUCache(config['MAX_SIZE'], config['LOCAL_TTL'])
+        return self._local
+
+    @property
+    def shared(self):
+        alias = get_config()['SHARED_CACHE']
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        token = self.local.get(key)
+        if token is None and self.shared is not None:
+            token = self.shared.get(self.key_prefix + key)
+            if token is not None:
+                self.local.set(key, token)
+        return detached(token) if token is not None else None
+
+    def set(self, key, token):
+        token = detached(token)
+        self.local.set(key, token)
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, token, get_config()['SHARED_TTL'])
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def invalidate_user(self, user_id, keys=()):
+        self.local.delete_where(lambda token: token.user_id == user_id)
+        if self.shared is not None:
+            self.shared.delete_many([self.key_prefix + key for key in keys])
+
+    def reset(self):
+        self._local = None
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token/user join for recently seen tokens.
+
+    Entries are dropped when the token is deleted (logout) or its user is
+    changed (password change, ``is_active`` flips); see ``authentication.signals``.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is not None:
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, token)
+        return user, token
@@ -1,10 +1,10 @@
 from django.urls import path
-from .views import RegisterAPI, LoginAPI, UserAPI
-from rest_framework.authtoken.views import obtain_auth_token
+from .views import RegisterAPI, LoginAPI, LogoutAPI, UserAPI, ObtainAuthTokenAPI
 
 urlpatterns = [
     path('register/', RegisterAPI.as_view(), name='register'),
     path('login/', LoginAPI.as_view(), name='login'),
+    path('logout/', LogoutAPI.as_view(), name='logout'),
     path('user/', UserAPI.as_view(), name='user'),
-    path('token/', obtain_auth_token, name='token'),
+    path('token/', ObtainAuthTokenAPI.as_view(), name='token'),
 ] 
\ No newline at end of file
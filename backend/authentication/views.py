@@ -2,8 +2,10 @@ from django.shortcuts import render
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
 from metro.models import User
 from .serializers import UserSerializer, RegisterSerializer, LoginSerializer
+from .throttling import ScopedAccountThrottle, ScopedIPThrottle
 from rest_framework.views import APIView
 from rest_framework import status
 import logging
@@ -12,46 +14,69 @@ logger = logging.getLogger(__name__)
 
 # Create your views here.
 
-class RegisterAPI(generics.GenericAPIView):
+class CredentialThrottleMixin:
+    """Rate-limit an endpoint that hashes a submitted password, before any database or hashing work.
+
+    Credentials are what these views check, so no authenticator runs first:
+    throttles see the raw request, and a rejected one costs no query.
+    """
+    authentication_classes = ()
+    throttle_classes = [ScopedIPThrottle, ScopedAccountThrottle]
+
+class RegisterAPI(CredentialThrottleMixin, generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = RegisterSerializer
+    throttle_scope = 'register'
+    throttle_classes = [ScopedIPThrottle]
 
     def post(self, request, *args, **kwargs):
-        logger.info(f"Register request: {request.data}")
         serializer = self.get_serializer(data=request.data)
         
         if not serializer.is_valid():
-            logger.error(f"Registration validation error: {serializer.errors}")
+            logger.info("Registration validation error", extra={'errors': serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         user = serializer.save()
         token, created = Token.objects.get_or_create(user=user)
-        logger.info(f"Registration successful for user: {user.username}")
+        logger.info("Registration successful", extra={'user_id': user.pk})
         return Response({
             "user": UserSerializer(user, context=self.get_serializer_context()).data,
             "token": token.key
         })
 
-class LoginAPI(generics.GenericAPIView):
+class LoginAPI(CredentialThrottleMixin, generics.GenericAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = LoginSerializer
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
-        logger.info(f"Login request: {request.data}")
         serializer = self.get_serializer(data=request.data)
         
         if not serializer.is_valid():
-            logger.error(f"Login validation error: {serializer.errors}")
+            logger.debug("Login validation error", extra={'errors': serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         user = serializer.validated_data
         token, created = Token.objects.get_or_create(user=user)
-        logger.info(f"Login successful for user: {user.username}")
+        logger.debug("Login successful", extra={'user_id': user.pk})
         return Response({
             "user": UserSerializer(user, context=self.get_serializer_context()).data,
             "token": token.key
         })
 
+class LogoutAPI(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        # Deleting the token also evicts it from the token cache.
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ObtainAuthTokenAPI(CredentialThrottleMixin, ObtainAuthToken):
+    # Shares the login budgets, so alternating endpoints doesn't double them.
+    throttle_scope = 'login'
+    throttle_account_field = 'username'
+
 class UserAPI(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
@@ -0,0 +1,67 @@
+"""Cost and payoff of the lost item photo renditions.
+
+Renders a --width x --height phone-sized photo the way metro.images does
+after an upload (EXIF-stripped original plus WebP/JPEG renditions), times
+it, and prints the size of each file next to the upload's.
+
+    python benchmarks/bench_images.py [--width 4032] [--height 3024] [--iterations 5]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, time_calls
+
+setup_django()
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageFilter
+
+from metro.images import render
+
+
+def photo(width, height):
+    """Smooth gradients with sensor-like noise, so it compresses like a real photo rather than a flat fill."""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 24).filter(ImageFilter.GaussianBlur(1))
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=92, exif=exif)
+    return buffer.getvalue()
+
+
+def run(width, height, iterations):
+    data = photo(width, height)
+    digest = hashlib.sha256(data).hexdigest()
+    with tempfile.TemporaryDirectory() as media:
+        storage = FileSystemStorage(location=media)
+        upload = storage.save('lost_items/upload.jpg', ContentFile(data))
+
+        def render_fresh():
+            # Renditions already on disk would be reused, so start from none each time.
+            if storage.exists(f'lost_items/{digest}'):
+                for name in storage.listdir(f'lost_items/{digest}')[1]:
+                    storage.delete(f'lost_items/{digest}/{name}')
+            render(storage, upload, digest)
+
+        report(f'render {width}x{height}', time_calls(render_fresh, iterations, 1))
+        print(f'{"upload":<20} {len(data) / 1024:9.1f} KiB')
+        for name in sorted(storage.listdir(f'lost_items/{digest}')[1]):
+            print(f'{name:<20} {storage.size(f"lost_items/{digest}/{name}") / 1024:9.1f} KiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+    run(args.width, args.height, args.iterations)
@@ -0,0 +1,80 @@
+"""Earliest-arrival journey planning over a full-day timetable.
+
+Loads the MRT Line 6 fixture and a full day of trains in both directions,
+then plans journeys between random station pairs at random times, timing
+the RAPTOR search alone and the whole /api/plan/ request.
+
+    python benchmarks/bench_journey_planner.py [--iterations N] [--headway MINUTES]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from django.core.management import call_command
+from rest_framework.test import APIRequestFactory
+
+from metro.models import Line
+from metro.planner import get_planner
+from metro.timetable import format_time, get_timetable, import_gtfs, invalidate_timetable, synthesize_gtfs
+from metro.views import JourneyPlanView
+
+
+def run(iterations, headway):
+    call_command('loaddata', 'mrt_line6', verbosity=0)
+    counts = import_gtfs(*synthesize_gtfs(Line.objects.get(code='MRT6'), first='06:00', last='22:55', headway=headway))
+    print(f"timetable: {counts['trips']} trips, {counts['stop_times']} stop times")
+
+    invalidate_timetable()
+    start = time.perf_counter()
+    timetable = get_timetable()
+    planner = get_planner(0)
+    print(f"timetable load + planner build: {(time.perf_counter() - start) * 1000:.1f}ms (once per timetable version)")
+
+    rng = random.Random(42)
+    station_count = len(timetable.stations)
+    queries = []
+    while len(queries) < 1024:
+        origin, destination = rng.randrange(station_count), rng.randrange(station_count)
+        if origin != destination:
+            queries.append((origin, destination, rng.randrange(6 * 3600, 22 * 3600)))
+    state = {'i': 0}
+
+    def next_query():
+        state['i'] = (state['i'] + 1) % len(queries)
+        return queries[state['i']]
+
+    def search():
+        return planner.earliest_arrival(*next_query())
+
+    factory = APIRequestFactory()
+    view = JourneyPlanView.as_view()
+    stations = timetable.stations
+
+    def request():
+        origin, destination, after = next_query()
+        response = view(factory.get('/api/plan/', {
+            'from': stations[origin].code, 'to': stations[destination].code,
+            'after': format_time(after), 'date': '2025-04-21',
+        }))
+        assert response.status_code in (200, 404), response.data
+        response.render()
+
+    report('RAPTOR search', time_calls(search, iterations))
+    report('GET /api/plan/', time_calls(request, iterations // 5))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--headway', type=int, default=4, help='Minutes between trains.')
+    args = parser.parse_args()
+    with test_database():
+        run(args.iterations, args.headway)
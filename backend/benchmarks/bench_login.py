@@ -0,0 +1,51 @@
+"""Login throughput of a single worker for each password hasher profile.
+
+    python benchmarks/bench_login.py [--profile default --profile argon2] [--logins N]
+
+Password hashing dominates login cost, so logins/sec per worker is roughly
+1 / hash time; use this to pick ARGON2_* costs that fit the login budget.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from django.conf import settings
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from metro.models import User
+
+
+def bench_profile(name, logins):
+    with override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES[name]):
+        try:
+            user = User.objects.create_user(f'bench-{name}', f'bench-{name}@example.com', 'pass12345', name='Bench')
+        except ValueError as exc:
+            print(f'{name:<10} skipped: {exc}')
+            return
+        client = APIClient()
+        payload = {'email': user.email, 'password': 'pass12345'}
+
+        def login():
+            response = client.post('/api/auth/login/', payload, format='json')
+            assert response.status_code == 200, response.content
+
+        samples = time_calls(login, logins, warmup=2)
+        report(f'login [{name}]', samples)
+        print(f'{name:<10} {len(samples) / sum(samples):8.1f} logins/sec per worker')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', action='append', choices=sorted(settings.PASSWORD_HASHER_PROFILES))
+    parser.add_argument('--logins', type=int, default=50)
+    args = parser.parse_args()
+    with test_database():
+        for profile in args.profile or sorted(settings.PASSWORD_HASHER_PROFILES):
+            bench_profile(profile, args.logins)
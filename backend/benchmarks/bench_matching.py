@@ -0,0 +1,81 @@
+"""Lost report / found item matching at scale.
+
+Seeds --items open items and --reports lost reports, then times building
+the TF-IDF engine from the database, matching one new report against
+every open item (what happens after each new report is saved), and a full
+``match_lost_items`` rebuild.
+
+    python benchmarks/bench_matching.py [--items 30000] [--reports 5000] [--iterations 200]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from metro.matching import MatchEngine, report_vector, rematch_all
+from metro.models import LostItem, User, UserLostReport
+
+COLOURS = ['black', 'blue', 'red', 'brown', 'grey', 'green', 'white', 'yellow', 'silver', 'pink']
+THINGS = ['umbrella', 'wallet', 'phone', 'backpack', 'glasses', 'laptop', 'watch', 'keys', 'jacket', 'bottle',
+          'headphones', 'book', 'charger', 'scarf', 'cap', 'card holder', 'lunch box', 'tablet', 'ring', 'bag']
+DETAILS = ['leather', 'cracked screen', 'with ID card', 'folding', 'brand new', 'worn', 'with stickers',
+           'name tag inside', 'zipped pocket', 'scratched', 'metal', 'plastic', 'cotton', 'waterproof',
+           'Samsung', 'Apple', 'Casio', 'Bata', 'Aarong', 'handmade', 'striped', 'with keychain']
+STATIONS = ['Uttara North', 'Uttara Center', 'Uttara South', 'Pallabi', 'Mirpur 11', 'Mirpur 10', 'Kazipara',
+            'Shewrapara', 'Agargaon', 'Bijoy Sarani', 'Farmgate', 'Karwan Bazar', 'Shahbag', 'Dhaka University',
+            'Bangladesh Secretariat', 'Motijheel']
+
+
+def description(rng):
+    return f'{rng.choice(COLOURS)}, {rng.choice(DETAILS)}, {rng.choice(DETAILS)}'
+
+
+def run(items, reports, iterations):
+    rng = random.Random(42)
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    LostItem.objects.bulk_create([
+        LostItem(title=f'{rng.choice(COLOURS).title()} {rng.choice(THINGS)}', description=description(rng),
+                 location=f'{rng.choice(STATIONS)} Station', status='unclaimed', posted_by=user)
+        for _ in range(items)
+    ], batch_size=2000)
+    UserLostReport.objects.bulk_create([
+        UserLostReport(user=user, title=f'Lost {rng.choice(THINGS)}',
+                       description=f'{description(rng)}, near {rng.choice(STATIONS)}', contact='017')
+        for _ in range(reports)
+    ], batch_size=2000)
+
+    start = time.perf_counter()
+    engine = MatchEngine.from_database()
+    print(f'engine build ({items} items, {reports} reports): {time.perf_counter() - start:.2f}s, '
+          f'{len(engine.columns)} distinct terms')
+
+    queries = [report_vector(f'Lost {rng.choice(THINGS)}', f'{description(rng)}, near {rng.choice(STATIONS)}')
+               for _ in range(256)]
+    state = {'i': 0}
+
+    def match_one():
+        state['i'] = (state['i'] + 1) % len(queries)
+        return engine.top('item', queries[state['i']])
+
+    report('match one new report', time_calls(match_one, iterations, 10))
+
+    start = time.perf_counter()
+    count = rematch_all()
+    print(f'match_lost_items: {count} matches in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=30000)
+    parser.add_argument('--reports', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    with test_database():
+        run(args.items, args.reports, args.iterations)
@@ -0,0 +1,75 @@
+"""Overhead of the metrics middleware.
+
+Times a small API read (``/api/lines/``) and a page of journeys through the
+test client with MetricsMiddleware in place and with it removed, alternating
+between the two in batches, then the bookkeeping alone: one middleware ``finish()`` and one wrapped query.
+
+    python benchmarks/bench_metrics.py [--iterations 2000]
+"""
+import argparse
+import os
+import sys
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from metro.metrics import MetricsMiddleware, RequestMetrics, record_query
+from metro.models import Journey, Line, User
+
+
+def run(iterations):
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    Line.objects.create(code='MRT6', name='MRT Line 6', color='#009e4f')
+    Journey.objects.bulk_create([
+        Journey(user=user, route='Pallabi - Agargaon', date=date(2025, 4, 1 + i % 28), fare=Decimal('60'))
+        for i in range(50)
+    ])
+    without = [name for name in settings.MIDDLEWARE if name != 'metro.metrics.MetricsMiddleware']
+    clients = {}
+    for label, middleware in (('with metrics', settings.MIDDLEWARE), ('without', without)):
+        # A client builds its middleware chain on its first request and keeps it.
+        with override_settings(MIDDLEWARE=middleware):
+            clients[label] = APIClient()
+            clients[label].force_authenticate(user)
+            clients[label].get('/api/lines/')
+    # Response caching would skip the work being measured.
+    with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+        for path in ('/api/lines/', '/api/journeys/?fields=id,route,fare'):
+            samples = {label: [] for label in clients}
+            # Interleaved, so drift in the machine's speed hits both alike.
+            for _ in range(iterations // 100):
+                for label, client in clients.items():
+                    samples[label] += time_calls(lambda: client.get(path), 100, 5)
+            results = {label: summarize(values) for label, values in samples.items()}
+            for label, result in results.items():
+                print(f'{path:<40} {label:<13} p50 {result["p50_us"]:8.1f}us  mean {result["mean_us"]:8.1f}us')
+            print(f'{"":<40} overhead      p50 {results["with metrics"]["p50_us"] - results["without"]["p50_us"]:8.1f}us')
+
+    request = RequestFactory().get('/api/lines/')
+    request.resolver_match = None
+    middleware = MetricsMiddleware(lambda request: HttpResponse(b'{}'))
+    response = HttpResponse(b'{}')
+    metrics = RequestMetrics()
+    metrics.add('serialize', 0.001)
+    report('finish() bookkeeping', time_calls(lambda: middleware.finish(request, response, metrics, 0.01), iterations * 10))
+    execute = lambda sql, params, many, context: None
+    report('query wrapper, outside a request', time_calls(lambda: record_query(execute, '', (), False, {}), iterations * 10))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    with test_database():
+        run(args.iterations)
@@ -0,0 +1,74 @@
+"""Next-N departures: in-memory DepartureIndex vs. an indexed database query.
+
+Loads the MRT Line 6 fixture and a full-day timetable in both directions
+(weekday and weekend services), then asks for the next trains from random
+stations at random times.
+
+    python benchmarks/bench_next_departures.py [--iterations N] [--headway MINUTES]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from django.core.management import call_command
+
+from metro.models import Line, Station, StopTime
+from metro.timetable import (
+    get_timetable, import_gtfs, invalidate_timetable, parse_time, synthesize_gtfs,
+)
+
+
+def run(iterations, headway, limit):
+    call_command('loaddata', 'mrt_line6', verbosity=0)
+    line = Line.objects.get(code='MRT6')
+    weekday = synthesize_gtfs(line, 'WEEKDAY', ('sunday', 'monday', 'tuesday', 'wednesday', 'thursday'),
+                              first='06:00', last='22:55', headway=headway)
+    weekend = synthesize_gtfs(line, 'WEEKEND', ('friday', 'saturday'), first='07:00', last='22:55',
+                              headway=headway * 2)
+    counts = import_gtfs(*(a + b for a, b in zip(weekday, weekend)))
+    print(f"timetable: {counts['trips']} trips, {counts['stop_times']} stop times")
+
+    invalidate_timetable()
+    stations = list(Station.objects.all())
+    rng = random.Random(42)
+    first, last = parse_time('05:30'), parse_time('23:00')
+    queries = [(rng.choice(stations), rng.randrange(first, last)) for _ in range(1024)]
+    state = {'i': 0}
+
+    def next_query():
+        state['i'] = (state['i'] + 1) % len(queries)
+        return queries[state['i']]
+
+    def from_index():
+        station, after = next_query()
+        return get_timetable().next_departures(station, 0, after, limit)
+
+    def from_database():
+        station, after = next_query()
+        return list(
+            StopTime.objects.filter(station=station, departure__gte=after, trip__service__code='WEEKDAY')
+            .select_related('trip__line').order_by('departure')[:limit]
+        )
+
+    get_timetable().index(0)
+    database = report('indexed SQL query', time_calls(from_database, iterations // 10))
+    in_memory = report('DepartureIndex', time_calls(from_index, iterations))
+    print(f"DepartureIndex: {1e6 / in_memory['mean_us']:,.0f} queries/sec per worker, "
+          f"{database['p50_us'] / in_memory['p50_us']:.0f}x faster than SQL at p50")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50000)
+    parser.add_argument('--headway', type=int, default=4, help='Weekday minutes between trains.')
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+    with test_database():
+        run(args.iterations, args.headway, args.limit)
@@ -0,0 +1,69 @@
+"""Cost of the slow-query log and of a sampled request.
+
+Times a page of journeys through the test client with profiling off, with
+the slow-query log on (threshold not reached), and with every request
+sampled, alternating between them in batches. Then times the query
+wrapper alone, with the log off.
+
+    python benchmarks/bench_profiling.py [--iterations 2000] [--interval 0.005]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from metro.models import Journey, User
+from metro.profiling import log_slow_query
+
+
+def run(iterations, interval):
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    Journey.objects.bulk_create([
+        Journey(user=user, route='Pallabi - Agargaon', date=date(2025, 4, 1 + i % 28), fare=Decimal('60'))
+        for i in range(50)
+    ])
+    client = APIClient()
+    client.force_authenticate(user)
+    directory = tempfile.mkdtemp()
+    modes = {
+        'off': {},
+        'slow-query log': {'PROFILE_SLOW_QUERY_MS': 1000},
+        'sampled': {'PROFILE_SAMPLE_RATE': 1, 'PROFILE_SAMPLE_INTERVAL': interval, 'PROFILE_DIR': directory},
+    }
+    path = '/api/journeys/?fields=id,route,fare'
+    samples = {label: [] for label in modes}
+    # Response caching would skip the work being measured.
+    with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+        client.get(path)
+        for _ in range(iterations // 100):
+            for label, overrides in modes.items():
+                with override_settings(**overrides):
+                    samples[label] += time_calls(lambda: client.get(path), 100, 5)
+    for label, values in samples.items():
+        result = summarize(values)
+        print(f'{path:<40} {label:<15} p50 {result["p50_us"]:8.1f}us  mean {result["mean_us"]:8.1f}us')
+    dumps = len(os.listdir(directory))
+    print(f'{dumps} of {len(samples["sampled"]) + 5 * (iterations // 100)} sampled requests got a sample')
+
+    execute = lambda sql, params, many, context: None
+    report('query wrapper, log off', time_calls(lambda: log_slow_query(execute, '', (), False, {}), iterations * 10))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=0.005)
+    args = parser.parse_args()
+    with test_database():
+        run(args.iterations, args.interval)
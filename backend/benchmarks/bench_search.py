@@ -0,0 +1,86 @@
+"""Lost item search as the table grows: full-text index vs. the admin's LIKE scan.
+
+Grows the lost item table in steps up to --rows random items, rebuilding
+the index after each bulk insert, and times ``?q=``-style searches for the
+top 50 matches against ``icontains`` filters over the same columns, for
+rare words (an owner's name) and for common ones (colours, stations).
+
+    python benchmarks/bench_search.py [--rows 100000] [--iterations 200]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from django.db.models import Q
+
+from metro.models import LostItem, User
+from metro.search import SEARCH_INDEXES, search
+
+COLOURS = ['black', 'blue', 'red', 'brown', 'grey', 'green', 'white', 'yellow', 'silver', 'pink']
+THINGS = ['umbrella', 'wallet', 'phone', 'backpack', 'glasses', 'laptop', 'watch', 'keys', 'jacket', 'bottle',
+          'headphones', 'book', 'charger', 'scarf', 'cap', 'card holder', 'lunch box', 'tablet', 'ring', 'bag']
+DETAILS = ['leather', 'cracked screen', 'with ID card', 'folding', 'brand new', 'worn', 'with stickers',
+           'name tag inside', 'zipped pocket', 'scratched', 'metal', 'plastic', 'cotton', 'waterproof']
+STATIONS = ['Uttara North', 'Uttara Center', 'Uttara South', 'Pallabi', 'Mirpur 11', 'Mirpur 10', 'Kazipara',
+            'Shewrapara', 'Agargaon', 'Bijoy Sarani', 'Farmgate', 'Karwan Bazar', 'Shahbag', 'Dhaka University',
+            'Bangladesh Secretariat', 'Motijheel']
+# Owner names printed on some items: each is rare, like most real searches.
+_syllables = random.Random(7)
+NAMES = [''.join(_syllables.choice('bcdfghjklmnprstvz') + _syllables.choice('aeiou') for _ in range(3))
+         for _ in range(5000)]
+COMMON_QUERIES = ['umbrella', 'black wallet', 'farmgate', 'cracked phone', 'leather bag', 'silver watch', 'keys uttara']
+
+
+def seed(user, count, rng):
+    LostItem.objects.bulk_create([
+        LostItem(
+            title=f'{rng.choice(COLOURS).title()} {rng.choice(THINGS)}',
+            description=f'{rng.choice(DETAILS)}, {rng.choice(DETAILS)}, found on the {rng.choice(["up", "down"])} '
+                        f'platform' + (f', name tag says {rng.choice(NAMES)}' if rng.random() < 0.2 else ''),
+            location=f'{rng.choice(STATIONS)} Station', status='unclaimed', posted_by=user,
+        )
+        for _ in range(count)
+    ], batch_size=2000)
+
+
+def like_search(text, limit=50):
+    condition = Q()
+    for word in text.split():
+        condition &= Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word)
+    return list(LostItem.objects.filter(condition).order_by('-id').values_list('id', flat=True)[:limit])
+
+
+def run(rows, iterations):
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    rng = random.Random(42)
+    size = 0
+    for target in (rows // 100, rows // 10, rows):
+        seed(user, target - size, rng)
+        size = target
+        SEARCH_INDEXES[LostItem].rebuild()
+        print(f'{size} lost items')
+        for label, queries in (('rare word', NAMES[:200]), ('common words', COMMON_QUERIES)):
+            state = {'i': 0}
+
+            def next_query():
+                state['i'] = (state['i'] + 1) % len(queries)
+                return queries[state['i']]
+
+            report(f'  {label}: full-text index', time_calls(lambda: search(LostItem, next_query()), iterations, 20))
+            report(f'  {label}: LIKE scan', time_calls(lambda: like_search(next_query()), max(iterations // 10, 10), 2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    with test_database():
+        run(args.rows, args.iterations)
@@ -0,0 +1,79 @@
+"""Serializing a large journey list: ModelSerializer + JSONRenderer vs. ValuesReader + ORJSONRenderer.
+
+Seeds --rows journeys (half of them paid) for one rider and times each
+stage on the whole list: fetching and serializing, rendering to JSON, and
+both together, the way a list response (or an export) builds its body.
+
+    python benchmarks/bench_serializers.py [--rows 10000] [--iterations 20]
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from metro.models import Journey, Payment, User
+from metro.renderers import ORJSONRenderer
+from metro.serializers import JourneySerializer, values_reader
+
+
+def run(rows, iterations):
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    payments = Payment.objects.bulk_create([
+        Payment(user=user, method='bKash', reference=f'BENCH-{i}', amount=Decimal('60.00'))
+        for i in range(rows // 2)
+    ])
+    Journey.objects.bulk_create([
+        Journey(user=user, route='Uttara North - Agargaon', date=date(2025, 1, 1) + timedelta(days=i % 365),
+                fare=Decimal('60.00'), payment=payments[i] if i < len(payments) else None)
+        for i in range(rows)
+    ])
+    queryset = Journey.objects.filter(user=user).order_by('-date', '-id')
+    request = Request(APIRequestFactory().get('/api/journeys/'))
+    reader = values_reader(JourneySerializer)
+    names = reader.field_names(request)
+
+    def serializer_data():
+        return JourneySerializer(queryset, many=True, context={'request': request}).data
+
+    def reader_data():
+        return reader.serialize(reader.rows(queryset, names), names, request)
+
+    assert serializer_data() == reader_data()
+    serialized, read = serializer_data(), reader_data()
+    drf_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+    print(f'{rows} journeys, times per full list')
+    results = {
+        'serialize: ModelSerializer': report('serialize: ModelSerializer', time_calls(serializer_data, iterations, 2)),
+        'serialize: ValuesReader': report('serialize: ValuesReader', time_calls(reader_data, iterations, 2)),
+        'render: JSONRenderer': report('render: JSONRenderer',
+                                       time_calls(lambda: drf_renderer.render(serialized), iterations, 2)),
+        'render: ORJSONRenderer': report('render: ORJSONRenderer',
+                                         time_calls(lambda: orjson_renderer.render(read), iterations, 2)),
+        'both: before': report('both: before', time_calls(
+            lambda: drf_renderer.render(serializer_data()), iterations, 2)),
+        'both: after': report('both: after', time_calls(
+            lambda: orjson_renderer.render(reader_data()), iterations, 2)),
+    }
+    speedup = results['both: before']['mean_us'] / results['both: after']['mean_us']
+    print(f'speedup: {speedup:.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+    with test_database():
+        run(args.rows, args.iterations)
@@ -0,0 +1,94 @@
+"""Overhead of a throttle check, and what a rejected login costs next to a real attempt.
+
+Times the in-process token bucket (hot key, and a flood of distinct keys
+that forces eviction), the limiter with a shared cache behind it, a full DRF
+throttle check, and bucket throughput from --threads threads with one
+shard vs. the default 64. Then posts wrong-password logins through the
+test client, once with the account's budget left and once without.
+
+    python benchmarks/bench_throttle.py [--iterations 100000] [--threads 8]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from django.conf import settings
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from authentication.throttling import Limiter, ScopedIPThrottle, TokenBucketStore, limiter
+from authentication.views import LoginAPI
+from metro.models import User
+
+
+def threaded_throughput(store, threads, hits):
+    def worker(offset):
+        for i in range(hits):
+            store.hit(f'ip-{offset}-{i % 512}', 1_000_000, 1)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return threads * hits / (time.perf_counter() - start)
+
+
+def run(iterations, threads):
+    store = TokenBucketStore()
+    report('bucket, hot key', time_calls(lambda: store.hit('ip-10.0.0.1', 1_000_000, 1), iterations))
+    counter = iter(range(10 ** 9))
+    report('bucket, distinct keys (evicting)',
+           time_calls(lambda: store.hit(f'ip-{next(counter)}', 10, 60), iterations))
+
+    caches = {**settings.CACHES, 'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    with override_settings(CACHES=caches, THROTTLE={'SHARED_CACHE': 'throttle'}):
+        shared = Limiter()
+        report('limiter + shared locmem counter',
+               time_calls(lambda: shared.hit('ip-10.0.0.1', '1000000/s'), iterations))
+
+    request = LoginAPI().initialize_request(APIRequestFactory().post('/api/auth/login/', REMOTE_ADDR='10.0.0.1'))
+    view = LoginAPI()
+    with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {'login': '1000000/s'}}):
+        report('DRF ScopedIPThrottle.allow_request',
+               time_calls(lambda: ScopedIPThrottle().allow_request(request, view), iterations))
+
+    for shards in (1, 64):
+        rate = threaded_throughput(TokenBucketStore(shards=shards), threads, iterations // threads)
+        print(f'{threads} threads, {shards:>2} shard(s): {rate / 1000:8.0f}k checks/s')
+
+    with test_database():
+        User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        client = Client()
+
+        def login():
+            return client.post('/api/auth/login/', {'email': 'rider@example.com', 'password': 'wrong'},
+                               content_type='application/json')
+
+        unlimited = {'login': '1000000/s', 'login-account': '1000000/s'}
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': unlimited}):
+            limiter.reset()
+            report('login, wrong password (hashed)', time_calls(login, 20, 2))
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': {**unlimited, 'login-account': '1/d'}}):
+            limiter.reset()
+            login()
+            assert login().status_code == 429
+            report('login, account throttled (429)', time_calls(login, 2000, 50))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    run(args.iterations, args.threads)
@@ -0,0 +1,41 @@
+"""Per-request cost of token authentication, with and without the token cache.
+
+    python benchmarks/bench_token_auth.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import report, setup_django, test_database, time_calls
+
+setup_django()
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from authentication.token_cache import CachedTokenAuthentication, token_cache
+from metro.models import User
+
+
+def run(iterations):
+    user = User.objects.create_user('bench', 'bench@example.com', 'pass12345', name='Bench')
+    token = Token.objects.create(user=user)
+    request = Request(APIRequestFactory().get('/api/journeys/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+
+    token_cache.reset()
+    baseline = report('TokenAuthentication', time_calls(lambda: TokenAuthentication().authenticate(request), iterations))
+    cached = report('CachedTokenAuthentication (warm)',
+                    time_calls(lambda: CachedTokenAuthentication().authenticate(request), iterations))
+    print(f"speedup at p50: {baseline['p50_us'] / cached['p50_us']:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    with test_database():
+        run(args.iterations)
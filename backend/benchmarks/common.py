@@ -0,0 +1,65 @@
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'metro_project.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Run against a throwaway test database so db.sqlite3 is never touched."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    # Like the test runner: DEBUG would record every query and skew timings.
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def time_calls(func, iterations, warmup=100):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean_us': statistics.fmean(samples) * 1e6,
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p95_us': percentile(samples, 95) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+    }
+
+
+def report(name, samples):
+    stats = summarize(samples)
+    print(f"{name:<40} mean {stats['mean_us']:9.1f}us  p50 {stats['p50_us']:9.1f}us  "
+          f"p95 {stats['p95_us']:9.1f}us  p99 {stats['p99_us']:9.1f}us")
+    return stats
@@ -0,0 +1,398 @@
+"""Throughput, latency and queries per request for every API route, saved as a JSON baseline.
+
+Seeds a database with metro.seeding, by default 100k riders and 10M
+journeys. That takes a while, so pass --db to keep the file and reuse it
+on later runs. Then starts one server process and loads each endpoint in
+turn: --requests requests, sent over --clients concurrent keep-alive
+connections. The endpoints are every router route in metro/urls.py (list,
+detail, their extra actions, and writes), the fare, departure and planner
+views, and the auth routes.
+
+Authenticated requests rotate through --riders riders, so a rider's
+repeated reads hit the response cache as they would in production. The
+query count of each request comes from the Server-Timing header that
+MetricsMiddleware adds. The server runs with every throttle rate raised,
+so load is not rejected as abuse.
+
+    python benchmarks/load_api.py [--users 100000] [--journeys 10000000] [--workers 4]
+                                  [--db load.sqlite3]
+                                  [--clients 16] [--requests 1000] [--only journeys-,auth-]
+                                  [--output results.json] [--baseline baseline.json]
+    python benchmarks/load_api.py --compare baseline.json results.json [--tolerance 0.15]
+
+With --baseline, or with --compare for two saved runs, endpoints that got
+slower or less throughput beyond --tolerance, that run more queries, or
+that fail more often are listed, and the exit status is 1. The default
+server is Django's threaded runserver; pass e.g.
+--server-command "gunicorn metro_project.wsgi:application --bind 127.0.0.1:{port} --workers 4"
+for production-like numbers.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BACKEND_DIR, percentile
+from benchmarks.load_asgi import free_port, wait_for_port
+
+SERVER_COMMAND = f'{shlex.quote(sys.executable)} manage.py runserver 127.0.0.1:{{port}} --noreload'
+UNTHROTTLED = {
+    f'THROTTLE_{scope}_RATE': '1000000/s' for scope in ('READ', 'WRITE', 'LOGIN', 'LOGIN_ACCOUNT', 'REGISTER')
+}
+QUICKACK = getattr(socket, 'TCP_QUICKACK', None)
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# name, method, path, JSON body, pool of identities the requests rotate through.
+# ``{...}`` in the path or in string body values is filled from the pool entry.
+ENDPOINTS = [
+    ('users-list', 'GET', '/api/users/', None, 'riders'),
+    ('users-detail', 'GET', '/api/users/{user}/', None, 'riders'),
+    ('journeys-list', 'GET', '/api/journeys/', None, 'riders'),
+    ('journeys-detail', 'GET', '/api/journeys/{journey}/', None, 'riders'),
+    ('journeys-summary', 'GET', '/api/journeys/summary/', None, 'riders'),
+    ('journeys-create', 'POST', '/api/journeys/',
+     {'user': '{user}', 'route': 'Pallabi - Agargaon', 'date': '2025-04-21'}, 'riders'),
+    ('payments-list', 'GET', '/api/payments/', None, 'riders'),
+    ('payments-detail', 'GET', '/api/payments/{payment}/', None, 'riders'),
+    ('payments-create', 'POST', '/api/payments/',
+     {'user': '{user}', 'method': 'bKash', 'reference': 'LOAD-{run}-{n}', 'amount': '60.00'}, 'riders'),
+    ('lost-items-list', 'GET', '/api/lost-items/', None, 'anonymous'),
+    ('lost-items-detail', 'GET', '/api/lost-items/{item}/', None, 'anonymous'),
+    ('lost-items-search', 'GET', '/api/lost-items/?q=black+umbrella', None, 'anonymous'),
+    ('lost-reports-list', 'GET', '/api/lost-reports/', None, 'reporters'),
+    ('lost-reports-detail', 'GET', '/api/lost-reports/{report}/', None, 'reporters'),
+    ('lost-reports-matches', 'GET', '/api/lost-reports/{report}/matches/', None, 'reporters'),
+    ('lost-item-matches-list', 'GET', '/api/lost-item-matches/', None, 'admin'),
+    ('feedback-list', 'GET', '/api/feedback/', None, 'riders'),
+    ('feedback-detail', 'GET', '/api/feedback/{feedback}/', None, 'riders'),
+    ('feedback-create', 'POST', '/api/feedback/',
+     {'user': '{user}', 'rating': 4, 'comment': 'Clean and on time.'}, 'riders'),
+    ('complaints-list', 'GET', '/api/complaints/', None, 'complainers'),
+    ('complaints-detail', 'GET', '/api/complaints/{complaint}/', None, 'complainers'),
+    ('complaints-create', 'POST', '/api/complaints/',
+     {'user': '{user}', 'title': 'Broken gate', 'description': 'Gate 2 is stuck.', 'urgency': 'low'}, 'riders'),
+    ('lines-list', 'GET', '/api/lines/', None, 'anonymous'),
+    ('lines-detail', 'GET', '/api/lines/{line}/', None, 'anonymous'),
+    ('stations-list', 'GET', '/api/stations/', None, 'anonymous'),
+    ('stations-detail', 'GET', '/api/stations/{station}/', None, 'anonymous'),
+    ('fares', 'GET', '/api/fares/?from=UTN&to=MTJ', None, 'anonymous'),
+    ('departures', 'GET', '/api/departures/?station=AGA&after=08:00&date=2025-04-21', None, 'anonymous'),
+    ('plan', 'GET', '/api/plan/?from=UTN&to=MTJ&after=08:00&date=2025-04-21', None, 'anonymous'),
+    ('auth-user', 'GET', '/api/auth/user/', None, 'riders'),
+    ('auth-register', 'POST', '/api/auth/register/',
+     {'username': 'load-{run}-{n}', 'email': 'load-{run}-{n}@example.com', 'password': 'pass12345',
+      'name': 'Load'}, 'anonymous'),
+    ('auth-login', 'POST', '/api/auth/login/', {'email': '{email}', 'password': 'pass12345'}, 'accounts'),
+    ('auth-token', 'POST', '/api/auth/token/', {'username': '{username}', 'password': 'pass12345'}, 'accounts'),
+    # Each logout ends a session that a login (not timed) opened just before.
+    ('auth-logout', 'POST', '/api/auth/logout/', None, 'accounts'),
+]
+# Endpoints that hash a password run a tenth of the requests.
+HASHING = {'auth-register', 'auth-login', 'auth-token', 'auth-logout'}
+
+
+def prepare(args, results):
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from metro.models import Complaint, Feedback, Journey, Line, LostItem, Payment, Station, User, UserLostReport
+    from metro.seeding import PASSWORD, seed_riders
+    from metro.timetable import import_gtfs, synthesize_gtfs
+
+    call_command('migrate', verbosity=0)
+    if not Line.objects.exists():
+        call_command('loaddata', 'mrt_line6', verbosity=0)
+        import_gtfs(*synthesize_gtfs(Line.objects.get(code='MRT6')))
+    if not User.objects.filter(username__startswith='rider').exists():
+        start = time.perf_counter()
+
+        def progress(riders, journeys):
+            elapsed = time.perf_counter() - start
+            print(f'\rseeded {riders} riders, {journeys} journeys ({journeys / elapsed:.0f} journeys/s)',
+                  end='', flush=True)
+
+        seed_riders(args.users, max(1, args.journeys // args.users), seed=args.seed, workers=args.workers,
+                    progress=progress)
+        print()
+        call_command('rebuild_search_index', verbosity=0)
+    admin = User.objects.filter(username='load-admin').first() or User.objects.create_user(
+        'load-admin', 'load-admin@example.com', PASSWORD, name='Load Admin', is_admin=True)
+
+    def token(user_id):
+        return Token.objects.get_or_create(user_id=user_id)[0].key
+
+    riders = list(User.objects.filter(username__startswith='rider').order_by('pk').values_list('pk', flat=True))
+    public = {
+        'item': LostItem.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'line': Line.objects.values_list('pk', flat=True).first(),
+        'station': Station.objects.values_list('pk', flat=True).first(),
+    }
+    feedback = Feedback.objects.values_list('pk', flat=True).first()
+    pools = {'anonymous': [public], 'admin': [{**public, 'token': token(admin.pk)}], 'riders': [], 'accounts': []}
+    for user_id in riders[:args.riders]:
+        pools['riders'].append({
+            **public, 'user': user_id, 'token': token(user_id), 'feedback': feedback,
+            'journey': Journey.objects.filter(user_id=user_id).values_list('pk', flat=True).first(),
+            'payment': Payment.objects.filter(user_id=user_id).values_list('pk', flat=True).first(),
+        })
+    pools['reporters'] = [
+        {'token': token(user_id), 'report': pk}
+        for pk, user_id in UserLostReport.objects.order_by('pk').values_list('pk', 'user_id')[:args.riders]
+    ]
+    pools['complainers'] = [
+        {'token': token(user_id), 'complaint': pk}
+        for pk, user_id in Complaint.objects.order_by('pk').values_list('pk', 'user_id')[:args.riders]
+    ]
+    # Logins and logouts use riders of their own, whose tokens come and go.
+    for user_id, username, email in User.objects.filter(pk__in=riders[-args.riders:]).values_list(
+            'pk', 'username', 'email'):
+        pools['accounts'].append({'user': user_id, 'username': username, 'email': email})
+    results.put({
+        'pools': pools,
+        'users': User.objects.count(),
+        'journeys': Journey.objects.count(),
+    })
+
+
+def fill(value, context):
+    if isinstance(value, str):
+        return value.format(**context)
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    return value
+
+
+def send(connection, method, path, body, token):
+    headers = {'Accept': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Token {token}'
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode()
+        headers['Content-Type'] = 'application/json'
+    connection.request(method, path, payload, headers)
+    if QUICKACK is not None:
+        # runserver writes headers and body separately; with delayed ACKs on
+        # this side, Nagle holds the body back ~40ms on every keep-alive request.
+        connection.sock.setsockopt(socket.IPPROTO_TCP, QUICKACK, 1)
+    response = connection.getresponse()
+    content = response.read()
+    return response.status, response.getheader('Server-Timing', ''), content
+
+
+def load_endpoint(port, endpoint, pool, total, clients, run):
+    name, method, path, body, _ = endpoint
+    counter = itertools.count()
+    latencies, queries, errors = [], [], [0]
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            while (n := next(counter)) < total:
+                context = {**pool[n % len(pool)], 'n': n, 'run': run}
+                token = context.get('token')
+                if name == 'auth-logout':
+                    status, _, content = send(connection, 'POST', '/api/auth/login/',
+                                              {'email': context['email'], 'password': 'pass12345'}, None)
+                    token = json.loads(content)['token'] if status == 200 else None
+                start = time.perf_counter()
+                try:
+                    status, timing, _ = send(connection, method, fill(path, context), fill(body, context), token)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    status, timing = None, ''
+                elapsed = time.perf_counter() - start
+                match = QUERIES.search(timing)
+                with lock:
+                    if status is None or status >= 400:
+                        errors[0] += 1
+                    else:
+                        latencies.append(elapsed)
+                        if match:
+                            queries.append(int(match.group(1)))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        return {'requests': total, 'errors': errors[0]}
+    return {
+        'requests': total,
+        'errors': errors[0],
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'queries': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args, db_path):
+    # Query counts are read from the Server-Timing header, which is off by default without DEBUG.
+    os.environ.update({'DB_ENGINE': 'sqlite', 'DB_NAME': db_path, 'DB_REPLICAS': 'none',
+                       'METRICS_SERVER_TIMING': '1', **UNTHROTTLED})
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    setup = context.Process(target=prepare, args=(args, results))
+    setup.start()
+    seeded = results.get()
+    setup.join()
+    pools = seeded['pools']
+
+    endpoints = [endpoint for endpoint in ENDPOINTS
+                 if not args.only or endpoint[0].startswith(tuple(args.only.split(',')))]
+    port = free_port()
+    process = subprocess.Popen(shlex.split(args.server_command.format(port=port)), cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_id = f'{int(time.time())}'
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'server': args.server_command,
+            'clients': args.clients,
+            'users': seeded['users'],
+            'journeys': seeded['journeys'],
+        },
+        'endpoints': {},
+    }
+    try:
+        wait_for_port(port, process)
+        for endpoint in endpoints:
+            name = endpoint[0]
+            total = max(args.clients, args.requests // 10 if name in HASHING else args.requests)
+            # A short warm-up fills per-process caches (fare matrix, timetable, ...).
+            load_endpoint(port, endpoint, pools[endpoint[4]], min(total, 20), 1, f'{run_id}w')
+            result = load_endpoint(port, endpoint, pools[endpoint[4]], total, args.clients, run_id)
+            report['endpoints'][name] = result
+            print_result(name, result)
+    finally:
+        process.terminate()
+        process.wait()
+    return report
+
+
+def print_result(name, result):
+    if 'p50_ms' not in result:
+        print(f'{name:<24} every request failed ({result["errors"]} errors)')
+        return
+    queries = '-' if result['queries'] is None else f'{result["queries"]:.1f}'
+    print(f'{name:<24} {result["throughput"]:8.0f} req/s  p50 {result["p50_ms"]:7.1f}ms  '
+          f'p95 {result["p95_ms"]:7.1f}ms  p99 {result["p99_ms"]:7.1f}ms  queries {queries:>5}  '
+          f'errors {result["errors"]}')
+
+
+def change(old, new):
+    return (new - old) / old if old else 0.0
+
+
+def compare(old, new, tolerance, min_ms=1.0):
+    """Endpoints of ``new`` that regressed against ``old``, as ``(name, [reasons])``."""
+    regressions = []
+    for name, now in new['endpoints'].items():
+        before = old['endpoints'].get(name)
+        if before is None or 'p50_ms' not in before:
+            continue
+        if 'p50_ms' not in now:
+            regressions.append((name, ['every request failed']))
+            continue
+        reasons = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            # Sub-millisecond moves are noise whatever their ratio.
+            if change(before[key], now[key]) > tolerance and now[key] - before[key] > min_ms:
+                reasons.append(f'{key[:3]} {before[key]:.1f} -> {now[key]:.1f}ms')
+        if change(before['throughput'], now['throughput']) < -tolerance:
+            reasons.append(f'throughput {before["throughput"]:.0f} -> {now["throughput"]:.0f} req/s')
+        if before.get('queries') is not None and now.get('queries') is not None \
+                and now['queries'] > before['queries'] + 0.5:
+            reasons.append(f'queries {before["queries"]:.1f} -> {now["queries"]:.1f}')
+        if now['errors'] > before['errors']:
+            reasons.append(f'errors {before["errors"]} -> {now["errors"]}')
+        if reasons:
+            regressions.append((name, reasons))
+    return regressions
+
+
+def print_comparison(old, new, tolerance):
+    print(f'\n{"endpoint":<24} {"p95 before":>10} {"p95 now":>9} {"change":>7}  {"queries":>13}')
+    for name, now in new['endpoints'].items():
+        before = old['endpoints'].get(name, {})
+        if 'p95_ms' not in before or 'p95_ms' not in now:
+            continue
+        queries = f'{before.get("queries") or 0:.1f} -> {now.get("queries") or 0:.1f}'
+        print(f'{name:<24} {before["p95_ms"]:8.1f}ms {now["p95_ms"]:7.1f}ms '
+              f'{change(before["p95_ms"], now["p95_ms"]) * 100:+6.0f}%  {queries:>13}')
+    regressions = compare(old, new, tolerance)
+    if not regressions:
+        print(f'\nNo regressions beyond {tolerance:.0%}.')
+        return 0
+    print(f'\n{len(regressions)} regression(s) beyond {tolerance:.0%}:')
+    for name, reasons in regressions:
+        print(f'  {name}: {"; ".join(reasons)}')
+    return 1
+
+
+def load(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--journeys', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help='Processes seeding in parallel.')
+    parser.add_argument('--db', help='SQLite file to seed, or to reuse if it is already seeded.')
+    parser.add_argument('--riders', type=int, default=1000, help='Distinct riders the requests rotate through.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint.')
+    parser.add_argument('--only', help='Comma-separated endpoint name prefixes, e.g. journeys-,auth-')
+    parser.add_argument('--server-command', default=SERVER_COMMAND, help='{port} is substituted.')
+    parser.add_argument('--output', help='Write the results here as JSON.')
+    parser.add_argument('--baseline', help='Compare the results with this earlier --output.')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two saved runs; no load.')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed slowdown, as a fraction.')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(print_comparison(load(args.compare[0]), load(args.compare[1]), args.tolerance))
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        results = run(args, os.path.abspath(args.db) if args.db else os.path.join(scratch_dir, 'load.sqlite3'))
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+    if args.baseline:
+        sys.exit(print_comparison(load(args.baseline), results, args.tolerance))
@@ -0,0 +1,206 @@
+"""WSGI vs ASGI under many concurrent keep-alive clients.
+
+Seeds a scratch SQLite database, then for each mode starts one server
+process and drives it with ``--clients`` concurrent connections (default
+1000) that each loop over the read-heavy endpoints, idling ``--think``
+seconds between requests like a phone on a slow network. The WSGI server
+serves the DRF views; the ASGI server serves their async mirrors under
+/api/async/.
+
+Needs the server packages, which aren't in requirements.txt:
+
+    pip install gunicorn uvicorn
+    python benchmarks/load_asgi.py [--clients 1000] [--duration 30] [--modes wsgi,asgi]
+
+Override the server commands with --wsgi-command / --asgi-command
+(``{port}`` is substituted) to try other worker settings.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BACKEND_DIR, percentile
+
+COMMANDS = {
+    'wsgi': 'gunicorn metro_project.wsgi:application --bind 127.0.0.1:{port} --workers 1 '
+            '--worker-class gthread --threads 32 --keep-alive 75',
+    'asgi': 'uvicorn metro_project.asgi:application --host 127.0.0.1 --port {port} --workers 1 '
+            '--no-access-log --timeout-keep-alive 75',
+}
+PATHS = {
+    'wsgi': ['/api/journeys/', '/api/journeys/summary/', '/api/lost-items/',
+             '/api/departures/?station=AGA&after=08:00'],
+    'asgi': ['/api/async/journeys/', '/api/async/journeys/summary/', '/api/async/lost-items/',
+             '/api/async/departures/?station=AGA&after=08:00'],
+}
+
+
+def prepare(results):
+    from benchmarks.common import setup_django
+    setup_django()
+    from datetime import date, timedelta
+    from decimal import Decimal
+
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from metro.models import Journey, Line, LostItem, User
+    from metro.timetable import import_gtfs, synthesize_gtfs
+
+    call_command('migrate', verbosity=0)
+    call_command('loaddata', 'mrt_line6', verbosity=0)
+    import_gtfs(*synthesize_gtfs(Line.objects.get(code='MRT6')))
+    user = User.objects.create_user('load', 'load@example.com', 'pass12345', name='Load')
+    Journey.objects.bulk_create([
+        Journey(user=user, route='Mirpur 10 - Farmgate', date=date(2025, 1, 1) + timedelta(days=i % 300),
+                fare=Decimal('40.00'))
+        for i in range(500)
+    ])
+    LostItem.objects.bulk_create([
+        LostItem(title=f'Umbrella {i}', description='Black', location='Farmgate', status='unclaimed',
+                 posted_by=user)
+        for i in range(200)
+    ])
+    results.put(Token.objects.create(user=user).key)
+
+
+async def fetch(reader, writer, path, headers):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n{headers}\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def client(number, port, paths, headers, deadline, think, stats):
+    reader = writer = None
+    i = number
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                stats['open'] += 1
+                stats['peak'] = max(stats['peak'], stats['open'])
+            start = time.perf_counter()
+            status, close = await fetch(reader, writer, paths[i % len(paths)], headers)
+            stats['latencies'].append(time.perf_counter() - start)
+            if status != 200:
+                stats['errors'] += 1
+            if close:
+                writer.close()
+                writer, stats['open'] = None, stats['open'] - 1
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            stats['errors'] += 1
+            if writer is not None:
+                writer.close()
+                writer, stats['open'] = None, stats['open'] - 1
+            await asyncio.sleep(0.1)
+        i += 1
+        await asyncio.sleep(think)
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, paths, token, clients, duration, think):
+    stats = {'latencies': [], 'errors': 0, 'open': 0, 'peak': 0}
+    headers = f'Authorization: Token {token}\r\nConnection: keep-alive\r\n'
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n, port, paths, headers, deadline, think, stats) for n in range(clients)))
+    return stats, time.perf_counter() - start
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'server exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('server did not start')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_mode(mode, command, token, args):
+    port = free_port()
+    process = subprocess.Popen(shlex.split(command.format(port=port)), cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, process)
+        stats, elapsed = asyncio.run(drive(port, PATHS[mode], token, args.clients, args.duration, args.think))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies = stats['latencies']
+    if not latencies:
+        print(f'{mode}: no successful requests ({stats["errors"]} errors)')
+        return
+    print(f"{mode:<5} {args.clients} clients (peak {stats['peak']} open)  {len(latencies) / elapsed:8.0f} req/s  "
+          f"p50 {percentile(latencies, 50) * 1000:7.1f}ms  p95 {percentile(latencies, 95) * 1000:7.1f}ms  "
+          f"p99 {percentile(latencies, 99) * 1000:7.1f}ms  errors {stats['errors']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per mode.')
+    parser.add_argument('--think', type=float, default=1.0, help='Idle seconds between a client\'s requests.')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--wsgi-command', default=COMMANDS['wsgi'])
+    parser.add_argument('--asgi-command', default=COMMANDS['asgi'])
+    args = parser.parse_args()
+
+    # Each client holds a socket; make room for a few thousand.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(max(soft, args.clients * 2 + 256), hard), hard))
+
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        os.environ.update({
+            'DB_ENGINE': 'sqlite', 'DB_NAME': os.path.join(scratch_dir, 'load.sqlite3'), 'DB_REPLICAS': 'none',
+        })
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        setup = context.Process(target=prepare, args=(results,))
+        setup.start()
+        token = results.get()
+        setup.join()
+        for mode in args.modes.split(','):
+            run_mode(mode, getattr(args, f'{mode}_command'), token, args)
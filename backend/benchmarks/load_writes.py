@@ -0,0 +1,112 @@
+"""Concurrent write throughput per database mode.
+
+Each worker process stands in for a gunicorn worker: it buys tickets in a
+loop, writing a Payment and a Journey (plus their rollups) per
+transaction, while the others do the same. Modes:
+
+    sqlite       db.sqlite3 as it was configured before: rollback journal,
+                 synchronous=FULL, 5s busy timeout
+    sqlite-wal   the default single-node profile: WAL, synchronous=NORMAL,
+                 20s busy timeout
+    postgres     DB_ENGINE=postgres with the DB_* variables from the
+                 environment; DB_NAME must be a scratch database, it is
+                 migrated and flushed
+
+SQLite modes run on a temporary file, never on db.sqlite3.
+
+    python benchmarks/load_writes.py [--workers N] [--writes N] [--modes sqlite,sqlite-wal,postgres]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = {
+    'sqlite': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': '0', 'SQLITE_BUSY_TIMEOUT': '5'},
+    'sqlite-wal': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': '1', 'SQLITE_BUSY_TIMEOUT': '20'},
+    'postgres': {'DB_ENGINE': 'postgres'},
+}
+
+
+def prepare():
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    call_command('flush', interactive=False, verbosity=0)
+
+
+def worker(number, writes, barrier, results):
+    from benchmarks.common import setup_django
+    setup_django()
+    from django.db import OperationalError, connection, transaction
+    from metro.models import Journey, Payment, User
+
+    user = User.objects.create_user(f'load{number}', f'load{number}@example.com', 'pass12345', name=f'Load {number}')
+    connection.close()
+    barrier.wait()
+    done = errors = 0
+    start = time.perf_counter()
+    try:
+        for i in range(writes):
+            try:
+                with transaction.atomic():
+                    payment = Payment.objects.create(
+                        user=user, method='bKash', reference=f'LOAD-{number}-{i}', amount=Decimal('60.00'),
+                    )
+                    Journey.objects.create(
+                        user=user, route='Uttara North - Agargaon', date=date(2025, 4, 21),
+                        fare=Decimal('60.00'), payment=payment,
+                    )
+                done += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        # Always report, so the parent never waits on a crashed worker.
+        results.put((done, errors, time.perf_counter() - start))
+
+
+def run_mode(mode, workers, writes, scratch_dir):
+    os.environ.update(MODES[mode])
+    if mode != 'postgres':
+        os.environ['DB_NAME'] = os.path.join(scratch_dir, f'{mode}.sqlite3')
+    context = multiprocessing.get_context('spawn')
+    setup = context.Process(target=prepare)
+    setup.start()
+    setup.join()
+    if setup.exitcode:
+        raise SystemExit(f'{mode}: could not prepare the database')
+
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(n, writes, barrier, results)) for n in range(workers)]
+    for process in processes:
+        process.start()
+    barrier.wait(timeout=300)
+    start = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    done = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    print(f"{mode:<12} {workers} workers  {done / elapsed:8.0f} tickets/sec  "
+          f"{done} committed  {errors} failed (database is locked)  {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=500, help='Tickets per worker.')
+    parser.add_argument('--modes', default='sqlite,sqlite-wal')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        for mode in args.modes.split(','):
+            run_mode(mode, args.workers, args.writes, scratch_dir)
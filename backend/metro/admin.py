@@ -1,5 +1,28 @@
 from django.contrib import admin
-from .models import User, Journey, Payment, LostItem, UserLostReport, Feedback, Complaint
+from django.db.models import Q
+from django.utils import timezone
+from .models import User, Journey, Payment, LostItem, UserLostReport, LostItemMatch, Feedback, Complaint, UserRollup, Line, Station, LineStop, Service, Trip, StopTime, Task
+from .search import search_filter
+
+class FullTextSearchAdminMixin:
+    """Search the changelist through the full-text index (``metro.search``) instead of ``LIKE '%term%'`` scans.
+
+    ``search_fields`` still decides whether the search box is shown; fields
+    in ``like_search_fields`` (e.g. related names) are matched the old way too.
+    """
+    like_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # Every match: the changelist orders, counts and paginates them itself.
+        matches = search_filter(queryset, search_term)
+        if not self.like_search_fields:
+            return matches, False
+        condition = Q()
+        for field in self.like_search_fields:
+            condition |= Q(**{f'{field}__icontains': search_term.strip()})
+        return matches | queryset.filter(condition), False
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -10,6 +33,7 @@ class UserAdmin(admin.ModelAdmin):
 @admin.register(Journey)
 class JourneyAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'route', 'date', 'fare', 'payment')
+    list_select_related = ('user', 'payment__user')
     list_filter = ('date',)
     search_fields = ('route', 'user__name')
     raw_id_fields = ('user', 'payment')
@@ -17,26 +41,51 @@ class JourneyAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'method', 'reference', 'amount', 'timestamp')
+    list_select_related = ('user',)
     list_filter = ('method', 'timestamp')
     search_fields = ('reference', 'user__name')
     raw_id_fields = ('user',)
 
 @admin.register(LostItem)
-class LostItemAdmin(admin.ModelAdmin):
+class LostItemAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'title', 'location', 'status', 'posted_by')
+    list_select_related = ('posted_by',)
     list_filter = ('status',)
-    search_fields = ('title', 'description')
+    search_fields = ('title', 'description', 'location')
     raw_id_fields = ('posted_by',)
 
+class LostItemMatchInline(admin.TabularInline):
+    model = LostItemMatch
+    fields = ('item', 'score', 'created_at')
+    readonly_fields = ('item', 'score', 'created_at')
+    ordering = ('-score',)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(UserLostReport)
-class UserLostReportAdmin(admin.ModelAdmin):
+class UserLostReportAdmin(FullTextSearchAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'title', 'contact', 'submitted_at')
+    list_select_related = ('user',)
     search_fields = ('title', 'description', 'user__name')
+    like_search_fields = ('user__name',)
     raw_id_fields = ('user',)
+    inlines = (LostItemMatchInline,)
+
+@admin.register(LostItemMatch)
+class LostItemMatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report', 'item', 'score', 'created_at')
+    list_select_related = ('report__user', 'item')
+    list_filter = ('item__status',)
+    ordering = ('-score',)
+    raw_id_fields = ('item', 'report')
 
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'rating', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('rating',)
     search_fields = ('comment', 'user__name')
     raw_id_fields = ('user',)
@@ -44,6 +93,66 @@ class FeedbackAdmin(admin.ModelAdmin):
 @admin.register(Complaint)
 class ComplaintAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'title', 'urgency', 'status', 'submitted_at')
+    list_select_related = ('user',)
     list_filter = ('urgency', 'status')
     search_fields = ('title', 'description', 'user__name')
-    raw_id_fields = ('user',) 
\ No newline at end of file
+    raw_id_fields = ('user',) 
+
+@admin.register(UserRollup)
+class UserRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'month', 'kind', 'key', 'count', 'amount')
+    list_select_related = ('user',)
+    list_filter = ('kind', 'month')
+    search_fields = ('key', 'user__name')
+    raw_id_fields = ('user',)
+
+
+class LineStopInline(admin.TabularInline):
+    model = LineStop
+    raw_id_fields = ('station',)
+    extra = 0
+
+@admin.register(Line)
+class LineAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'name', 'color')
+    search_fields = ('code', 'name')
+    inlines = (LineStopInline,)
+
+@admin.register(Station)
+class StationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'name')
+    search_fields = ('code', 'name')
+
+
+@admin.register(Service)
+class ServiceAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'days')
+    search_fields = ('code',)
+
+class StopTimeInline(admin.TabularInline):
+    model = StopTime
+    raw_id_fields = ('station',)
+    extra = 0
+
+@admin.register(Trip)
+class TripAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'line', 'service', 'headsign')
+    list_select_related = ('line', 'service')
+    list_filter = ('line', 'service')
+    search_fields = ('code', 'headsign')
+    inlines = (StopTimeInline,)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'created_at', 'started_at', 'finished_at', 'worker')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'worker', 'last_error')
+    actions = ('retry',)
+
+    @admin.action(description='Retry selected failed tasks')
+    def retry(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='queued', attempts=0, run_after=timezone.now(),
+                                                        finished_at=None, worker='')
+        self.message_user(request, f'Queued {count} tasks again.')
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class MetroConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'metro'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
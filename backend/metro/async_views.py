@@ -0,0 +1,128 @@
+"""Async versions of the read-heavy endpoints, for ASGI deployments.
+
+DRF views are synchronous, so under ASGI each one occupies a thread while
+it waits on the database. These plain Django async views use the async
+ORM instead, so a single worker process can keep thousands of slow
+connections open. They return the same JSON as the DRF endpoints they
+mirror (cursor pages are forward-only: ``previous`` is always null).
+"""
+import math
+from functools import wraps
+
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from authentication.throttling import limiter
+from authentication.token_cache import token_cache
+from .fares import aget_fare_matrix
+from .models import Journey, LostItem
+from .pagination import akeyset_page
+from .rollups import auser_summary, summary_params
+from .serializers import JourneySerializer, LostItemSerializer, values_reader
+from .timetable import aget_timetable
+from .views import JourneyViewSet, LostItemViewSet, NextDeparturesView
+
+
+async def authenticate(request):
+    """The ``Token`` header's user, via the same cache as CachedTokenAuthentication."""
+    parts = request.headers.get('Authorization', '').split()
+    if not parts or parts[0].lower() != 'token':
+        return None
+    if len(parts) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+    token = token_cache.get(parts[1])
+    if token is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=parts[1])
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        token_cache.set(parts[1], token)
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+    return token.user
+
+
+def check_read_throttle(request, user):
+    """The ``read`` budget of EndpointClassThrottle, shared with the DRF endpoints."""
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get('read')
+    if not rate:
+        return
+    ident = f'user-{user.pk}' if user is not None else f'ip-{BaseThrottle().get_ident(request)}'
+    wait = limiter.hit(f'read:{ident}', rate)
+    if wait:
+        raise exceptions.Throttled(wait)
+
+
+def async_api(login_required=False):
+    """GET-only async JSON view with token authentication and DRF-style errors."""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            try:
+                request.api_user = await authenticate(request)
+                check_read_throttle(request, request.api_user)
+                if login_required and request.api_user is None:
+                    raise exceptions.NotAuthenticated()
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+                if getattr(exc, 'wait', None):
+                    response['Retry-After'] = str(math.ceil(exc.wait))
+                return response
+        return wrapper
+    return decorator
+
+
+async def list_page(request, queryset, serializer_class, ordering):
+    """A keyset page of ``queryset``, serialized like the DRF list endpoint (see ValuesListMixin)."""
+    # Sparse fieldsets and absolute file URLs read the request like a DRF one.
+    drf_request = Request(request)
+    expand = serializer_class.requested_expansions(drf_request)
+    if expand:
+        # Expanded relations must be joined up front: lazy loads can't run in async code.
+        context = {'request': drf_request}
+        queryset = queryset.select_related(*expand)
+        serialize = lambda rows: serializer_class(rows, many=True, context=context).data
+    else:
+        reader = values_reader(serializer_class)
+        names = reader.field_names(drf_request)
+        queryset = reader.rows(queryset, names, extra=[field.lstrip('-') for field in ordering])
+        serialize = lambda rows: reader.serialize(rows, names, drf_request)
+    try:
+        page = await akeyset_page(request, queryset, ordering, serialize)
+    except ValueError as exc:
+        return JsonResponse({'detail': str(exc)}, status=404)
+    return JsonResponse(page)
+
+
+@async_api(login_required=True)
+async def journey_list(request):
+    return await list_page(request, Journey.objects.filter(user=request.api_user),
+                           JourneySerializer, JourneyViewSet.ordering)
+
+
+@async_api(login_required=True)
+async def journey_summary(request):
+    params, errors = summary_params(request.GET)
+    if errors:
+        return JsonResponse(errors, status=400)
+    return JsonResponse(await auser_summary(request.api_user.id, **params))
+
+
+@async_api()
+async def lost_item_list(request):
+    return await list_page(request, LostItem.objects.all(), LostItemSerializer, (LostItemViewSet.ordering,))
+
+
+@async_api()
+async def next_departures(request):
+    data, errors = NextDeparturesView.departures(request.GET, await aget_fare_matrix(), await aget_timetable())
+    if errors:
+        return JsonResponse(errors, status=400)
+    return JsonResponse(data)
@@ -0,0 +1,191 @@
+from django.db import DatabaseError, IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+
+from .caching import invalidate_responses
+from .fares import get_fare_matrix
+from .models import User, Journey, Payment
+from .rollups import bump_many
+from .serializers import JourneySerializer, PaymentSerializer, expected_route_fare
+
+CHUNK_SIZE = 1000
+
+
+def is_pk(value):
+    # JSON true/false arrive as bool, which is a subclass of int.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BulkIngestor:
+    """Validate and insert many rows, reporting errors per row instead of failing the batch.
+
+    Rows are processed in chunks of ``chunk_size``: field values are checked
+    with the serializer's own fields, foreign keys are resolved with one
+    query per chunk, and each chunk is written by a single ``bulk_create``
+    inside its own transaction. ``bulk_create`` skips model signals, so the
+    rollups and cached responses are updated here.
+    """
+    model = None
+    serializer_class = None
+    value_fields = ()
+
+    def __init__(self, user, chunk_size=CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        # Staff (e.g. fare-gate sync accounts) may write rows for any user.
+        self.can_set_user = user.is_staff or user.is_admin
+        fields = self.serializer_class().fields
+        self.fields = {name: fields[name] for name in self.value_fields}
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def ingest(self, rows):
+        if not isinstance(rows, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of objects.']})
+        for offset in range(0, len(rows), self.chunk_size):
+            self.ingest_chunk(offset, rows[offset:offset + self.chunk_size])
+        self.errors.sort(key=lambda error: error['index'])
+        return {'created': self.created, 'skipped': self.skipped, 'errors': self.errors}
+
+    def ingest_chunk(self, offset, chunk):
+        valid = []
+        for index, row in enumerate(chunk, start=offset):
+            values, errors = self.validate_row(row)
+            if errors:
+                self.add_error(index, errors)
+            else:
+                valid.append((index, values))
+        valid = self.resolve(valid)
+        try:
+            self.write(valid)
+        except DatabaseError as exc:
+            for index, _ in valid:
+                self.add_error(index, {'non_field_errors': [str(exc)]})
+
+    def write(self, valid):
+        objects = [self.model(**values) for _, values in valid]
+        if not objects:
+            return
+        with transaction.atomic():
+            self.model.objects.bulk_create(objects)
+            bump_many(objects)
+        self.created += len(objects)
+        for user_id in {obj.user_id for obj in objects}:
+            invalidate_responses(self.model._meta.model_name, user_id)
+
+    def add_error(self, index, errors):
+        self.errors.append({'index': index, 'errors': errors})
+
+    def validate_row(self, row):
+        if not isinstance(row, dict):
+            return None, {'non_field_errors': ['Expected an object.']}
+        values, errors = {}, {}
+        for name, field in self.fields.items():
+            try:
+                values[name] = field.run_validation(row.get(name, empty))
+            except SkipField:
+                pass
+            except ValidationError as exc:
+                errors[name] = exc.detail
+        user_id = row.get('user', self.user.pk)
+        if not is_pk(user_id):
+            errors['user'] = ['Expected a user id.']
+        elif user_id != self.user.pk and not self.can_set_user:
+            errors['user'] = ['You can only create records for yourself.']
+        values['user_id'] = user_id
+        return values, errors
+
+    def resolve(self, valid):
+        """Drop rows whose foreign keys don't resolve; subclasses add their own checks."""
+        other_users = {values['user_id'] for _, values in valid} - {self.user.pk}
+        if not other_users:
+            return valid
+        existing = set(User.objects.filter(pk__in=other_users).values_list('pk', flat=True))
+        resolved = []
+        for index, values in valid:
+            if values['user_id'] == self.user.pk or values['user_id'] in existing:
+                resolved.append((index, values))
+            else:
+                self.add_error(index, {'user': [f'Invalid pk "{values["user_id"]}" - object does not exist.']})
+        return resolved
+
+
+class JourneyBulkIngestor(BulkIngestor):
+    model = Journey
+    serializer_class = JourneySerializer
+    value_fields = ('route', 'date', 'fare')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fare_matrix = get_fare_matrix()
+
+    def validate_row(self, row):
+        values, errors = super().validate_row(row)
+        if values is not None and not errors:
+            values['fare'], fare_errors = expected_route_fare(values['route'], values.get('fare'), self.fare_matrix)
+            errors.update(fare_errors or {})
+        if values is not None:
+            payment_id = row.get('payment')
+            if payment_id is not None and not is_pk(payment_id):
+                errors['payment'] = ['Expected a payment id.']
+            values['payment_id'] = payment_id
+        return values, errors
+
+    def resolve(self, valid):
+        valid = super().resolve(valid)
+        payment_ids = {values['payment_id'] for _, values in valid} - {None}
+        owners = dict(Payment.objects.filter(pk__in=payment_ids).values_list('pk', 'user_id'))
+        resolved = []
+        for index, values in valid:
+            payment_id = values['payment_id']
+            if payment_id is None or owners.get(payment_id) == values['user_id']:
+                resolved.append((index, values))
+            else:
+                self.add_error(index, {'payment': [f'Invalid pk "{payment_id}" - object does not exist.']})
+        return resolved
+
+
+class PaymentBulkIngestor(BulkIngestor):
+    """Payments are idempotent on (user, reference): resent rows are skipped, not duplicated.
+
+    Rows already stored are skipped up front. The unique constraint catches
+    any that a concurrent upload writes in the meantime: the chunk rolls
+    back and is checked and written again.
+    """
+    model = Payment
+    serializer_class = PaymentSerializer
+    value_fields = ('method', 'reference', 'amount')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = set()
+
+    def resolve(self, valid):
+        resolved = []
+        for index, values in super().resolve(valid):
+            key = (values['user_id'], values['reference'])
+            if key in self.seen:
+                self.skipped += 1
+                continue
+            self.seen.add(key)
+            resolved.append((index, values))
+        return self.skip_stored(resolved)
+
+    def skip_stored(self, valid):
+        stored = set(
+            Payment.objects.filter(
+                user_id__in={values['user_id'] for _, values in valid},
+                reference__in={values['reference'] for _, values in valid},
+            ).values_list('user_id', 'reference')
+        )
+        resolved = [(index, values) for index, values in valid
+                    if (values['user_id'], values['reference']) not in stored]
+        self.skipped += len(valid) - len(resolved)
+        return resolved
+
+    def write(self, valid):
+        try:
+            super().write(valid)
+        except IntegrityError:
+            super().write(self.skip_stored(valid))
@@ -0,0 +1,45 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.http import parse_etags
+
+from .versions import bump_version, get_version, shared_cache
+
+DEFAULT_TIMEOUT = 300
+
+
+def response_version_name(kind, user_id=None):
+    return f'responses:{kind}' if user_id is None else f'responses:{kind}:{user_id}'
+
+
+def invalidate_responses(kind, user_id=None):
+    """Make every cached response built from ``kind`` (for ``user_id``, if given) stale."""
+    bump_version(response_version_name(kind, user_id))
+
+
+def response_cache_key(request, kinds, user_id=None):
+    """Cache key for a GET: the versions it depends on, the full URL and the negotiated format."""
+    versions = ','.join(str(get_version(response_version_name(kind, user_id))) for kind in kinds)
+    query = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    # The host is part of the key because serializers build absolute file URLs from it.
+    raw = f'{user_id}|{versions}|{request.get_host()}{request.path}|{query}|{request.accepted_renderer.format}'
+    return 'metro:response:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def make_etag(content):
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+def etag_matches(request, etag):
+    return etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+
+def get_cached_response(key):
+    """``(etag, content_type, content)`` or ``None``."""
+    return shared_cache().get(key)
+
+
+def set_cached_response(key, content_type, content):
+    entry = (make_etag(content), content_type, content)
+    shared_cache().set(key, entry, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return entry
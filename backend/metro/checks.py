@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+LOCAL_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Per-process ``SHARED_CACHE`` means stale responses, rebuilds and replica pins across workers."""
+    alias = settings.SHARED_CACHE
+    if alias not in settings.CACHES:
+        return [Error(f'SHARED_CACHE names {alias!r}, which is not in CACHES.', id='metro.E001')]
+    if settings.CACHES[alias].get('BACKEND') != LOCAL_BACKEND:
+        return []
+    messages = []
+    if getattr(settings, 'DATABASE_REPLICAS', None):
+        messages.append(Error(
+            f'DATABASE_REPLICAS is set but SHARED_CACHE ({alias!r}) is a per-process local-memory cache.',
+            hint='Read-your-writes pins are only seen by the worker that took the write, so the next request on '
+                 'another worker reads stale replica data. Set REDIS_URL or point SHARED_CACHE at a shared alias.',
+            id='metro.E002',
+        ))
+    if settings.RESPONSE_CACHE_TIMEOUT:
+        messages.append(Warning(
+            f'SHARED_CACHE ({alias!r}) is a per-process local-memory cache.',
+            hint='With several workers, a write only invalidates cached responses and rebuilt data in its own '
+                 'worker; the others serve stale lists and 304s for up to RESPONSE_CACHE_TIMEOUT seconds. Set '
+                 'REDIS_URL (or point SHARED_CACHE at another shared alias), or set RESPONSE_CACHE_TIMEOUT to 0.',
+            id='metro.W001',
+        ))
+    return messages
+
+
+@register(Tags.security, deploy=True)
+def check_metrics_token(app_configs, **kwargs):
+    if getattr(settings, 'METRICS_TOKEN', None):
+        return []
+    return [Warning(
+        'METRICS_TOKEN is not set, so /metrics refuses every scrape while DEBUG is off.',
+        hint='Set METRICS_TOKEN and send it as "Authorization: Bearer <token>" from the scraper.',
+        id='metro.W002',
+    )]
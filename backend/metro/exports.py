@@ -0,0 +1,57 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class EchoBuffer:
+    """File-like object whose ``write`` just returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+class ExportRenderer(BaseRenderer):
+    """Negotiates ``?format=`` for export actions and streams rows in that format.
+
+    ``render`` only handles error payloads (which are small), so a failed
+    export still gets a readable JSON body.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+    def stream(self, columns, rows):
+        raise NotImplementedError
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, columns, rows):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, columns, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), default=str) + '\n'
+
+
+def export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate ``columns`` of ``queryset`` without materialising it.
+
+    ``iterator()`` uses a server-side cursor on PostgreSQL and chunked
+    fetches elsewhere, so memory stays flat however many rows match.
+    """
+    return queryset.values_list(*columns).iterator(chunk_size=chunk_size)
@@ -0,0 +1,145 @@
+import heapq
+import math
+from array import array
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import LineStop, Station
+from .versions import VersionedBuild
+
+UNREACHABLE = math.inf
+
+FARE_DEFAULTS = {
+    'PER_KM': '5.00',
+    'MINIMUM': '20.00',
+    'MAXIMUM': '100.00',
+    'ROUND_TO': '10.00',
+}
+
+
+def fare_for_distance(distance_km):
+    """Distance-based fare: PER_KM per km rounded up to ROUND_TO, clamped to [MINIMUM, MAXIMUM]."""
+    config = {key: Decimal(value) for key, value in {**FARE_DEFAULTS, **getattr(settings, 'METRO_FARES', {})}.items()}
+    steps = math.ceil(Decimal(str(distance_km)) * config['PER_KM'] / config['ROUND_TO'])
+    return min(max(steps * config['ROUND_TO'], config['MINIMUM']), config['MAXIMUM']).quantize(Decimal('0.01'))
+
+
+def all_pairs_shortest(size, edges):
+    """Dijkstra from every node; returns a flat ``size * size`` array of path weights."""
+    adjacency = [[] for _ in range(size)]
+    for a, b, weight in edges:
+        adjacency[a].append((b, weight))
+        adjacency[b].append((a, weight))
+
+    result = array('d', [UNREACHABLE]) * (size * size)
+    for source in range(size):
+        row = source * size
+        result[row + source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if dist > result[row + node]:
+                continue
+            for neighbour, weight in adjacency[node]:
+                candidate = dist + weight
+                if candidate < result[row + neighbour]:
+                    result[row + neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+    return result
+
+
+class FareMatrix:
+    """All-pairs fares and travel times over the station graph.
+
+    Shortest distances (which set the fare) and shortest running times are
+    precomputed into flat arrays indexed ``i * size + j``, so a lookup is two
+    dict hits and an array read, with no database access.
+    """
+
+    def __init__(self, stations, edges):
+        self.stations = list(stations)
+        self.size = len(self.stations)
+        self.index = {}
+        for position, station in enumerate(self.stations):
+            self.index[station.id] = position
+            self.index[station.code.casefold()] = position
+            self.index[station.name.casefold()] = position
+
+        distance_edges = [(a, b, float(distance)) for a, b, distance, _ in edges]
+        time_edges = [(a, b, float(seconds)) for a, b, _, seconds in edges]
+        self.distances = all_pairs_shortest(self.size, distance_edges)
+        self.seconds = all_pairs_shortest(self.size, time_edges)
+        self.fares = {}
+
+    @classmethod
+    def from_database(cls):
+        stations = list(Station.objects.order_by('id'))
+        positions = {station.id: position for position, station in enumerate(stations)}
+        edges = []
+        previous = None
+        for stop in LineStop.objects.order_by('line_id', 'sequence'):
+            if previous is not None and previous.line_id == stop.line_id:
+                edges.append((positions[previous.station_id], positions[stop.station_id],
+                              stop.distance_km, stop.travel_seconds))
+            previous = stop
+        return cls(stations, edges)
+
+    def __bool__(self):
+        return self.size > 0
+
+    def station(self, key):
+        """Resolve a station by id, code or name (case-insensitive); ``None`` if unknown."""
+        if isinstance(key, str):
+            key = int(key) if key.isdigit() else key.strip().casefold()
+        position = self.index.get(key)
+        return None if position is None else self.stations[position]
+
+    def lookup(self, origin, destination):
+        """Fare, distance and running time between two stations, or ``None`` if unreachable."""
+        cell = self.index[origin.id] * self.size + self.index[destination.id]
+        distance = self.distances[cell]
+        if distance == UNREACHABLE:
+            return None
+        fare = self.fares.get(cell)
+        if fare is None:
+            fare = self.fares[cell] = fare_for_distance(round(distance, 2))
+        return {
+            'fare': fare,
+            'distance_km': round(distance, 2),
+            'travel_seconds': int(self.seconds[cell]),
+        }
+
+    def route_fare(self, route):
+        """Expected fare for a free-text ``"Origin - Destination"`` route.
+
+        Returns ``(fare, error)``; ``error`` describes why the route could not
+        be priced.
+        """
+        names = [part.strip() for part in route.split(' - ')]
+        if len(names) != 2:
+            return None, 'Expected "Origin - Destination".'
+        stations = [self.station(name) for name in names]
+        unknown = [name for name, station in zip(names, stations) if station is None]
+        if unknown:
+            return None, f'Unknown station: {", ".join(unknown)}.'
+        result = self.lookup(*stations)
+        if result is None:
+            return None, 'No connection between these stations.'
+        return result['fare'], None
+
+
+fare_matrix = VersionedBuild('network', FareMatrix.from_database)
+
+
+def get_fare_matrix():
+    """Process-wide FareMatrix, rebuilt only when the station network changes."""
+    return fare_matrix.get()
+
+
+async def aget_fare_matrix():
+    return await fare_matrix.aget()
+
+
+def invalidate_fare_matrix():
+    fare_matrix.invalidate()
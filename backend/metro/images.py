@@ -0,0 +1,128 @@
+"""Renditions of lost item photos.
+
+Uploads are stored as-is on the request thread, and a background task
+(metro.tasks) re-encodes the photo. The re-encoded copy is rotated
+upright, has its EXIF dropped (phone photos carry GPS positions) and is
+capped at ``MAX_ORIGINAL`` pixels. It replaces the upload, and smaller
+WebP and JPEG renditions are written next to it.
+
+Everything lands under ``lost_items/<sha256 of the upload>/``. The same
+photo uploaded twice is therefore stored once. A file's URL never changes
+meaning, so the web server can serve that tree with
+``Cache-Control: immutable``.
+"""
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .caching import invalidate_responses
+from .models import LostItem
+from .tasks import task
+
+IMAGE_DIR = 'lost_items'
+MAX_ORIGINAL = 2048
+# Name -> longest side in pixels.
+RENDITIONS = {'thumb': 320, 'medium': 1024}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+ORIGINAL_FORMAT = ('JPEG', {'quality': 90, 'optimize': True})
+
+
+def image_storage():
+    return LostItem._meta.get_field('image_url').storage
+
+
+def rendition_name(digest, rendition, extension):
+    return posixpath.join(IMAGE_DIR, digest, f'{rendition}.{extension}')
+
+
+def rendition_names(digest):
+    """``{rendition: {format: storage name}}`` for a processed upload."""
+    return {
+        rendition: {extension: rendition_name(digest, rendition, extension) for extension in FORMATS}
+        for rendition in RENDITIONS
+    }
+
+
+def is_processed(name, digest):
+    return bool(digest) and bool(name) and name.startswith(posixpath.join(IMAGE_DIR, digest, ''))
+
+
+def content_digest(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as upload:
+        for chunk in upload.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode(image, size, image_format, options):
+    """``image`` shrunk to fit ``size`` and encoded without metadata."""
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    # Saving without ``exif=`` writes none, whatever the source carried.
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def write(storage, name, data):
+    # Content-addressed: an existing file under this name already holds these bytes.
+    if not storage.exists(name):
+        storage.save(name, ContentFile(data))
+
+
+def render(storage, upload_name, digest):
+    """Write the cleaned original and every rendition of ``upload_name``; returns the original's name."""
+    with storage.open(upload_name, 'rb') as upload:
+        image = Image.open(upload)
+        alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        original_name = rendition_name(digest, 'original', 'png' if alpha else 'jpg')
+        names = [original_name] + [name for formats in rendition_names(digest).values() for name in formats.values()]
+        if all(storage.exists(name) for name in names):
+            return original_name
+        # JPEG can decode straight to a smaller scale, far cheaper than a full decode.
+        image.draft('RGB', (MAX_ORIGINAL, MAX_ORIGINAL))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if alpha:
+        write(storage, original_name, encode(image, MAX_ORIGINAL, 'PNG', {'optimize': True}))
+    else:
+        write(storage, original_name, encode(image, MAX_ORIGINAL, *ORIGINAL_FORMAT))
+    # Largest first, so each rendition is shrunk from the previous one.
+    for rendition, size in sorted(RENDITIONS.items(), key=lambda pair: -pair[1]):
+        image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+        for extension, (image_format, options) in FORMATS.items():
+            write(storage, rendition_name(digest, rendition, extension), encode(image, size, image_format, options))
+    return original_name
+
+
+@task()
+def process_image(pk):
+    """Replace a lost item's uploaded photo with its cleaned, content-addressed renditions."""
+    item = LostItem.objects.filter(pk=pk).values('image_url', 'image_sha256').first()
+    if item is None or not item['image_url'] or is_processed(item['image_url'], item['image_sha256']):
+        return None
+    storage = image_storage()
+    upload_name = item['image_url']
+    digest = content_digest(storage, upload_name)
+    original_name = render(storage, upload_name, digest)
+    # Only if the photo wasn't replaced meanwhile; a newer upload gets its own run.
+    updated = LostItem.objects.filter(pk=pk, image_url=upload_name).update(image_url=original_name, image_sha256=digest)
+    if updated and not LostItem.objects.filter(image_url=upload_name).exists():
+        storage.delete(upload_name)
+    if updated:
+        invalidate_responses('lostitem')
+    return digest
+
+
+def schedule_image_processing(pk):
+    """Process a saved lost item's photo in the background once the current transaction commits."""
+    process_image.delay(pk)
@@ -0,0 +1,50 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metro.models import Line
+from metro.timetable import import_gtfs, synthesize_gtfs
+
+
+class Command(BaseCommand):
+    help = (
+        'Replace the timetable with a GTFS feed directory (calendar.txt, trips.txt, '
+        'stop_times.txt), or with a generated regular service via --synthesize LINE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('feed', nargs='?', help='Directory containing the GTFS text files.')
+        parser.add_argument('--synthesize', metavar='LINE', help='Generate a timetable for this line code instead.')
+        parser.add_argument('--first', default='06:30', help='First departure for --synthesize (HH:MM).')
+        parser.add_argument('--last', default='22:00', help='Last departure for --synthesize (HH:MM).')
+        parser.add_argument('--headway', type=int, default=8, help='Minutes between trains for --synthesize.')
+
+    def handle(self, *args, **options):
+        if bool(options['feed']) == bool(options['synthesize']):
+            raise CommandError('Pass either a feed directory or --synthesize LINE.')
+        try:
+            if options['synthesize']:
+                line = Line.objects.filter(code=options['synthesize']).first()
+                if line is None:
+                    raise CommandError(f'Unknown line "{options["synthesize"]}".')
+                counts = import_gtfs(*synthesize_gtfs(
+                    line, first=options['first'], last=options['last'], headway=options['headway'],
+                ))
+            else:
+                counts = self.import_feed(Path(options['feed']))
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {services} services, {trips} trips and {stop_times} stop times.'.format(**counts)
+        ))
+
+    def import_feed(self, feed):
+        paths = {name: feed / f'{name}.txt' for name in ('calendar', 'trips', 'stop_times')}
+        missing = [str(path) for path in paths.values() if not path.is_file()]
+        if missing:
+            raise CommandError(f'Missing feed files: {", ".join(missing)}')
+        with open(paths['calendar'], newline='', encoding='utf-8-sig') as calendar, \
+                open(paths['trips'], newline='', encoding='utf-8-sig') as trips, \
+                open(paths['stop_times'], newline='', encoding='utf-8-sig') as stop_times:
+            return import_gtfs(csv.DictReader(calendar), csv.DictReader(trips), csv.DictReader(stop_times))
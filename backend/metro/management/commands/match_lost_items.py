@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from metro.matching import rematch_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every lost report / found item match from scratch, e.g. after bulk '
+        'imports, which skip the signals that match new rows as they arrive.'
+    )
+
+    def handle(self, *args, **options):
+        count = rematch_all()
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} matches.'))
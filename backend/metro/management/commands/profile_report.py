@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from metro.profiling import function_totals, load_profiles
+
+
+WRAPPERS = ('metro/metrics.py:', 'metro/profiling.py:')
+
+
+def share(count, total):
+    return f'{count / total * 100:5.1f}%'
+
+
+def project_prefixes():
+    base = Path(settings.BASE_DIR)
+    prefixes = {'metro_project/'}
+    for app in apps.get_app_configs():
+        try:
+            prefixes.add(f'{Path(app.path).relative_to(base).parts[0]}/')
+        except ValueError:
+            pass
+    return tuple(prefixes)
+
+
+class Command(BaseCommand):
+    help = 'Merge the sampled request profiles in PROFILE_DIR into a report of the hottest functions and paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Directory of .folded dumps (default: PROFILE_DIR).')
+        parser.add_argument('--top', type=int, default=20, help='Functions and paths to list.')
+        parser.add_argument('--route', default=None, help='Only profiles of this URL name, e.g. journey-list.')
+        parser.add_argument('--depth', type=int, default=8, help='Innermost frames shown per path.')
+        parser.add_argument('--output', default=None,
+                            help='Also write the merged collapsed stacks here, for flamegraph.pl or speedscope.')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.PROFILE_DIR
+        stacks, routes = load_profiles(directory, options['route'])
+        total = sum(stacks.values())
+        if not total:
+            self.stdout.write(f'No profiles in {directory}.')
+            return
+        top, depth = options['top'], options['depth']
+        prefixes = project_prefixes()
+
+        self.stdout.write(f'{total} samples')
+        for route, count in routes.most_common():
+            self.stdout.write(f'  {share(count, total)}  {count:>7}  {route}')
+
+        own, inclusive = function_totals(stacks)
+        self.stdout.write(f'\nHottest functions ({"self":>6} {"total":>6})')
+        for function, count in own.most_common(top):
+            self.stdout.write(f'  {share(count, total)} {share(inclusive[function], total)}  {function}')
+
+        self.stdout.write('\nHottest paths (innermost frame last)')
+        for stack, count in stacks.most_common(top):
+            frames = stack.split(';')
+            self.stdout.write(f'  {share(count, total)}  {count:>7}')
+            if len(frames) > depth:
+                self.stdout.write(f'      ... {len(frames) - depth} outer frames')
+                # Deep in library code: name the project code that led there
+                # (other than the query wrappers every statement runs through).
+                ours = [frame for frame in frames if frame.startswith(prefixes) and not frame.startswith(WRAPPERS)]
+                if ours and ours[-1] not in frames[-depth:]:
+                    self.stdout.write(f'      ... from {ours[-1]}')
+            for frame in frames[-depth:]:
+                self.stdout.write(f'      {frame}')
+
+        if options['output']:
+            Path(options['output']).write_text(''.join(f'{stack} {count}\n' for stack, count in stacks.items()))
+            self.stdout.write(f'\nMerged stacks written to {options["output"]}')
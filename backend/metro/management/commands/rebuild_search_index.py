@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from metro.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the full-text search index for lost items and lost reports, e.g. after '
+        'bulk_create or queryset updates, which bypass the signals that keep it current.'
+    )
+
+    def handle(self, *args, **options):
+        for model, index in SEARCH_INDEXES.items():
+            count = index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {model._meta.verbose_name_plural}.'))
@@ -0,0 +1,30 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from metro.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks (lost item matching, photo processing, staff '
+        'notifications) until stopped with Ctrl-C or SIGTERM.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Tasks run at the same time.')
+        parser.add_argument('--pool', choices=('thread', 'process', 'inline'), default='thread',
+                            help='Run tasks on threads, on processes (for CPU-heavy tasks such as '
+                                 'photo processing), or one at a time in this process.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds between looks at the queue while it is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due.')
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['pool'], options['poll_interval'])
+        # Finish the tasks already claimed, then exit.
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f'Worker {worker.name}: {worker.concurrency} x {worker.pool_kind}')
+        count = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} tasks.'))
@@ -0,0 +1,51 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metro.models import User
+from metro.seeding import BLOCK_SIZE, seed_existing, seed_riders
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate riders with payments, journeys, lost item reports, feedback and complaints, in bulk. '
+        'The same --seed and --block-size give the same rows; --workers splits the blocks across processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Riders to create.')
+        parser.add_argument('--journeys-per-user', type=int, default=8,
+                            help='Mean journeys per rider (each gets between half and one and a half times this).')
+        parser.add_argument('--days', type=int, default=30, help='Journeys fall within this many days back.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='Riders per transaction.')
+        parser.add_argument('--workers', type=int, default=1,
+                            help=f'Processes writing blocks in parallel (this machine has {os.cpu_count()} CPUs).')
+        parser.add_argument('--existing', action='store_true',
+                            help='Add payments and journeys to every existing user instead of creating riders.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def progress(riders, journeys):
+            if options['verbosity'] > 1:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{riders} riders, {journeys} journeys ({journeys / elapsed:.0f} journeys/s)')
+
+        settings = {key: options[key] for key in ('seed', 'block_size', 'days', 'workers')}
+        if options['existing']:
+            riders, journeys = seed_existing(options['journeys_per_user'], progress=progress, **settings)
+        else:
+            # New riders are numbered after any seeded earlier, so a second run adds to the first.
+            first = User.objects.filter(username__startswith='rider').count()
+            if User.objects.filter(username=f'rider{first}').exists():
+                raise CommandError('Rider usernames are not contiguous; seed into an empty database.')
+            riders, journeys = seed_riders(options['users'], options['journeys_per_user'], first=first,
+                                           progress=progress, **settings)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {journeys} journeys for {riders} riders in {elapsed:.1f}s ({journeys / elapsed:.0f} journeys/s).'
+        ))
+        if not options['existing']:
+            self.stdout.write('Run manage.py rebuild_search_index to make the new lost items searchable.')
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from metro.tasks import task_stats
+
+
+def seconds(value):
+    return '-' if value is None else f'{value:.2f}s'
+
+
+class Command(BaseCommand):
+    help = 'Per-task throughput, failures, queue wait and run time for recently finished background tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60, help='Window of finished tasks to report on.')
+
+    def handle(self, *args, **options):
+        stats = task_stats(timezone.now() - timedelta(minutes=options['minutes']))
+        if not stats:
+            self.stdout.write('No tasks in this window.')
+            return
+        self.stdout.write(f'{"task":<45} {"done":>6} {"failed":>6} {"retried":>7} {"queued":>6} '
+                          f'{"wait p50":>9} {"wait p95":>9} {"run p50":>9} {"run p95":>9} {"run p99":>9}')
+        for name, entry in sorted(stats.items()):
+            self.stdout.write(
+                f'{name:<45} {entry["done"]:>6} {entry["failed"]:>6} {entry["retried"]:>7} '
+                f'{entry.get("queued", 0):>6} {seconds(entry.get("wait_p50")):>9} {seconds(entry.get("wait_p95")):>9} '
+                f'{seconds(entry.get("run_p50")):>9} {seconds(entry.get("run_p95")):>9} '
+                f'{seconds(entry.get("run_p99")):>9}'
+            )
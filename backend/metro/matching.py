@@ -0,0 +1,309 @@
+"""Match lost reports against found items by TF-IDF cosine similarity.
+
+Both sides are tokenized into term-frequency vectors. Each side is scored
+through a SciPy CSR term x document matrix (an inverted index), built from
+per-document rows the first time it is queried after a change. Scoring is
+a sparse product of query rows with it, which touches only the documents
+sharing a query's terms; ``match_lost_items`` scores reports in chunks.
+
+IDF is computed over unclaimed items and reports together, at query time;
+a document's norm is fixed when it is indexed, so it drifts slightly as
+the corpus grows until the next rebuild (any edit, claim or delete starts
+one, and so does ``manage.py match_lost_items``).
+
+Matching runs as a background task (metro.tasks) queued by the save, and
+writes the best ``MATCHES_PER_DOCUMENT`` pairs above ``MIN_SCORE`` to
+LostItemMatch.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from scipy.sparse import csr_matrix
+
+from .models import LostItem, LostItemMatch, UserLostReport
+from .tasks import task
+from .versions import VersionedBuild
+
+MATCHES_PER_DOCUMENT = 10
+MIN_SCORE = 0.1
+TITLE_WEIGHT = 2
+BATCH_SIZE = 2000
+# Queries scored per sparse product; bounds the dense-ish result held at once.
+QUERY_CHUNK = 128
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in is it its lost my near of on or that the this to was '
+    'were with found left while'.split()
+)
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def terms(text):
+    """Lowercased words of ``text`` minus stop words, with plural -s dropped."""
+    result = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if len(word) < 2 or word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        result.append(word)
+    return result
+
+
+def item_vector(title, description, location):
+    counts = Counter(terms(description or '')) + Counter(terms(location or ''))
+    for term in terms(title or ''):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+def report_vector(title, description):
+    counts = Counter(terms(description or ''))
+    for term in terms(title or ''):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+class Corpus:
+    """One side's documents: term frequencies, norms and the sparse matrix scored against."""
+
+    def __init__(self):
+        self.vectors = {}
+        self.norms = {}
+        # doc id -> (term columns, term frequencies): the document's matrix row.
+        self.rows = {}
+        self._matrix = None
+
+    def __contains__(self, doc_id):
+        return doc_id in self.vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def changed(self):
+        self._matrix = None
+
+    def matrix(self, width):
+        """``(doc_ids, CSR term x document tf matrix, norms)``, rebuilt after documents change.
+
+        A cached matrix may be narrower than ``width``: terms added since
+        then occur in none of this side's documents.
+        """
+        if self._matrix is None:
+            rows = list(self.rows.values())
+            indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum([len(columns) for columns, _ in rows], out=indptr[1:])
+            indices = np.concatenate([columns for columns, _ in rows]) if rows else np.empty(0, dtype=np.int32)
+            data = np.concatenate([tfs for _, tfs in rows]) if rows else np.empty(0)
+            self._matrix = (
+                np.fromiter(self.rows, dtype=np.int64, count=len(rows)),
+                csr_matrix((data, indices, indptr), shape=(len(rows), width)).T.tocsr(),
+                np.fromiter((self.norms[doc_id] for doc_id in self.rows), dtype=np.float64, count=len(rows)),
+            )
+        return self._matrix
+
+
+class MatchEngine:
+    def __init__(self):
+        self.corpora = {'item': Corpus(), 'report': Corpus()}
+        # term -> matrix column, shared by both sides; columns are never reused.
+        self.columns = {}
+        self.document_frequency = np.zeros(1024, dtype=np.int64)
+        self.documents = 0
+        # Highest id synced per side; sync() picks up rows created since.
+        self.watermarks = {'item': 0, 'report': 0}
+
+    @classmethod
+    def from_database(cls):
+        return cls().sync().refresh_norms()
+
+    def sync(self):
+        """Index items and reports created since the last sync."""
+        for side, queryset, fields, vectorize in self.sources():
+            latest = queryset.model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            if latest <= self.watermarks[side]:
+                continue
+            rows = queryset.filter(pk__gt=self.watermarks[side], pk__lte=latest).values_list('pk', *fields)
+            for pk, *values in rows.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+                self.add(side, pk, vectorize(*values))
+            self.watermarks[side] = latest
+        return self
+
+    def load(self, side, pk):
+        """Index one document if it exists and is open, e.g. one whose transaction committed after a newer one's."""
+        for source_side, queryset, fields, vectorize in self.sources():
+            if source_side == side:
+                values = queryset.filter(pk=pk).values_list(*fields).first()
+                if values is not None:
+                    self.add(side, pk, vectorize(*values))
+        return self.corpora[side].vectors.get(pk)
+
+    @staticmethod
+    def sources():
+        return (
+            ('item', LostItem.objects.filter(status='unclaimed'), ('title', 'description', 'location'), item_vector),
+            ('report', UserLostReport.objects.all(), ('title', 'description'), report_vector),
+        )
+
+    def idf(self, term):
+        column = self.columns.get(term)
+        frequency = 0 if column is None else self.document_frequency[column]
+        return math.log((1 + self.documents) / (1 + frequency)) + 1
+
+    def idf_array(self, width):
+        return np.log((1 + self.documents) / (1 + self.document_frequency[:width])) + 1
+
+    def norm(self, vector):
+        return math.sqrt(sum((tf * self.idf(term)) ** 2 for term, tf in vector.items()))
+
+    def term_columns(self, vector):
+        columns = self.columns
+        for term in vector:
+            if term not in columns:
+                columns[term] = len(columns)
+        if len(columns) > len(self.document_frequency):
+            grown = np.zeros(2 * len(columns), dtype=np.int64)
+            grown[:len(self.document_frequency)] = self.document_frequency
+            self.document_frequency = grown
+        return np.fromiter((columns[term] for term in vector), dtype=np.int32, count=len(vector))
+
+    def add(self, side, doc_id, vector):
+        corpus = self.corpora[side]
+        if doc_id in corpus:
+            self.remove(side, doc_id)
+        if not vector:
+            return
+        columns = self.term_columns(vector)
+        self.documents += 1
+        self.document_frequency[columns] += 1
+        corpus.vectors[doc_id] = vector
+        corpus.rows[doc_id] = (columns, np.fromiter(vector.values(), dtype=np.float64, count=len(vector)))
+        corpus.norms[doc_id] = self.norm(vector)
+        corpus.changed()
+
+    def refresh_norms(self):
+        """Recompute every document's norm with the current IDF (norms are otherwise fixed when indexed)."""
+        for corpus in self.corpora.values():
+            doc_ids, matrix, _ = corpus.matrix(len(self.columns))
+            norms = np.sqrt(matrix.multiply(matrix).T @ self.idf_array(matrix.shape[0]) ** 2)
+            corpus.norms = dict(zip(doc_ids.tolist(), norms.tolist()))
+            corpus.changed()
+        return self
+
+    def remove(self, side, doc_id):
+        corpus = self.corpora[side]
+        vector = corpus.vectors.pop(doc_id, None)
+        if vector is None:
+            return
+        columns, _ = corpus.rows.pop(doc_id)
+        del corpus.norms[doc_id]
+        self.documents -= 1
+        self.document_frequency[columns] -= 1
+        corpus.changed()
+
+    def top(self, side, vector, k=MATCHES_PER_DOCUMENT, min_score=MIN_SCORE):
+        """``[(doc_id, score)]``: the ``k`` documents of ``side`` most similar to ``vector``, best first."""
+        return self.top_many(side, [vector], k, min_score)[0]
+
+    def top_many(self, side, vectors, k=MATCHES_PER_DOCUMENT, min_score=MIN_SCORE):
+        """``top()`` for each of ``vectors``, scored ``QUERY_CHUNK`` at a time by one sparse product."""
+        doc_ids, matrix, norms = self.corpora[side].matrix(len(self.columns))
+        results = []
+        for start in range(0, len(vectors), QUERY_CHUNK):
+            chunk = vectors[start:start + QUERY_CHUNK]
+            query_norms = [self.norm(vector) for vector in chunk]
+            dots = self.queries(chunk, matrix.shape[0]) @ matrix
+            for row, norm in enumerate(query_norms):
+                if not norm:
+                    results.append([])
+                    continue
+                candidates = dots.indices[dots.indptr[row]:dots.indptr[row + 1]]
+                scores = dots.data[dots.indptr[row]:dots.indptr[row + 1]] / (norm * norms[candidates])
+                results.append(self.best(doc_ids, candidates, scores, k, min_score))
+        return results
+
+    def queries(self, vectors, width):
+        """CSR query rows over the first ``width`` columns, weighted by idf squared.
+
+        Both vectors carry idf(term); the document's is applied here, as the
+        matrix holds raw term frequencies.
+        """
+        indptr, indices, data = [0], [], []
+        for vector in vectors:
+            for term, tf in vector.items():
+                column = self.columns.get(term)
+                if column is not None and column < width:
+                    indices.append(column)
+                    data.append(tf * self.idf(term) ** 2)
+            indptr.append(len(indices))
+        return csr_matrix((np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), indptr),
+                          shape=(len(vectors), width))
+
+    @staticmethod
+    def best(doc_ids, candidates, scores, k, min_score):
+        keep = (scores >= min_score) & (scores > 0)
+        candidates, scores = candidates[keep], scores[keep]
+        if len(scores) > k:
+            # Everything tied with the k-th best score stays, so ties still break by doc id.
+            keep = scores >= np.partition(scores, len(scores) - k)[len(scores) - k]
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((doc_ids[candidates], scores))[::-1][:k]
+        return [(int(doc_ids[candidates[i]]), float(scores[i])) for i in order]
+
+
+match_engine = VersionedBuild('lost-item-matching', MatchEngine.from_database)
+
+
+# The engine is updated in place by sync(), so users take turns.
+_engine_lock = threading.RLock()
+
+
+def get_match_engine():
+    return match_engine.get().sync()
+
+
+def invalidate_match_engine():
+    match_engine.invalidate()
+
+
+@task()
+def match_document(side, pk):
+    """Replace the stored matches of one item (``side='item'``) or report with fresh ones."""
+    field, other = ('item', 'report') if side == 'item' else ('report', 'item')
+    with _engine_lock:
+        engine = get_match_engine()
+        vector = engine.corpora[side].vectors.get(pk) or engine.load(side, pk)
+        candidates = engine.top(other, vector) if vector else []
+    with transaction.atomic():
+        LostItemMatch.objects.filter(**{f'{field}_id': pk}).delete()
+        LostItemMatch.objects.bulk_create([
+            LostItemMatch(**{f'{field}_id': pk, f'{other}_id': other_pk}, score=round(score, 4))
+            for other_pk, score in candidates
+        ])
+    return candidates
+
+
+def rematch_all():
+    """Rebuild the engine and every stored match; returns the number of matches written."""
+    invalidate_match_engine()
+    with _engine_lock:
+        engine = get_match_engine()
+        reports = engine.corpora['report'].vectors
+        matches = [
+            LostItemMatch(report_id=report_pk, item_id=item_pk, score=round(score, 4))
+            for report_pk, candidates in zip(reports, engine.top_many('item', list(reports.values())))
+            for item_pk, score in candidates
+        ]
+    with transaction.atomic():
+        LostItemMatch.objects.all().delete()
+        LostItemMatch.objects.bulk_create(matches, batch_size=BATCH_SIZE)
+    return len(matches)
+
+
+def schedule_matching(side, pk):
+    """Match a saved item or report in the background once the current transaction commits."""
+    match_document.delay(side, pk)
@@ -0,0 +1,277 @@
+"""Per-request performance metrics: Prometheus histograms and Server-Timing headers.
+
+MetricsMiddleware opens a RequestMetrics for each request in a context
+variable. Database time is added by an execute wrapper that every new
+connection gets (see ``metro.signals``). Serializer and render time are
+added by ``TimedSerializerMixin`` and ``timed()``. When the response is
+ready, the totals go into histograms keyed by the route's URL name (e.g.
+``journey-list``). Those are served in the Prometheus text format at
+``/metrics``, and the totals are also sent to the browser in a
+``Server-Timing`` header.
+
+Metrics are kept per process: with several workers, scrape each one or
+accept per-worker samples. Recording costs a few microseconds per request.
+"""
+import ipaddress
+import math
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.bounds = tuple(buckets)
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            entry = self.values.get(label_values)
+            if entry is None:
+                entry = self.values[label_values] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self.values.items()}
+        for label_values, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_number(bound)}"')
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_number(total)}'
+            yield f'{self.name}_count{labels} {count}'
+
+
+REQUESTS = Counter('metro_http_requests_total', 'Requests by route, method and status code.',
+                   ('route', 'method', 'status'))
+LATENCY = Histogram('metro_http_request_duration_seconds', 'Time from the first middleware to the response.',
+                    ('route', 'method'))
+DB_QUERIES = Histogram('metro_db_queries_per_request', 'SQL statements executed per request.', ('route',),
+                       QUERY_COUNT_BUCKETS)
+DB_TIME = Histogram('metro_db_duration_seconds', 'Time per request spent executing SQL.', ('route',))
+PHASE_TIME = Histogram('metro_phase_duration_seconds',
+                       'Time per request spent serializing objects (serialize) and encoding the response (render).',
+                       ('route', 'phase'))
+RESPONSE_SIZE = Histogram('metro_http_response_size_bytes', 'Response body size (non-streaming responses).',
+                          ('route',), SIZE_BUCKETS)
+METRICS = [REQUESTS, LATENCY, DB_QUERIES, DB_TIME, PHASE_TIME, RESPONSE_SIZE]
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'phases', 'depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        # Nesting level of timed sections; only the outermost one is counted.
+        self.depth = 0
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper adding each statement to the current request's totals."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+@contextmanager
+def timed(phase):
+    """Add the enclosed time to ``phase`` of the current request, unless already inside a timed section."""
+    metrics = _current.get()
+    if metrics is None or metrics.depth:
+        yield
+        return
+    metrics.depth += 1
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth -= 1
+        metrics.add(phase, perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Counts a serializer's ``to_representation`` as the request's serialize time.
+
+    Written out rather than using ``timed()``, since it runs once per object
+    of a list.
+    """
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.depth:
+            return super().to_representation(instance)
+        metrics.depth += 1
+        start = perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.depth -= 1
+            metrics.add('serialize', perf_counter() - start)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+def server_timing(metrics, total):
+    parts = [f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"']
+    parts.extend(f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in metrics.phases.items())
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    """Outermost middleware: records each request's metrics and adds a ``Server-Timing`` header."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    def finish(self, request, response, metrics, total):
+        route = route_name(request)
+        # Clients can send any method name; each would be a new series.
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        REQUESTS.inc((route, method, str(response.status_code)))
+        LATENCY.observe((route, method), total)
+        DB_QUERIES.observe((route,), metrics.queries)
+        DB_TIME.observe((route,), metrics.db_time)
+        for phase, seconds in metrics.phases.items():
+            PHASE_TIME.observe((route, phase), seconds)
+        if not response.streaming:
+            RESPONSE_SIZE.observe((route,), len(response.content))
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(metrics, total)
+        return response
+
+
+def metrics_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        header = request.headers.get('Authorization', '')
+        return header.startswith('Bearer ') and constant_time_compare(header[7:], token)
+    if not settings.DEBUG:
+        return False
+    try:
+        return ipaddress.ip_address(request.META.get('REMOTE_ADDR', '')).is_loopback
+    except ValueError:
+        return False
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: bearer ``METRICS_TOKEN``, or loopback clients while DEBUG is on."""
+    if not metrics_allowed(request):
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
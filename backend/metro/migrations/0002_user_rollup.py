@@ -0,0 +1,60 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Journey = apps.get_model('metro', 'Journey')
+    Payment = apps.get_model('metro', 'Payment')
+    UserRollup = apps.get_model('metro', 'UserRollup')
+
+    journeys = (
+        Journey.objects.annotate(month=TruncMonth('date'))
+        .values('user_id', 'month', 'route')
+        .annotate(count=Count('id'), amount=Sum('fare'))
+    )
+    payments = (
+        Payment.objects.annotate(month=TruncMonth('timestamp'))
+        .values('user_id', 'month', 'method')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+    UserRollup.objects.bulk_create([
+        UserRollup(user_id=row['user_id'], month=row['month'].strftime('%Y-%m'), kind='journey',
+                   key=row['route'], count=row['count'], amount=row['amount'])
+        for row in journeys
+    ] + [
+        UserRollup(user_id=row['user_id'], month=row['month'].strftime('%Y-%m'), kind='payment',
+                   key=row['method'], count=row['count'], amount=row['amount'])
+        for row in payments
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7)),
+                ('kind', models.CharField(choices=[('journey', 'Journey'), ('payment', 'Payment')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'kind', 'key'), name='unique_user_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0002_user_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['user', 'submitted_at'], name='complaint_user_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['user', 'status', 'submitted_at'], name='complaint_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['created_at'], name='feedback_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['user', 'date'], name='journey_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lostitem',
+            index=models.Index(fields=['status'], name='lostitem_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'timestamp'], name='payment_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlostreport',
+            index=models.Index(fields=['user', 'submitted_at'], name='lostreport_user_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0003_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'reference'], name='payment_user_reference_idx'),
+        ),
+    ]
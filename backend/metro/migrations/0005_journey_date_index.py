@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0004_payment_reference_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='journey',
+            index=models.Index(fields=['date'], name='journey_date_idx'),
+        ),
+    ]
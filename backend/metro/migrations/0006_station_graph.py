@@ -0,0 +1,54 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0005_journey_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Line',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('color', models.CharField(blank=True, max_length=7)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LineStop',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('travel_seconds', models.PositiveIntegerField(default=0)),
+                ('line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='metro.line')),
+            ],
+            options={
+                'ordering': ['line', 'sequence'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('lines', models.ManyToManyField(related_name='stations', through='metro.LineStop', to='metro.line')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='linestop',
+            name='station',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='metro.station'),
+        ),
+        migrations.AddConstraint(
+            model_name='linestop',
+            constraint=models.UniqueConstraint(fields=('line', 'sequence'), name='unique_line_sequence'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0006_station_graph'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Service',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True)),
+                ('days', models.PositiveSmallIntegerField(default=127)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Trip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64, unique=True)),
+                ('headsign', models.CharField(blank=True, max_length=255)),
+                ('line', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='metro.line')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trips', to='metro.service')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StopTime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('arrival', models.PositiveIntegerField()),
+                ('departure', models.PositiveIntegerField()),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stop_times', to='metro.station')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stop_times', to='metro.trip')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stoptime',
+            constraint=models.UniqueConstraint(fields=('trip', 'sequence'), name='unique_trip_sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='stoptime',
+            index=models.Index(fields=['station', 'departure'], name='stoptime_station_departure_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Per model table: searchable columns as (name, tsvector weight), then filter columns.
+SEARCH_TABLES = {
+    'metro_lostitem': ([('title', 'A'), ('location', 'B'), ('description', 'C')], []),
+    'metro_userlostreport': ([('title', 'A'), ('description', 'C')], ['user_id']),
+}
+
+
+def create_search_tables(apps, schema_editor):
+    """Create and fill the side tables metro.search reads (FTS5 on SQLite, tsvector + GIN on PostgreSQL)."""
+    vendor = schema_editor.connection.vendor
+    for source, (fields, filters) in SEARCH_TABLES.items():
+        table = f'{source}_search'
+        names = [name for name, weight in fields]
+        extra = ''.join(f', {name}' for name in filters)
+        if vendor == 'postgresql':
+            filter_columns = ''.join(f', {name} bigint' for name in filters)
+            document = ' || '.join(
+                f"setweight(to_tsvector('english', coalesce({name}, '')), '{weight}')" for name, weight in fields
+            )
+            schema_editor.execute(f'CREATE TABLE {table} (id bigint PRIMARY KEY, document tsvector NOT NULL{filter_columns})')
+            schema_editor.execute(f'CREATE INDEX {table}_document_idx ON {table} USING GIN (document)')
+            schema_editor.execute(f'INSERT INTO {table} (id, document{extra}) SELECT id, {document}{extra} FROM {source}')
+        elif vendor == 'sqlite':
+            definitions = ', '.join(names + [f'{name} UNINDEXED' for name in filters])
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5({definitions}, tokenize='porter unicode61 remove_diacritics 2')"
+            )
+            columns = ', '.join(names) + extra
+            schema_editor.execute(f'INSERT INTO {table} (rowid, {columns}) SELECT id, {columns} FROM {source}')
+        else:
+            raise NotImplementedError(f'Full-text search is not supported on {vendor}.')
+
+
+def drop_search_tables(apps, schema_editor):
+    for source in SEARCH_TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {source}_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0007_timetable'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-18 12:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LostItemMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='metro.lostitem')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='metro.userlostreport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['report', '-score'], name='match_report_score_idx'), models.Index(fields=['item', '-score'], name='match_item_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lostitemmatch',
+            constraint=models.UniqueConstraint(fields=('item', 'report'), name='unique_lost_item_match'),
+        ),
+    ]
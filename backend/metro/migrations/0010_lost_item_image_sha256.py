@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0009_lost_item_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lostitem',
+            name='image_sha256',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-18 13:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_payments(apps, schema_editor):
+    """Keep the first payment per (user, reference) and give the others a ``-dup<id>`` suffix.
+
+    Nothing is deleted: journeys and rollups stay as they are, and the
+    renamed payments can be reviewed (and removed by hand) afterwards.
+    """
+    Payment = apps.get_model('metro', 'Payment')
+    max_length = Payment._meta.get_field('reference').max_length
+
+    duplicated = (
+        Payment.objects.values('user_id', 'reference')
+        .annotate(count=Count('id'), keep=Min('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicated:
+        extra = Payment.objects.filter(user_id=row['user_id'], reference=row['reference']).exclude(pk=row['keep'])
+        for payment in extra:
+            suffix = f'-dup{payment.pk}'
+            payment.reference = payment.reference[:max_length - len(suffix)] + suffix
+            payment.save(update_fields=['reference'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metro', '0011_task_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_payments, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_user_reference_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('user', 'reference'), name='unique_payment_reference'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 class User(AbstractUser):
@@ -14,6 +15,12 @@ class Journey(models.Model):
     fare = models.DecimalField(max_digits=10, decimal_places=2)
     payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='journey_user_date_idx'),
+            models.Index(fields=['date'], name='journey_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s journey on {self.date}"
 
@@ -31,6 +38,15 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='payment_user_timestamp_idx'),
+        ]
+        constraints = [
+            # Makes bulk payment uploads idempotent (metro.bulk).
+            models.UniqueConstraint(fields=['user', 'reference'], name='unique_payment_reference'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s payment of {self.amount}"
 
@@ -38,10 +54,17 @@ class LostItem(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     image_url = models.ImageField(upload_to='lost_items/', null=True, blank=True)
+    # SHA-256 of the uploaded photo once metro.images has processed it.
+    image_sha256 = models.CharField(max_length=64, blank=True, default='', editable=False)
     location = models.CharField(max_length=255)
     status = models.CharField(max_length=10, choices=[('claimed', 'Claimed'), ('unclaimed', 'Unclaimed')])
     posted_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='lostitem_status_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -52,15 +75,44 @@ class UserLostReport(models.Model):
     contact = models.CharField(max_length=255)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'submitted_at'], name='lostreport_user_submitted_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s lost report: {self.title}"
 
+class LostItemMatch(models.Model):
+    """A found item that may be what a lost report describes, scored by metro.matching (cosine similarity, 0-1)."""
+    item = models.ForeignKey(LostItem, on_delete=models.CASCADE, related_name='matches')
+    report = models.ForeignKey(UserLostReport, on_delete=models.CASCADE, related_name='matches')
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'report'], name='unique_lost_item_match'),
+        ]
+        indexes = [
+            models.Index(fields=['report', '-score'], name='match_report_score_idx'),
+            models.Index(fields=['item', '-score'], name='match_item_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.item.title} ~ {self.report.title} ({self.score:.2f})'
+
 class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.IntegerField()
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='feedback_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s feedback"
 
@@ -83,5 +135,141 @@ class Complaint(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'submitted_at'], name='complaint_user_submitted_idx'),
+            models.Index(fields=['user', 'status', 'submitted_at'], name='complaint_user_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.name}'s complaint: {self.title}"
+
+class UserRollup(models.Model):
+    KIND_CHOICES = [
+        ('journey', 'Journey'),
+        ('payment', 'Payment'),
+    ]
+
+    # One row per (user, month, kind, key): key is the route for journeys and
+    # the method for payments, so every dashboard figure is a sum over a
+    # handful of rows instead of a scan over the user's full history.
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.CharField(max_length=7)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'kind', 'key'], name='unique_user_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} rollup for user {self.user_id} ({self.month}, {self.key})"
+
+class Line(models.Model):
+    code = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=255)
+    color = models.CharField(max_length=7, blank=True)
+
+    def __str__(self):
+        return self.name
+
+class Station(models.Model):
+    code = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    lines = models.ManyToManyField(Line, through='LineStop', related_name='stations')
+
+    def __str__(self):
+        return self.name
+
+class LineStop(models.Model):
+    # Consecutive stops on a line form the edges of the station graph; the
+    # distance and running time are measured from the previous stop.
+    line = models.ForeignKey(Line, on_delete=models.CASCADE, related_name='stops')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField()
+    distance_km = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    travel_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['line', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['line', 'sequence'], name='unique_line_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.line.code} #{self.sequence}: {self.station.name}"
+
+class Service(models.Model):
+    # GTFS calendar entry: which weekdays a set of trips runs on, as a
+    # bitmask with Monday = 1 through Sunday = 64.
+    code = models.CharField(max_length=64, unique=True)
+    days = models.PositiveSmallIntegerField(default=127)
+
+    def runs_on(self, weekday):
+        return bool(self.days & (1 << weekday))
+
+    def __str__(self):
+        return self.code
+
+class Trip(models.Model):
+    code = models.CharField(max_length=64, unique=True)
+    line = models.ForeignKey(Line, on_delete=models.CASCADE, related_name='trips')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='trips')
+    headsign = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return self.code
+
+class StopTime(models.Model):
+    # Times are seconds after midnight of the service day; like GTFS they may
+    # exceed 24h for trips that run past midnight.
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='stop_times')
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name='stop_times')
+    sequence = models.PositiveIntegerField()
+    arrival = models.PositiveIntegerField()
+    departure = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'sequence'], name='unique_trip_sequence'),
+        ]
+        indexes = [
+            models.Index(fields=['station', 'departure'], name='stoptime_station_departure_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trip.code} #{self.sequence}"
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # A background job for ``manage.py run_tasks`` (see metro.tasks): the
+    # dotted name of a registered function and its JSON arguments.
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    created_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+            models.Index(fields=['status', 'finished_at'], name='task_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,27 @@
+"""Mail to staff about things that need a person soon."""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from .models import Complaint, User
+from .tasks import task
+
+
+def staff_emails():
+    return list(User.objects.filter(is_admin=True, is_active=True).exclude(email='').values_list('email', flat=True))
+
+
+@task(max_attempts=5, retry_delay=30)
+def notify_urgent_complaint(complaint_id):
+    complaint = Complaint.objects.select_related('user').filter(pk=complaint_id).first()
+    recipients = staff_emails()
+    if complaint is None or complaint.status != 'open' or not recipients:
+        return
+    send_mail(
+        f'Urgent complaint: {complaint.title}',
+        f'{complaint.user.name} <{complaint.user.email}> reported at {complaint.submitted_at:%Y-%m-%d %H:%M}:\n\n'
+        f'{complaint.description}\n\n'
+        f'Admin: {reverse("admin:metro_complaint_change", args=[complaint.pk])}\n',
+        settings.DEFAULT_FROM_EMAIL,
+        recipients,
+    )
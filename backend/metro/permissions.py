@@ -0,0 +1,9 @@
+from rest_framework import permissions
+
+
+class IsMetroAdmin(permissions.BasePermission):
+    """Staff accounts and users flagged ``is_admin`` in the metro app."""
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or user.is_admin))
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left
+
+from .timetable import format_time, get_timetable
+
+MAX_ROUNDS = 5
+UNREACHED = 2 ** 31 - 1
+
+
+class RaptorPlanner:
+    """Round-based earliest-arrival routing (RAPTOR) over one weekday's trips.
+
+    Trips with the same stop pattern are grouped into routes. Each route's
+    times are stored stop-major in flat arrays, ``base + stop * trip_count +
+    trip``, with trips ordered by departure, so the earliest trip catchable
+    at a stop is a bisect over one contiguous column. Round ``k`` extends
+    journeys with ``k - 1`` transfers by one more ride.
+    """
+
+    def __init__(self, timetable, weekday):
+        self.timetable = timetable
+        patterns = {}
+        for position in timetable.running_trips(weekday):
+            stops = tuple(timetable.stop_stations[timetable.trip_offsets[position]:timetable.trip_offsets[position + 1]])
+            patterns.setdefault(stops, []).append(position)
+
+        self.route_stops = []
+        self.route_trips = []
+        self.route_base = array('l')
+        self.arrivals = array('l')
+        self.departures = array('l')
+        self.station_routes = [[] for _ in timetable.stations]
+        for stops, trips in patterns.items():
+            # Trips on one pattern don't overtake, so ordering by first departure
+            # orders every column.
+            trips.sort(key=lambda position: timetable.departures[timetable.trip_offsets[position]])
+            route = len(self.route_stops)
+            self.route_stops.append(stops)
+            self.route_trips.append(array('l', trips))
+            self.route_base.append(len(self.arrivals))
+            for index in range(len(stops)):
+                for position in trips:
+                    stop = timetable.trip_offsets[position] + index
+                    self.arrivals.append(timetable.arrivals[stop])
+                    self.departures.append(timetable.departures[stop])
+            for index, station in enumerate(stops):
+                self.station_routes[station].append((route, index))
+
+    def earliest_arrival(self, origin, destination, after, max_rounds=MAX_ROUNDS):
+        """Legs ``(route, trip, board_index, alight_index)`` of the earliest arrival, or ``None``."""
+        if origin == destination:
+            return []
+        best = [UNREACHED] * len(self.timetable.stations)
+        best[origin] = after
+        previous = list(best)
+        # parents[k][station]: the ride that first reached ``station`` in round k.
+        parents = [{}]
+        marked = {origin}
+
+        for _ in range(max_rounds):
+            queue = {}
+            for station in marked:
+                for route, index in self.station_routes[station]:
+                    if index < queue.get(route, UNREACHED):
+                        queue[route] = index
+            marked = set()
+            current = list(previous)
+            rides = {}
+
+            for route, start in queue.items():
+                stops = self.route_stops[route]
+                trip_count = len(self.route_trips[route])
+                base = self.route_base[route]
+                trip = board = None
+                for index in range(start, len(stops)):
+                    station = stops[index]
+                    column = base + index * trip_count
+                    if trip is not None:
+                        arrival = self.arrivals[column + trip]
+                        if arrival < best[station] and arrival < best[destination]:
+                            best[station] = current[station] = arrival
+                            rides[station] = (route, trip, board, index)
+                            marked.add(station)
+                    ready = previous[station]
+                    if ready != UNREACHED and (trip is None or ready <= self.departures[column + trip]):
+                        earliest = bisect_left(self.departures, ready, column, column + trip_count) - column
+                        if earliest < trip_count and (trip is None or earliest < trip):
+                            trip, board = earliest, index
+
+            parents.append(rides)
+            if not marked:
+                break
+            previous = current
+
+        if best[destination] == UNREACHED:
+            return None
+        legs = []
+        station, round_ = destination, len(parents) - 1
+        while station != origin:
+            while station not in parents[round_]:
+                round_ -= 1
+            leg = parents[round_][station]
+            legs.append(leg)
+            station, round_ = self.route_stops[leg[0]][leg[2]], round_ - 1
+        legs.reverse()
+        return legs
+
+    def describe(self, legs):
+        stations = self.timetable.stations
+        trips = self.timetable.trips
+        described = []
+        for route, trip, board, alight in legs:
+            stops = self.route_stops[route]
+            base = self.route_base[route]
+            trip_count = len(self.route_trips[route])
+            info = trips[self.route_trips[route][trip]]
+            described.append({
+                'line': info['line__code'],
+                'trip': info['code'],
+                'headsign': info['headsign'] or stations[stops[-1]].name,
+                'from': {'code': stations[stops[board]].code, 'name': stations[stops[board]].name},
+                'to': {'code': stations[stops[alight]].code, 'name': stations[stops[alight]].name},
+                'departure': format_time(self.departures[base + board * trip_count + trip]),
+                'arrival': format_time(self.arrivals[base + alight * trip_count + trip]),
+                'stops': alight - board,
+            })
+        return described
+
+
+def get_planner(weekday):
+    """RaptorPlanner for ``weekday``, built once per timetable version."""
+    return get_timetable().derived(('raptor', weekday), lambda timetable: RaptorPlanner(timetable, weekday))
+
+
+class UnscheduledStation(ValueError):
+    """Raised by plan_journey for stations the current timetable doesn't know yet."""
+
+    def __init__(self, stations):
+        super().__init__(stations)
+        self.stations = stations
+
+
+def plan_journey(origin, destination, weekday, after):
+    """Earliest-arrival itinerary between two Stations, or ``None`` if there is none that day."""
+    planner = get_planner(weekday)
+    positions = planner.timetable.positions
+    missing = [station for station in (origin, destination) if station.id not in positions]
+    if missing:
+        raise UnscheduledStation(missing)
+    legs = planner.earliest_arrival(positions[origin.id], positions[destination.id], after)
+    if not legs:
+        return None
+    legs = planner.describe(legs)
+    return {
+        'departure': legs[0]['departure'],
+        'arrival': legs[-1]['arrival'],
+        'transfers': len(legs) - 1,
+        'legs': legs,
+    }
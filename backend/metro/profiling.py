@@ -0,0 +1,255 @@
+"""Opt-in profiling: a slow-query log and a sampling profiler for requests.
+
+Every SQL statement slower than ``PROFILE_SLOW_QUERY_MS`` is logged as a
+warning on this module's logger. The entry names the request and route it
+ran under and the project code that issued it, innermost frame first.
+Parameter values are only logged with ``PROFILE_SLOW_QUERY_PARAMS``.
+
+``ProfilingMiddleware`` picks a ``PROFILE_SAMPLE_RATE`` fraction of requests
+to profile. One background thread looks at each picked request's stack
+every ``PROFILE_SAMPLE_INTERVAL`` seconds. Each request's samples are
+written to ``PROFILE_DIR`` as collapsed stacks, one ``frame;frame;... count``
+line per distinct stack. flamegraph.pl and speedscope read this format as
+is. ``manage.py profile_report`` merges the files into the hottest paths
+and functions.
+
+Only sync requests are sampled. An async view shares its event loop
+thread with other requests, so its samples could not be told apart.
+"""
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import route_name
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.folded'
+
+_request = ContextVar('profiled_request', default=None)
+
+
+def describe_request(request):
+    if request is None:
+        return 'outside a request'
+    return f'{request.method} {request.path} ({route_name(request)})'
+
+
+def _project_dir():
+    return str(settings.BASE_DIR) + os.sep
+
+
+def _is_project_frame(filename, project):
+    return (filename.startswith(project) and 'site-packages' not in filename
+            and not filename.endswith(('profiling.py', 'metrics.py')))
+
+
+def query_origin(limit=5):
+    """The innermost project frames calling into the database, as ``path:line in function``."""
+    project = _project_dir()
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        if _is_project_frame(code.co_filename, project):
+            frames.append(f'{code.co_filename[len(project):]}:{frame.f_lineno} in {code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def describe_params(params, many):
+    """``3 params (int, str, NoneType)``, without the values."""
+    if params is None:
+        return 'none'
+    if many:
+        return 'executemany'
+    params = list(params.values()) if isinstance(params, dict) else list(params)
+    return f'{len(params)} params ({", ".join(type(value).__name__ for value in params[:20])})'
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Connection execute wrapper logging statements slower than ``PROFILE_SLOW_QUERY_MS``."""
+    threshold = getattr(settings, 'PROFILE_SLOW_QUERY_MS', None)
+    if threshold is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (perf_counter() - start) * 1000
+        if elapsed >= threshold:
+            origin = query_origin()
+            # Bound values can be password hashes, emails or payment
+            # references, so only their types are logged unless asked for.
+            if getattr(settings, 'PROFILE_SLOW_QUERY_PARAMS', False):
+                shown = repr(params)[:500]
+            else:
+                shown = describe_params(params, many)
+            logger.warning('Slow query: %.1f ms in %s from %s\n%s\nparams: %s',
+                           elapsed, describe_request(_request.get()),
+                           ' < '.join(origin) or 'unknown code', sql[:2000], shown)
+
+
+@lru_cache(maxsize=None)
+def frame_label(code):
+    """``metro/views.py:JourneyViewSet.get_queryset``; library paths start at their package."""
+    filename = code.co_filename
+    project = _project_dir()
+    if 'site-packages' in filename:
+        filename = filename.rsplit('site-packages' + os.sep, 1)[-1]
+    elif filename.startswith(project):
+        filename = filename[len(project):]
+    else:
+        filename = os.path.basename(filename)
+    # co_qualname is new in Python 3.11.
+    return f'{filename}:{getattr(code, "co_qualname", code.co_name)}'.replace(';', ':').replace(' ', '_')
+
+
+def collapse(frame, root_code):
+    """The stack from ``frame`` up to (not including) ``root_code``'s frame, root first, joined by ``;``."""
+    labels = []
+    while frame is not None and frame.f_code is not root_code:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Sampler:
+    """One daemon thread sampling the stacks of the threads registered with ``start()``.
+
+    It sleeps on an event while nothing is registered, so idle processes pay
+    nothing for it.
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def start(self, root_code, interval):
+        """Sample the calling thread's stack below ``root_code``'s frame; returns the sample counter."""
+        samples = Counter()
+        with self.lock:
+            self.targets[threading.get_ident()] = (root_code, samples)
+            self.interval = interval
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='profile-sampler', daemon=True)
+                self.thread.start()
+        self.wake.set()
+        return samples
+
+    def stop(self):
+        with self.lock:
+            self.targets.pop(threading.get_ident(), None)
+            if not self.targets:
+                self.wake.clear()
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            time.sleep(self.interval)
+            # Under the lock, so a request's counter is final once stop() returns.
+            with self.lock:
+                frames = sys._current_frames()
+                for thread_id, (root_code, samples) in self.targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = collapse(frame, root_code)
+                        if stack:
+                            samples[stack] += 1
+                del frames
+
+
+sampler = Sampler()
+
+
+def file_route(route):
+    return re.sub(r'[^\w.-]', '_', route)
+
+
+def dump_profile(samples, route, directory):
+    """Write one request's samples to ``<route>-<time>-<pid>.folded`` in ``directory``."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{file_route(route)}-{time.time_ns()}-{os.getpid()}{SUFFIX}'
+    path.write_text(''.join(f'{stack} {count}\n' for stack, count in samples.items()))
+    return path
+
+
+def route_from_filename(path):
+    return path.name.rsplit('-', 2)[0]
+
+
+def load_profiles(directory, route=None):
+    """Merge the dumps in ``directory`` (optionally one route's): returns stack counts and samples per route."""
+    stacks, routes = Counter(), Counter()
+    for path in sorted(Path(directory).glob(f'*{SUFFIX}')):
+        name = route_from_filename(path)
+        if route is not None and name != file_route(route):
+            continue
+        for line in path.read_text().splitlines():
+            stack, _, count = line.rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+                routes[name] += int(count)
+    return stacks, routes
+
+
+def function_totals(stacks):
+    """Samples per function: ``self`` when it was the running frame, ``total`` when it was anywhere on the stack."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return own, total
+
+
+class ProfilingMiddleware:
+    """Samples the stacks of a ``PROFILE_SAMPLE_RATE`` fraction of requests and binds each request for the slow-query log."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+            if not rate or random.random() >= rate:
+                return self.get_response(request)
+            samples = sampler.start(ProfilingMiddleware.__call__.__code__, settings.PROFILE_SAMPLE_INTERVAL)
+            try:
+                return self.get_response(request)
+            finally:
+                sampler.stop()
+                if samples:
+                    dump_profile(samples, route_name(request), settings.PROFILE_DIR)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
@@ -0,0 +1,31 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timed
+
+# orjson handles str/int/float/bool/None, dicts and lists (and their
+# subclasses), dates, times, datetimes and UUIDs natively; everything else
+# goes through DRF's encoder so the output matches JSONRenderer's.
+_fallback = JSONEncoder().default
+_options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer that encodes with orjson.
+
+    Output is the same compact UTF-8 JSON as DRF's renderer, including the
+    escaped U+2028/U+2029 that keep it safe to embed in a <script> tag.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = _options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        with timed('render'):
+            content = orjson.dumps(data, default=_fallback, option=options)
+        if b'\xe2\x80' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
@@ -0,0 +1,199 @@
+import re
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .caching import invalidate_responses
+from .models import Journey, Payment, UserRollup
+
+CENTS = Decimal('0.01')
+# Most rows ``?recent=`` returns of each kind.
+MAX_RECENT = 20
+
+
+def month_key(value):
+    return value.strftime('%Y-%m')
+
+
+def format_amount(value):
+    return str(Decimal(value or 0).quantize(CENTS))
+
+
+def journey_rollup_key(journey):
+    return journey.user_id, month_key(journey.date), 'journey', journey.route, journey.fare
+
+
+def payment_rollup_key(payment):
+    return payment.user_id, month_key(payment.timestamp), 'payment', payment.method, payment.amount
+
+
+ROLLUP_KEYS = {
+    Journey: journey_rollup_key,
+    Payment: payment_rollup_key,
+}
+
+
+def bump(user_id, month, kind, key, count, amount):
+    """Atomically add ``count``/``amount`` to a single rollup row."""
+    lookup = dict(user_id=user_id, month=month, kind=kind, key=key)
+    delta = dict(count=F('count') + count, amount=F('amount') + amount)
+    if UserRollup.objects.filter(**lookup).update(**delta) or count <= 0:
+        # Decrements never create rows: a missing row means the user's
+        # rollups are being cascade-deleted along with the user.
+        return
+    try:
+        with transaction.atomic():
+            UserRollup.objects.create(count=count, amount=amount, **lookup)
+    except IntegrityError:
+        # Another request created the row between our update and insert.
+        UserRollup.objects.filter(**lookup).update(**delta)
+
+
+def bump_many(instances):
+    """Add freshly bulk-created rows to the rollups with one update per rollup row."""
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for instance in instances:
+        *row, amount = ROLLUP_KEYS[type(instance)](instance)
+        total = totals[tuple(row)]
+        total[0] += 1
+        total[1] += amount
+    for (user_id, month, kind, key), (count, amount) in totals.items():
+        bump(user_id, month, kind, key, count, amount)
+
+
+def rebuild_user_rollups(user_id):
+    """Recompute every rollup row for a user from the source tables."""
+    journeys = (
+        Journey.objects.filter(user_id=user_id)
+        .annotate(month=TruncMonth('date'))
+        .values('month', 'route')
+        .annotate(count=Count('id'), amount=Sum('fare'))
+    )
+    payments = (
+        Payment.objects.filter(user_id=user_id)
+        .annotate(month=TruncMonth('timestamp'))
+        .values('month', 'method')
+        .annotate(count=Count('id'), amount=Sum('amount'))
+    )
+    rows = [
+        UserRollup(user_id=user_id, month=month_key(row['month']), kind='journey',
+                   key=row['route'], count=row['count'], amount=row['amount'])
+        for row in journeys
+    ] + [
+        UserRollup(user_id=user_id, month=month_key(row['month']), kind='payment',
+                   key=row['method'], count=row['count'], amount=row['amount'])
+        for row in payments
+    ]
+    with transaction.atomic():
+        UserRollup.objects.filter(user_id=user_id).delete()
+        UserRollup.objects.bulk_create(rows)
+    # The journey summary is served from these rows.
+    invalidate_responses('journey', user_id)
+
+
+def summary_params(params):
+    """``(kwargs, errors)`` for ``user_summary`` from a request's ``month`` and ``recent`` parameters."""
+    month, recent = params.get('month'), params.get('recent', '0')
+    if month and not re.fullmatch(r'\d{4}-\d{2}', month):
+        return None, {'month': 'Expected YYYY-MM.'}
+    if not recent.isdigit():
+        return None, {'recent': 'Expected a number of rows.'}
+    return {'month': month, 'recent': min(int(recent), MAX_RECENT)}, None
+
+
+def summary_querysets(user_id, month=None, recent=0):
+    """The queries behind a user summary, shared by ``user_summary`` and ``auser_summary``."""
+    rollups = UserRollup.objects.filter(user_id=user_id, count__gt=0)
+    journeys = rollups.filter(kind='journey')
+    payments = rollups.filter(kind='payment')
+    totals = {'count': Sum('count'), 'amount': Sum('amount')}
+    return {
+        'journey_totals': (journeys, totals),
+        'payment_totals': (payments, totals),
+        'monthly': journeys.values('month').annotate(**totals).order_by('month'),
+        'routes': journeys.values('key').annotate(**totals).order_by('-count', 'key'),
+        'payment_methods': payments.values('key').annotate(**totals).order_by('key'),
+        'month_totals': (journeys.filter(month=month), totals) if month else None,
+        'month_routes': journeys.filter(month=month).order_by('-count', 'key').values('key', 'count', 'amount')
+        if month else None,
+        # The newest rows, so a dashboard needs no other request.
+        'recent_journeys': Journey.objects.filter(user_id=user_id).order_by('-date', '-id')
+        .values('id', 'date', 'route', 'fare', 'payment_id', 'payment__method')[:recent] if recent else None,
+        'recent_payments': Payment.objects.filter(user_id=user_id).order_by('-timestamp', '-id')
+        .values('id', 'method', 'reference', 'amount', 'timestamp')[:recent] if recent else None,
+    }
+
+
+def format_summary(results, month=None, recent=0):
+    summary = {
+        'total_journeys': results['journey_totals']['count'] or 0,
+        'total_fare': format_amount(results['journey_totals']['amount']),
+        'total_payments': results['payment_totals']['count'] or 0,
+        'total_paid': format_amount(results['payment_totals']['amount']),
+        'monthly': [
+            {'month': row['month'], 'journeys': row['count'], 'spent': format_amount(row['amount'])}
+            for row in results['monthly']
+        ],
+        'routes': [
+            {'route': row['key'], 'journeys': row['count'], 'spent': format_amount(row['amount'])}
+            for row in results['routes']
+        ],
+        'payment_methods': [
+            {'method': row['key'], 'payments': row['count'], 'amount': format_amount(row['amount'])}
+            for row in results['payment_methods']
+        ],
+    }
+
+    if month:
+        summary['month'] = {
+            'month': month,
+            'journeys': results['month_totals']['count'] or 0,
+            'spent': format_amount(results['month_totals']['amount']),
+            'routes': [
+                {'route': row['key'], 'journeys': row['count'], 'spent': format_amount(row['amount'])}
+                for row in results['month_routes']
+            ],
+        }
+
+    if recent:
+        summary['recent'] = {
+            'journeys': [
+                {'id': row['id'], 'date': row['date'].isoformat(), 'route': row['route'],
+                 'fare': format_amount(row['fare']), 'payment': row['payment_id'],
+                 'payment_method': row['payment__method']}
+                for row in results['recent_journeys']
+            ],
+            'payments': [
+                {'id': row['id'], 'method': row['method'], 'reference': row['reference'],
+                 'amount': format_amount(row['amount']), 'timestamp': row['timestamp'].isoformat()}
+                for row in results['recent_payments']
+            ],
+        }
+
+    return summary
+
+
+def user_summary(user_id, month=None, recent=0):
+    results = {}
+    for name, query in summary_querysets(user_id, month, recent).items():
+        if isinstance(query, tuple):
+            queryset, aggregates = query
+            results[name] = queryset.aggregate(**aggregates)
+        elif query is not None:
+            results[name] = list(query)
+    return format_summary(results, month, recent)
+
+
+async def auser_summary(user_id, month=None, recent=0):
+    """``user_summary`` on the async ORM."""
+    results = {}
+    for name, query in summary_querysets(user_id, month, recent).items():
+        if isinstance(query, tuple):
+            queryset, aggregates = query
+            results[name] = await queryset.aaggregate(**aggregates)
+        elif query is not None:
+            results[name] = [row async for row in query]
+    return format_summary(results, month, recent)
@@ -0,0 +1,77 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .versions import shared_cache
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def start_replica_reads():
+    """Let reads go to a replica (see ReplicaRouter) until ``stop_replica_reads(token)``."""
+    return _replica_reads.set(True)
+
+
+def stop_replica_reads(token):
+    _replica_reads.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        stop_replica_reads(token)
+
+
+def pin_key(user_id):
+    return f'metro:pin-primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Serve ``user_id``'s reads from the primary until replicas have caught up with their write.
+
+    The pin lives in ``SHARED_CACHE``, which must be shared by every worker:
+    the user's next request may land on any of them.
+    """
+    shared_cache().set(pin_key(user_id), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return shared_cache().get(pin_key(user_id), False)
+
+
+class ReplicaRouter:
+    """Writes, and reads outside ``replica_reads()``, go to the primary.
+
+    Inside ``replica_reads()`` reads go to a random replica, unless the
+    primary is mid-transaction (the transaction's own writes must be
+    visible) or the instance was already loaded from a particular alias.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replica_aliases()
@@ -0,0 +1,154 @@
+"""Full-text search over lost items and lost reports.
+
+Each indexed model has a side table keyed by the object's id: an FTS5
+virtual table on SQLite, a weighted ``tsvector`` with a GIN index on
+PostgreSQL (both created by migration 0008). Signals keep it in step with
+saves and deletes; queryset updates, ``bulk_create`` and fixtures bypass
+them, so run ``manage.py rebuild_search_index`` after one.
+"""
+import re
+
+from django.db import connections, router, transaction
+from django.db.models.expressions import RawSQL
+
+from .caching import invalidate_responses
+from .models import LostItem, UserLostReport
+
+# bm25 column weights on SQLite for the tsvector weight letters.
+SQLITE_WEIGHTS = {'A': 10.0, 'B': 4.0, 'C': 1.0}
+REBUILD_BATCH_SIZE = 2000
+# Only the newest this-many matches are ranked, so a common word costs the
+# same however many items mention it.
+RANK_CANDIDATES = 1000
+
+
+class SearchIndex:
+    """Searchable ``fields`` (name -> weight letter) of ``model``, plus ``filters`` columns to narrow by."""
+
+    def __init__(self, model, fields, filters=()):
+        self.model = model
+        self.table = f'{model._meta.db_table}_search'
+        self.fields = fields
+        self.filters = tuple(filters)
+
+    def document(self, instance):
+        return [getattr(instance, name) or '' for name in self.fields] + [getattr(instance, name) for name in self.filters]
+
+    def add(self, instance):
+        connection = connections[router.db_for_write(self.model)]
+        params = self.document(instance)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(self.postgres_upsert(), [instance.pk] + params)
+            else:
+                cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [instance.pk])
+                cursor.execute(self.sqlite_insert(), [instance.pk] + params)
+
+    def remove(self, pk):
+        connection = connections[router.db_for_write(self.model)]
+        column = 'id' if connection.vendor == 'postgresql' else 'rowid'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE {column} = %s', [pk])
+
+    def rebuild(self):
+        """Reindex every row of the model; returns how many."""
+        connection = connections[router.db_for_write(self.model)]
+        statement = self.postgres_upsert() if connection.vendor == 'postgresql' else self.sqlite_insert()
+        rows = self.model.objects.values_list('pk', *self.fields, *self.filters).order_by()
+        count = 0
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for pk, *values in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+                batch.append([pk] + [value or '' for value in values[:len(self.fields)]] + values[len(self.fields):])
+                if len(batch) == REBUILD_BATCH_SIZE:
+                    cursor.executemany(statement, batch)
+                    count, batch = count + len(batch), []
+            if batch:
+                cursor.executemany(statement, batch)
+                count += len(batch)
+        # Cached search responses were built from the old index.
+        invalidate_responses(self.model._meta.model_name)
+        return count
+
+    def search(self, text, limit, **filters):
+        """Ids of rows matching every word of ``text`` (as a prefix), best match first.
+
+        Ranking weighs title over location over description, newest first
+        on ties. Only the newest ``RANK_CANDIDATES`` matches are ranked.
+        """
+        terms = re.findall(r'\w+', text.lower())
+        if not terms or limit <= 0:
+            return []
+        unknown = set(filters) - set(self.filters)
+        if unknown:
+            raise ValueError(f'{self.table} cannot be filtered by {", ".join(sorted(unknown))}.')
+        connection = connections[router.db_for_read(self.model)]
+        conditions = ''.join(f' AND {name} = %s' for name in filters)
+        match = match_expression(connection, terms)
+        if connection.vendor == 'postgresql':
+            sql = (
+                f"SELECT id FROM (SELECT id, ts_rank_cd(document, query) AS rank "
+                f"FROM {self.table}, to_tsquery('english', %s) query WHERE document @@ query{conditions} "
+                f"ORDER BY id DESC LIMIT %s) candidates ORDER BY rank DESC, id DESC LIMIT %s"
+            )
+        else:
+            weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for weight in self.fields.values())
+            sql = (
+                f'SELECT rowid FROM (SELECT rowid, bm25({self.table}, {weights}) AS rank '
+                f'FROM {self.table} WHERE {self.table} MATCH %s{conditions} '
+                f'ORDER BY rowid DESC LIMIT %s) ORDER BY rank, rowid DESC LIMIT %s'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, *filters.values(), max(RANK_CANDIDATES, limit), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, text):
+        """``queryset`` narrowed to every row matching ``text``, unranked and uncapped (for the admin)."""
+        terms = re.findall(r'\w+', text.lower())
+        if not terms:
+            return queryset.none()
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql = f"SELECT id FROM {self.table} WHERE document @@ to_tsquery('english', %s)"
+        else:
+            sql = f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s'
+        return queryset.filter(pk__in=RawSQL(sql, [match_expression(connection, terms)]))
+
+    def sqlite_insert(self):
+        columns = ', '.join(('rowid',) + tuple(self.fields) + self.filters)
+        placeholders = ', '.join(['%s'] * (1 + len(self.fields) + len(self.filters)))
+        return f'INSERT INTO {self.table} ({columns}) VALUES ({placeholders})'
+
+    def postgres_upsert(self):
+        document = ' || '.join(
+            f"setweight(to_tsvector('english', %s), '{weight}')" for weight in self.fields.values()
+        )
+        columns = ''.join(f', {name}' for name in self.filters)
+        placeholders = ''.join(', %s' for _ in self.filters)
+        updates = ''.join(f', {name} = EXCLUDED.{name}' for name in self.filters)
+        return (
+            f'INSERT INTO {self.table} (id, document{columns}) VALUES (%s, {document}{placeholders}) '
+            f'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document{updates}'
+        )
+
+
+def match_expression(connection, terms):
+    """Every term as a prefix, in the backend's full-text query syntax."""
+    if connection.vendor == 'postgresql':
+        return ' & '.join(f'{term}:*' for term in terms)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+SEARCH_INDEXES = {
+    LostItem: SearchIndex(LostItem, {'title': 'A', 'location': 'B', 'description': 'C'}),
+    UserLostReport: SearchIndex(UserLostReport, {'title': 'A', 'description': 'C'}, filters=('user_id',)),
+}
+
+
+def search(model, text, limit=50, **filters):
+    return SEARCH_INDEXES[model].search(text, limit, **filters)
+
+
+def search_filter(queryset, text):
+    return SEARCH_INDEXES[queryset.model].filter(queryset, text)
@@ -0,0 +1,330 @@
+"""Synthetic riders and their history, for load tests and local development (``manage.py seed``).
+
+Rows follow the distributions of the original ``setup_test_data.py``:
+- 3-8 payments per rider
+- the same routes, methods and amounts
+- three in four journeys paid
+
+Riders are written in blocks, each in its own transaction. Each block also
+gets a few lost items, lost reports matched to them, feedback and
+complaints.
+
+A block's payment and journey columns are drawn as NumPy arrays, one call
+per column, before its transaction starts, and journeys' user, date, fare
+and payment columns and their rollups are built from them with array
+operations. Journeys and rollups, which are most of the rows, skip model
+instances: they go in as tuples through ``executemany``, or COPY on
+PostgreSQL. Everything else uses ``bulk_create``. Signals don't run, so the
+rollups are counted here. The search index is left to ``manage.py
+rebuild_search_index``.
+
+Each block draws from its own generators, seeded from ``seed`` and the
+block's first rider. The same seed and block size give the same rows,
+however many processes write them.
+"""
+import csv
+import io
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import as_completed
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from .models import Complaint, Feedback, Journey, LostItem, LostItemMatch, Payment, User, UserLostReport, UserRollup
+from .rollups import month_key
+
+ROUTES = [
+    "Uttara North - Motijheel",
+    "Agargaon - Uttara Center",
+    "Pallabi - Agargaon",
+    "Mirpur 10 - Farmgate",
+    "Kazipara - Shahbagh",
+    "Uttara South - Pallabi",
+    "Mirpur 11 - Motijheel",
+    "Uttara Center - Shahbagh",
+    "Agargaon - Kazipara",
+    "Pallabi - Farmgate",
+]
+PAYMENT_METHODS = ['bKash', 'Nagad', 'Rocket', 'Card']
+AMOUNTS = [Decimal(60), Decimal(100), Decimal(120), Decimal(150)]
+PAYMENTS_PER_USER = range(3, 9)
+REFERENCES = range(10000000, 100000000)
+LOST_THINGS = ['umbrella', 'wallet', 'backpack', 'phone', 'water bottle', 'jacket', 'keys', 'headphones']
+COLOURS = ['black', 'brown', 'blue', 'red', 'grey', 'green']
+STATIONS = ['Uttara North', 'Pallabi', 'Mirpur 10', 'Kazipara', 'Agargaon', 'Farmgate', 'Shahbagh', 'Motijheel']
+PASSWORD = 'pass12345'
+BLOCK_SIZE = 1000
+BATCH_SIZE = 5000
+
+UNPAID_SHARE = 0.25
+
+
+def rider_email(number):
+    return f'rider{number}@example.com'
+
+
+def draw_history(rng, count, journeys_per_user, days):
+    """Random columns for ``count`` riders' payments and journeys, one NumPy ``Generator`` call per column.
+
+    Methods, amounts, routes and fares are indexes into the module's lists.
+    """
+    low, high = max(1, journeys_per_user // 2), max(1, journeys_per_user * 3 // 2)
+    payments = rng.integers(PAYMENTS_PER_USER.start, PAYMENTS_PER_USER.stop, size=count)
+    journeys = rng.integers(low, high + 1, size=count)
+    total_payments, total_journeys = int(payments.sum()), int(journeys.sum())
+    # Which of its rider's payments a journey used, or -1 for the unpaid ones.
+    picks = (rng.random(total_journeys) * np.repeat(payments, journeys)).astype(np.int64)
+    return {
+        'payments': payments,
+        'journeys': journeys,
+        'methods': rng.integers(len(PAYMENT_METHODS), size=total_payments),
+        'references': rng.integers(REFERENCES.start, REFERENCES.stop, size=total_payments),
+        'payment_amounts': rng.integers(len(AMOUNTS), size=total_payments),
+        'routes': rng.integers(len(ROUTES), size=total_journeys),
+        'ages': rng.integers(days + 1, size=total_journeys),
+        'fares': rng.integers(len(AMOUNTS), size=total_journeys),
+        'paid_with': np.where(rng.random(total_journeys) < UNPAID_SHARE, -1, picks),
+    }
+
+
+def pick(values, indexes):
+    """``values[i]`` for each of ``indexes``, as a list."""
+    return np.array(values, dtype=object)[indexes].tolist()
+
+
+def insert_rows(model, fields, rows, batch_size=BATCH_SIZE):
+    """Insert DB-ready tuples into ``model``'s table without model instances: COPY on PostgreSQL."""
+    opts = model._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    columns = ', '.join(quote(opts.get_field(name).column) for name in fields)
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            if connection.vendor == 'postgresql':
+                copy_rows(cursor.cursor, table, columns, batch)
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', batch)
+
+
+def copy_rows(cursor, table, columns, rows):
+    if hasattr(cursor, 'copy'):
+        # psycopg 3
+        with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def unique_references(rng, payment_users, references, taken):
+    """``REF`` strings for the drawn numbers, redrawing any the rider already has (in ``taken``)."""
+    unique = []
+    for user_id, number in zip(payment_users, references):
+        while (user_id, f'REF{number}') in taken:
+            number = int(rng.integers(REFERENCES.start, REFERENCES.stop))
+        taken.add((user_id, f'REF{number}'))
+        unique.append(f'REF{number}')
+    return unique
+
+
+def write_history(rng, user_ids, history, days, merge=False):
+    """Write drawn payments, journeys and their rollups for ``user_ids``; returns the number of journeys.
+
+    With ``merge``, the users (a pk range) may have payments and rollups already, which are added to.
+    """
+    users = {'user_id__gte': user_ids[0], 'user_id__lte': user_ids[-1]}
+    payment_users = np.repeat(user_ids, history['payments'])
+    # References are unique per rider (it's what makes payment uploads idempotent).
+    taken = set(Payment.objects.filter(**users).values_list('user_id', 'reference')) if merge else set()
+    references = unique_references(rng, payment_users.tolist(), history['references'].tolist(), taken)
+    payments = [
+        Payment(user_id=user_id, method=method, reference=reference, amount=amount)
+        for user_id, method, reference, amount in zip(
+            payment_users.tolist(), pick(PAYMENT_METHODS, history['methods']), references,
+            pick(AMOUNTS, history['payment_amounts']))
+    ]
+    # Stamped with the time of seeding (auto_now_add), as the script's were.
+    Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+
+    journey_users = np.repeat(user_ids, history['journeys'])
+    pks = np.array([payment.pk for payment in payments], dtype=np.int64)
+    first_payment = np.repeat(np.cumsum(history['payments']) - history['payments'], history['journeys'])
+    paid_with = history['paid_with']
+    payment_ids = np.where(paid_with < 0, None, pks[first_payment + np.maximum(paid_with, 0)]).tolist()
+
+    # Only a few distinct dates and fares: adapt each for the database once.
+    today = timezone.localdate()
+    dates = [today - timedelta(days=age) for age in range(days + 1)]
+    date_field, fare_field = Journey._meta.get_field('date'), Journey._meta.get_field('fare')
+    db_dates = [date_field.get_db_prep_save(value, connection) for value in dates]
+    db_fares = [fare_field.get_db_prep_save(value, connection) for value in AMOUNTS]
+    ages, routes, fares = history['ages'], history['routes'], history['fares']
+    insert_rows(Journey, ('user', 'route', 'date', 'fare', 'payment'), zip(
+        journey_users.tolist(), pick(ROUTES, routes), pick(db_dates, ages), pick(db_fares, fares), payment_ids,
+    ))
+
+    # Journey rollups: count and sum fares per (user, month, route) group.
+    months, month_of_age = np.unique([month_key(value) for value in dates], return_inverse=True)
+    groups, group_of_journey = np.unique(np.column_stack((journey_users, month_of_age[ages], routes)),
+                                         axis=0, return_inverse=True)
+    group_of_journey = group_of_journey.reshape(-1)
+    counts = np.bincount(group_of_journey, minlength=len(groups))
+    amounts = np.bincount(group_of_journey, weights=np.array([int(amount) for amount in AMOUNTS])[fares],
+                          minlength=len(groups))
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for (user_id, month, route), count, amount in zip(groups.tolist(), counts.tolist(), amounts.tolist()):
+        totals[user_id, months[month], 'journey', ROUTES[route]] = [count, Decimal(int(amount))]
+    for (user_id, month, method, amount), count in Counter(
+            (payment.user_id, month_key(payment.timestamp), payment.method, payment.amount)
+            for payment in payments).items():
+        total = totals[user_id, month, 'payment', method]
+        total[0] += count
+        total[1] += amount * count
+    if merge:
+        existing = UserRollup.objects.filter(**users)
+        for rollup in existing:
+            total = totals[rollup.user_id, rollup.month, rollup.kind, rollup.key]
+            total[0] += rollup.count
+            total[1] += rollup.amount
+        existing.delete()
+    amount_field = UserRollup._meta.get_field('amount')
+    insert_rows(UserRollup, ('user', 'month', 'kind', 'key', 'count', 'amount'), (
+        (user_id, month, kind, key, count, amount_field.get_db_prep_save(amount, connection))
+        for (user_id, month, kind, key), (count, amount) in totals.items()
+    ))
+    return len(journey_users)
+
+
+def describe_item(rng):
+    colour, thing = rng.choice(COLOURS), rng.choice(LOST_THINGS)
+    return f'{colour.title()} {thing}', f'A {colour} {thing} left on the train near {rng.choice(STATIONS)}.'
+
+
+def write_extras(rng, users):
+    count = len(users)
+    items = [
+        LostItem(title=title, description=description, location=rng.choice(STATIONS),
+                 status=rng.choice(('claimed', 'unclaimed')), posted_by_id=user.pk)
+        for user in rng.sample(users, max(1, count // 20))
+        for title, description in [describe_item(rng)]
+    ]
+    LostItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+    reports = [
+        UserLostReport(user_id=user.pk, title=title, description=description, contact=user.email)
+        for user in rng.sample(users, max(1, count // 50))
+        for title, description in [describe_item(rng)]
+    ]
+    UserLostReport.objects.bulk_create(reports, batch_size=BATCH_SIZE)
+    LostItemMatch.objects.bulk_create([
+        LostItemMatch(item_id=item.pk, report_id=report.pk, score=round(rng.random(), 3))
+        for report in reports for item in rng.sample(items, min(3, len(items)))
+    ], batch_size=BATCH_SIZE)
+    Feedback.objects.bulk_create([
+        Feedback(user_id=user.pk, rating=rng.randint(1, 5), comment='Trains were on time.')
+        for user in rng.sample(users, max(1, count // 10))
+    ], batch_size=BATCH_SIZE)
+    Complaint.objects.bulk_create([
+        Complaint(user_id=user.pk, title='Crowded coach', description='Too crowded at rush hour.',
+                  urgency=rng.choice(('low', 'medium', 'high')))
+        for user in rng.sample(users, max(1, count // 20))
+    ], batch_size=BATCH_SIZE)
+
+
+def seed_block(first, count, journeys_per_user, seed=0, password=None, days=30):
+    """Riders ``first`` to ``first + count - 1`` with their history and reports; returns ``(riders, journeys)``."""
+    rng = random.Random(f'{seed}:{first}')
+    generator = np.random.default_rng(rng.getrandbits(128))
+    history = draw_history(generator, count, journeys_per_user, days)
+    password = password or make_password(PASSWORD)
+    users = [
+        User(username=f'rider{number}', email=rider_email(number), name=f'Rider {number}', password=password)
+        for number in range(first, first + count)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        journeys = write_history(generator, [user.pk for user in users], history, days)
+        write_extras(rng, users)
+    return count, journeys
+
+
+def seed_existing_block(user_ids, journeys_per_user, seed=0, days=30):
+    """Payments and journeys for riders that already exist; returns ``(riders, journeys)``."""
+    rng = np.random.default_rng(random.Random(f'{seed}:existing:{user_ids[0]}').getrandbits(128))
+    history = draw_history(rng, len(user_ids), journeys_per_user, days)
+    with transaction.atomic():
+        return len(user_ids), write_history(rng, user_ids, history, days, merge=True)
+
+
+def run_block(func, args, attempts=5):
+    # SQLite has one writer at a time: a process that waited out the busy
+    # timeout retries its block, which rolled back whole.
+    for attempt in range(attempts):
+        try:
+            return func(*args)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0.5, 2) * (attempt + 1))
+
+
+def run_blocks(func, blocks, workers=1, progress=None):
+    """Call ``func(*args)`` for each block, on ``workers`` processes; returns summed ``(riders, journeys)``."""
+    riders = journeys = 0
+
+    def done(result):
+        nonlocal riders, journeys
+        riders += result[0]
+        journeys += result[1]
+        if progress is not None:
+            progress(riders, journeys)
+
+    if workers <= 1:
+        for args in blocks:
+            done(func(*args))
+        return riders, journeys
+    from .tasks import make_pool
+    pool = make_pool('process', workers)
+    futures = [pool.submit(run_block, func, args) for args in blocks]
+    try:
+        for future in as_completed(futures):
+            done(future.result())
+    finally:
+        # After a failure, don't start the blocks still queued (shutdown's
+        # cancel_futures needs Python 3.9).
+        for future in futures:
+            future.cancel()
+        pool.shutdown()
+    return riders, journeys
+
+
+def seed_riders(users, journeys_per_user, seed=0, first=0, block_size=BLOCK_SIZE, days=30, workers=1,
+                progress=None):
+    """Seed ``users`` new riders; ``progress(riders, journeys)`` is called after each block."""
+    password = make_password(PASSWORD)
+    blocks = [
+        (start, min(block_size, first + users - start), journeys_per_user, seed, password, days)
+        for start in range(first, first + users, block_size)
+    ]
+    return run_blocks(seed_block, blocks, workers, progress)
+
+
+def seed_existing(journeys_per_user, seed=0, block_size=BLOCK_SIZE, days=30, workers=1, progress=None):
+    """Add payments and journeys to every existing user, as ``setup_test_data.py`` did."""
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    blocks = [
+        (user_ids[start:start + block_size], journeys_per_user, seed, days)
+        for start in range(0, len(user_ids), block_size)
+    ]
+    return run_blocks(seed_existing_block, blocks, workers, progress)
@@ -1,8 +1,77 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueTogetherValidator
 from django.contrib.auth import get_user_model
-from .models import User, Journey, Payment, LostItem, UserLostReport, Feedback, Complaint
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from .fares import get_fare_matrix
+from .images import image_storage, rendition_names
+from .metrics import TimedSerializerMixin, timed
+from .models import User, Journey, Payment, LostItem, UserLostReport, LostItemMatch, Feedback, Complaint, Line, Station
 
-class UserSerializer(serializers.ModelSerializer):
+def read_query_param_set(request, name):
+    """Comma-separated query parameter as a set; only honoured on reads."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return set()
+    value = request.query_params.get(name)
+    if not value:
+        return set()
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+class SparseFieldsetMixin:
+    """Trim read responses to the comma-separated ``?fields=`` query parameter."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        allowed = read_query_param_set(self.context.get('request'), 'fields')
+        if not allowed:
+            return
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+class ExpandableFieldsMixin:
+    """Swap foreign-key ids for nested objects named in ``?expand=``.
+
+    ``expandable_fields`` maps a field name to the name of the serializer
+    used for the nested representation. Views select the same relations
+    in bulk (see ``ExpandRelatedMixin``) so expansion never costs a query
+    per row.
+    """
+    expandable_fields = {}
+
+    @classmethod
+    def requested_expansions(cls, request):
+        return sorted(read_query_param_set(request, 'expand') & set(cls.expandable_fields))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.requested_expansions(self.context.get('request')):
+            self.fields[name] = globals()[self.expandable_fields[name]](read_only=True)
+
+def expected_route_fare(route, fare, matrix=None):
+    """Check a journey's fare against the fare matrix.
+
+    Returns ``(fare, errors)``. Fares are trusted only while no station
+    network is loaded; otherwise the route must name two connected stations
+    and a missing fare is filled in from the matrix.
+    """
+    matrix = matrix if matrix is not None else get_fare_matrix()
+    if not matrix:
+        if fare is None:
+            return None, {'fare': ['This field is required.']}
+        return fare, None
+    expected, error = matrix.route_fare(route or '')
+    if error:
+        return None, {'route': [error]}
+    if fare is not None and fare != expected:
+        return None, {'fare': [f'Fare for this route is {expected}.']}
+    return expected, None
+
+class UserSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'name')
+
+class UserSerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'name', 'email', 'password', 'is_admin')
@@ -15,32 +84,239 @@ class UserSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class JourneySerializer(serializers.ModelSerializer):
+class JourneySerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'payment': 'PaymentSerializer', 'user': 'UserSummarySerializer'}
+
     class Meta:
         model = Journey
         fields = '__all__'
+        extra_kwargs = {'fare': {'required': False}}
+
+    def validate(self, attrs):
+        route = attrs.get('route', getattr(self.instance, 'route', None))
+        fare = attrs.get('fare', getattr(self.instance, 'fare', None))
+        expected, error = expected_route_fare(route, fare)
+        if error:
+            raise serializers.ValidationError(error)
+        attrs['fare'] = expected
+        return attrs
+
+class PaymentSerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': 'UserSummarySerializer'}
 
-class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+        # DRF 3.14 doesn't derive this from the model's UniqueConstraint.
+        validators = [UniqueTogetherValidator(queryset=Payment.objects.all(), fields=['user', 'reference'])]
+
+class ImageRenditionsField(serializers.Field):
+    """``{rendition: {format: url}}`` for a processed photo (see ``metro.images``), from its content digest."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, digest):
+        return self.url_converter(self.context.get('request'))(digest)
+
+    def url_converter(self, request):
+        storage = image_storage()
+
+        def convert(digest):
+            if not digest:
+                return None
+            urls = {}
+            for rendition, formats in rendition_names(digest).items():
+                urls[rendition] = {
+                    extension: request.build_absolute_uri(storage.url(name)) if request is not None else storage.url(name)
+                    for extension, name in formats.items()
+                }
+            return urls
+        return convert
+
+class LostItemSerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'posted_by': 'UserSummarySerializer'}
+    # Small renditions for list pages; null until the upload has been processed.
+    thumbnails = ImageRenditionsField(source='image_sha256')
 
-class LostItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = LostItem
         fields = '__all__'
 
-class UserLostReportSerializer(serializers.ModelSerializer):
+class UserLostReportSerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': 'UserSummarySerializer'}
+
     class Meta:
         model = UserLostReport
         fields = '__all__'
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class LostItemMatchSerializer(TimedSerializerMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'item': 'LostItemSerializer', 'report': 'UserLostReportSerializer'}
+
+    class Meta:
+        model = LostItemMatch
+        fields = '__all__'
+
+class ReportMatchSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """A report's candidate item, shown in full to the report's owner."""
+    item = LostItemSerializer(read_only=True)
+
+    class Meta:
+        model = LostItemMatch
+        fields = ('id', 'item', 'score', 'created_at')
+
+class FeedbackSerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': 'UserSummarySerializer'}
+
     class Meta:
         model = Feedback
         fields = '__all__'
 
-class ComplaintSerializer(serializers.ModelSerializer):
+class ComplaintSerializer(TimedSerializerMixin, SparseFieldsetMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': 'UserSummarySerializer'}
+
     class Meta:
         model = Complaint
         fields = '__all__'
+
+class LineSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Line
+        fields = ('id', 'code', 'name', 'color')
+
+class StationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    lines = serializers.SlugRelatedField(many=True, read_only=True, slug_field='code')
+
+    class Meta:
+        model = Station
+        fields = ('id', 'code', 'name', 'lines')
+
+def _iso_format(field, default):
+    output_format = getattr(field, 'format', default)
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+def _format_decimal(value):
+    # Database backends already quantize to the column's decimal_places.
+    return format(value, 'f')
+
+def _format_iso(value):
+    return value.isoformat()
+
+def _datetime_converter(field):
+    enforce_timezone = field.enforce_timezone
+
+    def convert(value):
+        value = enforce_timezone(value).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+def _file_converter(model_field):
+    storage = model_field.storage
+
+    def bind(request):
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return bind
+
+class ValuesReader:
+    """Read-only fast path producing a ModelSerializer's output from ``values_list()`` rows.
+
+    Compiled once per serializer class: every readable field maps to a
+    column and a converter that formats the raw database value the way the
+    DRF field would (decimals as fixed-point strings, dates and datetimes
+    as ISO 8601, foreign keys as ids, files as absolute URLs), so listing
+    skips model instantiation and per-object field lookups. Nested
+    ``?expand=`` representations still need the serializer itself.
+    """
+    passthrough_fields = (
+        serializers.PrimaryKeyRelatedField, serializers.BooleanField, serializers.IntegerField,
+        serializers.ChoiceField, serializers.CharField,
+    )
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.columns = {}
+        self.converters = {}
+        # Converters that need the request, as ``factory(request) -> converter``.
+        self.request_converters = {}
+        for name, field in serializer_class().fields.items():
+            if not field.write_only:
+                self.compile(name, field)
+
+    def compile(self, name, field):
+        try:
+            model_field = self.serializer_class.Meta.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or model_field.many_to_many:
+            raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} cannot be read from values_list().')
+        self.columns[name] = model_field.attname
+
+        if isinstance(field, self.passthrough_fields):
+            return
+        if isinstance(field, serializers.DecimalField) and not field.localize \
+                and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+            self.converters[name] = _format_decimal
+        elif isinstance(field, serializers.DateTimeField) and _iso_format(field, api_settings.DATETIME_FORMAT):
+            self.converters[name] = _datetime_converter(field)
+        elif isinstance(field, serializers.DateField) and _iso_format(field, api_settings.DATE_FORMAT) \
+                or isinstance(field, serializers.TimeField) and _iso_format(field, api_settings.TIME_FORMAT):
+            self.converters[name] = _format_iso
+        elif isinstance(field, serializers.FileField) and getattr(field, 'use_url', True):
+            self.request_converters[name] = _file_converter(model_field)
+        elif hasattr(field, 'url_converter'):
+            self.request_converters[name] = field.url_converter
+        else:
+            self.converters[name] = field.to_representation
+
+    def field_names(self, request=None):
+        """Output fields, trimmed to ``?fields=`` like SparseFieldsetMixin."""
+        allowed = read_query_param_set(request, 'fields')
+        return [name for name in self.columns if not allowed or name in allowed]
+
+    def select(self, names):
+        """Distinct columns for ``names``, in order (two fields may read the same column)."""
+        return list(dict.fromkeys(self.columns[name] for name in names))
+
+    def rows(self, queryset, names, extra=()):
+        """Named ``values_list()`` rows: the columns for ``names`` first, then ``extra`` (e.g. cursor) columns."""
+        columns = self.select(names)
+        columns += [column for column in extra if column not in columns]
+        return queryset.values_list(*columns, named=True)
+
+    def serialize(self, rows, names, request=None):
+        """Output dicts for ``rows`` fetched by ``rows(queryset, names)``."""
+        with timed('serialize'):
+            return self._serialize(rows, names, request)
+
+    def _serialize(self, rows, names, request):
+        columns = self.select(names)
+        count = len(columns)
+        positions = None if count == len(names) else [columns.index(self.columns[name]) for name in names]
+        converters = [
+            (index, self.converters[name] if name in self.converters else self.request_converters[name](request))
+            for index, name in enumerate(names)
+            if name in self.converters or name in self.request_converters
+        ]
+        data = []
+        for row in rows:
+            values = list(row[:count]) if positions is None else [row[position] for position in positions]
+            for index, convert in converters:
+                if values[index] is not None:
+                    values[index] = convert(values[index])
+            data.append(dict(zip(names, values)))
+        return data
+
+_readers = {}
+
+def values_reader(serializer_class):
+    """The compiled ValuesReader for ``serializer_class``."""
+    reader = _readers.get(serializer_class)
+    if reader is None:
+        reader = _readers[serializer_class] = ValuesReader(serializer_class)
+    return reader
@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import invalidate_responses
+from .fares import invalidate_fare_matrix
+from .images import is_processed, schedule_image_processing
+from .models import User, Journey, Payment, LostItem, UserLostReport, Complaint, Line, Station, LineStop, Service, Trip, StopTime
+from .matching import invalidate_match_engine, schedule_matching
+from .metrics import record_query
+from .notifications import notify_urgent_complaint
+from .profiling import log_slow_query
+from .rollups import ROLLUP_KEYS, bump
+from .search import SEARCH_INDEXES
+from .timetable import invalidate_timetable
+
+
+@receiver(pre_save, sender=Journey)
+@receiver(pre_save, sender=Payment)
+def remember_previous_rollup(sender, instance, raw=False, **kwargs):
+    instance._previous_rollup = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._previous_rollup = ROLLUP_KEYS[sender](previous)
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_save, sender=Payment)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rollup', None)
+    if previous is not None:
+        user_id, month, kind, key, amount = previous
+        bump(user_id, month, kind, key, -1, -amount)
+    user_id, month, kind, key, amount = ROLLUP_KEYS[sender](instance)
+    bump(user_id, month, kind, key, 1, amount)
+
+
+@receiver(post_delete, sender=Journey)
+@receiver(post_delete, sender=Payment)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    user_id, month, kind, key, amount = ROLLUP_KEYS[sender](instance)
+    bump(user_id, month, kind, key, -1, -amount)
+
+
+@receiver(post_save, sender=Line)
+@receiver(post_save, sender=Station)
+@receiver(post_save, sender=LineStop)
+@receiver(post_delete, sender=Line)
+@receiver(post_delete, sender=Station)
+@receiver(post_delete, sender=LineStop)
+def network_changed(sender, **kwargs):
+    # The timetable indexes stations too, so it must never lag the fare matrix.
+    invalidate_fare_matrix()
+    invalidate_timetable()
+
+
+@receiver(post_save, sender=Journey)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Journey)
+@receiver(post_delete, sender=Payment)
+def user_records_changed(sender, instance, **kwargs):
+    invalidate_responses(sender._meta.model_name, instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_responses('user', instance.pk)
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_delete, sender=LostItem)
+def lost_items_changed(sender, **kwargs):
+    invalidate_responses('lostitem')
+
+
+@receiver(pre_save, sender=LostItem)
+def forget_replaced_image(sender, instance, raw=False, **kwargs):
+    # A new upload's digest is unknown until it has been processed.
+    if not raw and not is_processed(instance.image_url.name, instance.image_sha256):
+        instance.image_sha256 = ''
+
+
+@receiver(post_save, sender=LostItem)
+def process_uploaded_image(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image_url and not instance.image_sha256:
+        schedule_image_processing(instance.pk)
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_save, sender=UserLostReport)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    # Fixtures are indexed by rebuild_search_index once loaded.
+    if not raw:
+        SEARCH_INDEXES[sender].add(instance)
+
+
+@receiver(post_delete, sender=LostItem)
+@receiver(post_delete, sender=UserLostReport)
+def remove_from_search_index(sender, instance, **kwargs):
+    SEARCH_INDEXES[sender].remove(instance.pk)
+
+
+@receiver(post_save, sender=LostItem)
+@receiver(post_save, sender=UserLostReport)
+def match_lost_and_found(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        # Edited text or a claimed item changes the corpus, not just one vector.
+        invalidate_match_engine()
+    schedule_matching('item' if sender is LostItem else 'report', instance.pk)
+
+
+@receiver(post_delete, sender=LostItem)
+@receiver(post_delete, sender=UserLostReport)
+def lost_and_found_deleted(sender, **kwargs):
+    invalidate_match_engine()
+
+
+@receiver(post_save, sender=Complaint)
+def complaint_submitted(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.urgency == 'high':
+        notify_urgent_complaint.delay(instance.pk)
+
+
+# StopTime deliberately has no delete receiver, so bulk replacement of the
+# timetable (see timetable.import_gtfs) stays a single fast DELETE.
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Trip)
+@receiver(post_save, sender=StopTime)
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=Trip)
+def timetable_changed(sender, **kwargs):
+    invalidate_timetable()
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    # Reconnects reuse the wrapper object, and its wrappers with it.
+    for wrapper in (record_query, log_slow_query):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
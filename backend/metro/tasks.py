@@ -0,0 +1,236 @@
+"""Background tasks kept in the database and run by ``manage.py run_tasks``.
+
+``@task`` registers a function under its dotted name and gives it a
+``delay(*args)`` that inserts a Task row. The row is written in the caller's
+transaction, so a task runs only if the work that queued it commits, and
+the request returns as soon as the row is in. Arguments must be JSON.
+
+Workers claim due rows by flipping them from queued to running. On
+PostgreSQL they lock with SKIP LOCKED; on SQLite a guarded UPDATE does it.
+A failing task is retried with exponential backoff until it has made
+``max_attempts`` attempts. A task left running by a crashed worker is
+retried after ``TASK_TIMEOUT`` seconds. Every row keeps its timestamps,
+which is where ``task_stats`` gets queue wait and run time.
+
+With ``TASK_QUEUE_EAGER`` set, ``delay()`` runs the task inline once the
+transaction commits (tests, or a setup without a worker).
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from functools import partial
+from importlib import import_module
+from multiprocessing import get_context
+from uuid import uuid4
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def task(max_attempts=3, retry_delay=10):
+    """Register a function as a task; ``func.delay(*args)`` queues a call.
+
+    A failed attempt is retried after ``retry_delay`` seconds, doubling each time.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.retry_delay = retry_delay
+        func.delay = partial(enqueue, func)
+        REGISTRY[name] = func
+        return func
+    return decorator
+
+
+def enqueue(func, *args, countdown=0):
+    if getattr(settings, 'TASK_QUEUE_EAGER', False):
+        transaction.on_commit(partial(func, *args))
+        return None
+    now = timezone.now()
+    return Task.objects.create(name=func.task_name, args=list(args), max_attempts=func.max_attempts,
+                               created_at=now, run_after=now + timedelta(seconds=countdown))
+
+
+def resolve(name):
+    if name not in REGISTRY:
+        # Tasks register when their module is imported.
+        import_module(name.rpartition('.')[0])
+    return REGISTRY[name]
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due tasks as running for ``worker``; returns their ids."""
+    now = timezone.now()
+    due = Task.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'pk')
+    token = f'{worker}:{uuid4().hex[:8]}'
+    changes = dict(status='running', worker=token, started_at=now, attempts=F('attempts') + 1)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**changes)
+    else:
+        # No row locks: two workers may pick the same ids, and the status
+        # guard lets only one UPDATE flip each row.
+        ids = list(due.values_list('pk', flat=True)[:limit])
+        Task.objects.filter(pk__in=ids, status='queued').update(**changes)
+    if not ids:
+        return []
+    return list(Task.objects.filter(worker=token, status='running').order_by('pk').values_list('pk', flat=True))
+
+
+def execute(task_id):
+    """Run one claimed task and record the outcome; returns its final status."""
+    close_old_connections()
+    try:
+        row = Task.objects.get(pk=task_id)
+        try:
+            resolve(row.name)(*row.args)
+        except Exception:
+            logger.exception('Task %s #%s failed (attempt %s of %s)', row.name, row.pk, row.attempts, row.max_attempts)
+            return fail(row, traceback.format_exc())
+        Task.objects.filter(pk=row.pk).update(status='done', finished_at=timezone.now(), last_error='')
+        return 'done'
+    finally:
+        close_old_connections()
+
+
+def fail(row, error):
+    now = timezone.now()
+    if row.attempts < row.max_attempts:
+        func = REGISTRY.get(row.name)
+        delay = (func.retry_delay if func else 10) * 2 ** (row.attempts - 1)
+        Task.objects.filter(pk=row.pk).update(status='queued', run_after=now + timedelta(seconds=delay),
+                                              worker='', last_error=error)
+        return 'queued'
+    Task.objects.filter(pk=row.pk).update(status='failed', finished_at=now, last_error=error)
+    return 'failed'
+
+
+def recover_and_purge():
+    """Retry tasks stuck running past ``TASK_TIMEOUT`` and drop finished ones older than ``TASK_RETENTION``."""
+    now = timezone.now()
+    stuck = Task.objects.filter(status='running', started_at__lt=now - timedelta(seconds=settings.TASK_TIMEOUT))
+    for row in stuck:
+        logger.warning('Task %s #%s timed out on %s', row.name, row.pk, row.worker)
+        fail(row, f'Still running after {settings.TASK_TIMEOUT}s on {row.worker}; presumed lost.')
+    Task.objects.filter(status__in=('done', 'failed'),
+                        finished_at__lt=now - timedelta(seconds=settings.TASK_RETENTION)).delete()
+
+
+def make_pool(kind, concurrency):
+    if kind == 'process':
+        # Spawned, not forked: children start without the parent's DB
+        # connections and set Django up themselves.
+        connections.close_all()
+        return ProcessPoolExecutor(concurrency, mp_context=get_context('spawn'), initializer=django.setup)
+    return ThreadPoolExecutor(concurrency, thread_name_prefix='task')
+
+
+class Worker:
+    """Claims due tasks and runs them on a thread or process pool (``pool='inline'`` runs them one by one)."""
+
+    def __init__(self, concurrency=4, pool='thread', poll_interval=1.0, name=None):
+        self.concurrency = max(1, concurrency)
+        self.pool_kind = pool
+        self.poll_interval = poll_interval
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def run(self, once=False):
+        """Work until stopped; with ``once``, until no task is due. Returns the number of tasks run."""
+        if self.pool_kind == 'inline':
+            return self.run_inline(once)
+        pool = make_pool(self.pool_kind, self.concurrency)
+        running, completed, maintained = set(), 0, None
+        try:
+            while not self.stopping.is_set():
+                maintained = self.maintain(maintained)
+                ids = claim(self.name, self.concurrency - len(running)) if len(running) < self.concurrency else []
+                running.update(pool.submit(execute, task_id) for task_id in ids)
+                if once and not ids and not running:
+                    break
+                if running:
+                    done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    completed += len(done)
+                    for future in done:
+                        if future.exception() is not None:
+                            # The task's row stays running until recover_and_purge() retries it.
+                            logger.error('Task runner crashed: %r', future.exception())
+                elif not ids:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            # Let claimed tasks finish, so none is left running.
+            pool.shutdown(wait=True)
+        return completed + len(running)
+
+    def run_inline(self, once):
+        completed, maintained = 0, None
+        while not self.stopping.is_set():
+            maintained = self.maintain(maintained)
+            ids = claim(self.name, self.concurrency)
+            for task_id in ids:
+                execute(task_id)
+            completed += len(ids)
+            if not ids:
+                if once:
+                    break
+                self.stopping.wait(self.poll_interval)
+        return completed
+
+    def maintain(self, last):
+        now = timezone.now()
+        if last is None or now - last > timedelta(minutes=1):
+            recover_and_purge()
+            return now
+        return last
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def task_stats(since):
+    """Per task name: runs finished since ``since``, failures, retries, and queue wait / run time percentiles."""
+    stats = {}
+    rows = Task.objects.filter(status__in=('done', 'failed'), finished_at__gte=since).values_list(
+        'name', 'status', 'attempts', 'run_after', 'started_at', 'finished_at')
+    for name, status, attempts, run_after, started_at, finished_at in rows.iterator():
+        entry = stats.setdefault(name, {'done': 0, 'failed': 0, 'retried': 0, 'wait': [], 'run': []})
+        entry[status] += 1
+        entry['retried'] += attempts > 1
+        # Wait counts from when the last attempt became due.
+        entry['wait'].append((started_at - run_after).total_seconds())
+        entry['run'].append((finished_at - started_at).total_seconds())
+    for entry in stats.values():
+        wait_times, run_times = entry.pop('wait'), entry.pop('run')
+        for pct in (50, 95, 99):
+            entry[f'wait_p{pct}'] = percentile(wait_times, pct)
+            entry[f'run_p{pct}'] = percentile(run_times, pct)
+    now = timezone.now()
+    queued = Task.objects.filter(status='queued', run_after__lte=now).values('name').annotate(
+        count=Count('pk'), oldest=Min('run_after'))
+    for row in queued:
+        entry = stats.setdefault(row['name'], {'done': 0, 'failed': 0, 'retried': 0})
+        entry['queued'] = row['count']
+        entry['oldest_queued_seconds'] = (now - row['oldest']).total_seconds()
+    return stats
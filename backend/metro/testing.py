@@ -0,0 +1,75 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+SQLITE_TABLE_SCAN = re.compile(r'\bSCAN (\w+)$', re.MULTILINE)
+
+
+def list_queryset(viewset_class, user):
+    """Build the exact queryset a ViewSet's paginated ``list`` action would run for ``user``."""
+    view = viewset_class()
+    view.action = 'list'
+    view.format_kwarg = None
+    view.args, view.kwargs = (), {}
+    view.request = Request(APIRequestFactory().get('/'))
+    view.request.user = user
+
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    if paginator is not None:
+        ordering = paginator.get_ordering(view.request, queryset, view)
+        queryset = queryset.order_by(*ordering)[:paginator.page_size + 1]
+    return queryset
+
+
+class QueryPlanAssertions:
+    """TestCase mixin that fails when a queryset's plan degrades to a full table scan."""
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make sequential scans look cheap; penalise them so
+            # a Seq Scan in the plan really means "no usable index".
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+            try:
+                return queryset.explain()
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET enable_seqscan = on')
+        return queryset.explain()
+
+    def assertNoFullScan(self, queryset, msg=None):
+        plan = self.explain(queryset)
+        problem = None
+        if connection.vendor == 'postgresql':
+            if 'Seq Scan' in plan:
+                problem = 'sequential scan'
+        elif connection.vendor == 'sqlite':
+            if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+                problem = 'sort over the whole result set'
+            elif SQLITE_TABLE_SCAN.search(plan) and queryset.query.where:
+                # An unfiltered SCAN is a rowid walk stopped by LIMIT; a filtered
+                # one has to visit every row to evaluate the WHERE clause.
+                problem = 'filtered table scan'
+        if problem:
+            self.fail(msg or f'{problem} in query plan:\n{plan}\n\nSQL: {queryset.query}')
+
+
+class QueryCountAssertions:
+    """TestCase mixin that pins how many queries an endpoint may issue.
+
+    Seed more than one row per relation before calling it: an N+1 regression
+    then shows up as a changed count instead of hiding behind a single row.
+    """
+
+    def assertEndpointQueries(self, url, expected, data=None, status_code=200):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+        if len(captured) != expected:
+            queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(captured, start=1))
+            self.fail(f'GET {url} ran {len(captured)} queries, expected {expected}:\n{queries}')
+        return response
@@ -0,0 +1,1338 @@
+import csv
+import hashlib
+import json
+import math
+import random
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import cache, caches
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+
+from .models import (
+    User, Journey, Payment, LostItem, UserLostReport, LostItemMatch, Feedback, Complaint, UserRollup, Station, LineStop,
+    Line, Trip, StopTime, Task,
+)
+from .caching import response_version_name
+from .checks import check_metrics_token, check_shared_cache
+from .bulk import JourneyBulkIngestor, PaymentBulkIngestor
+from .matching import MatchEngine, invalidate_match_engine
+from .metrics import DB_QUERIES, PHASE_TIME, REQUESTS, Histogram
+from .profiling import dump_profile, function_totals, load_profiles
+from .versions import VersionedBuild, bump_version, get_version, version_key
+from .tasks import Worker, claim, recover_and_purge, task, task_stats
+from .fares import FareMatrix, fare_for_distance, invalidate_fare_matrix
+from .rollups import rebuild_user_rollups
+from .seeding import seed_riders
+from .serializers import JourneySerializer, LostItemSerializer, PaymentSerializer
+from .routers import ReplicaRouter, pin_key, replica_reads
+from .planner import get_planner
+from .renderers import ORJSONRenderer
+from .timetable import get_timetable, import_gtfs, invalidate_timetable, synthesize_gtfs
+from .testing import QueryCountAssertions, QueryPlanAssertions, list_queryset
+from .urls import router
+from metro_project.database import database_config, replica_configs, sqlite_pragmas
+
+
+class JourneySummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client.force_authenticate(self.user)
+
+    def add_journey(self, route, day, fare):
+        return Journey.objects.create(user=self.user, route=route, date=day, fare=Decimal(fare))
+
+    def test_summary_reflects_saved_journeys_and_payments(self):
+        self.add_journey('Uttara North - Motijheel', date(2025, 4, 2), '60')
+        self.add_journey('Uttara North - Motijheel', date(2025, 4, 9), '60')
+        self.add_journey('Pallabi - Agargaon', date(2025, 5, 1), '100')
+        Payment.objects.create(user=self.user, method='bKash', reference='REF1', amount=Decimal('150'))
+
+        response = self.client.get('/api/journeys/summary/', {'month': '2025-04'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_journeys'], 3)
+        self.assertEqual(response.data['total_fare'], '220.00')
+        self.assertEqual(response.data['total_paid'], '150.00')
+        self.assertEqual(
+            response.data['monthly'],
+            [{'month': '2025-04', 'journeys': 2, 'spent': '120.00'},
+             {'month': '2025-05', 'journeys': 1, 'spent': '100.00'}],
+        )
+        self.assertEqual(response.data['routes'][0]['route'], 'Uttara North - Motijheel')
+        self.assertEqual(response.data['payment_methods'],
+                         [{'method': 'bKash', 'payments': 1, 'amount': '150.00'}])
+        self.assertEqual(response.data['month']['journeys'], 2)
+        self.assertNotIn('recent', response.data)
+
+    def test_summary_can_include_the_newest_rows(self):
+        payment = Payment.objects.create(user=self.user, method='Nagad', reference='REF1', amount=Decimal('60'))
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 2), fare=Decimal('60'),
+                               payment=payment)
+        self.add_journey('Mirpur 10 - Farmgate', date(2025, 4, 1), '100')
+        self.add_journey('Uttara North - Motijheel', date(2025, 3, 1), '60')
+
+        recent = self.client.get('/api/journeys/summary/', {'recent': 2}).data['recent']
+        self.assertEqual(recent['journeys'], [
+            {'id': payment.journey_set.get().id, 'date': '2025-04-02', 'route': 'Pallabi - Agargaon',
+             'fare': '60.00', 'payment': payment.id, 'payment_method': 'Nagad'},
+            {'id': recent['journeys'][1]['id'], 'date': '2025-04-01', 'route': 'Mirpur 10 - Farmgate',
+             'fare': '100.00', 'payment': None, 'payment_method': None},
+        ])
+        self.assertEqual([row['reference'] for row in recent['payments']], ['REF1'])
+        self.assertEqual(self.client.get('/api/journeys/summary/', {'recent': 'all'}).status_code, 400)
+
+    def test_updates_and_deletes_match_a_full_rebuild(self):
+        journey = self.add_journey('Pallabi - Agargaon', date(2025, 4, 2), '60')
+        other = self.add_journey('Pallabi - Agargaon', date(2025, 4, 3), '60')
+        journey.route = 'Mirpur 10 - Farmgate'
+        journey.date = date(2025, 6, 1)
+        journey.save()
+        other.delete()
+
+        incremental = self.client.get('/api/journeys/summary/').data
+        rebuild_user_rollups(self.user.id)
+        self.assertEqual(self.client.get('/api/journeys/summary/').data, incremental)
+        self.assertEqual(incremental['total_journeys'], 1)
+
+    def test_deleting_a_user_removes_their_rollups(self):
+        self.add_journey('Pallabi - Agargaon', date(2025, 4, 2), '60')
+        self.user.delete()
+        self.assertFalse(UserRollup.objects.exists())
+
+
+class SeedingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def journeys(self):
+        return list(Journey.objects.order_by('pk').values_list('user__username', 'route', 'date', 'fare',
+                                                               'payment__reference'))
+
+    def test_seeds_riders_with_consistent_rollups(self):
+        self.assertEqual(seed_riders(25, 4, block_size=10)[0], 25)
+        self.assertEqual(User.objects.filter(username__startswith='rider').count(), 25)
+        per_user = Counter(Journey.objects.values_list('user_id', flat=True))
+        self.assertTrue(all(2 <= count <= 6 for count in per_user.values()))
+        self.assertFalse(Journey.objects.exclude(payment=None).exclude(payment__user=F('user')).exists())
+        self.assertTrue(LostItemMatch.objects.exists())
+
+        rider = User.objects.get(username='rider3')
+        self.client.force_authenticate(rider)
+        seeded = self.client.get('/api/journeys/summary/').data
+        rebuild_user_rollups(rider.id)
+        self.assertEqual(self.client.get('/api/journeys/summary/').data, seeded)
+        self.assertTrue(self.client.login(username='rider3', password='pass12345'))
+
+    def test_same_seed_gives_same_rows(self):
+        seed_riders(10, 5, seed=7)
+        first = self.journeys()
+        User.objects.all().delete()
+        seed_riders(10, 5, seed=7)
+        self.assertEqual(self.journeys(), first)
+
+    def test_seed_command_adds_riders_and_history(self):
+        User.objects.create_user('existing', 'existing@example.com', 'pass12345', name='Existing')
+        call_command('seed', users=12, journeys_per_user=3, block_size=5, stdout=StringIO())
+        call_command('seed', users=3, journeys_per_user=3, stdout=StringIO())
+        self.assertTrue(User.objects.filter(username='rider14').exists())
+        self.assertEqual(User.objects.filter(username__startswith='rider').count(), 15)
+        self.assertFalse(Journey.objects.filter(user__username='existing').exists())
+
+        call_command('seed', existing=True, journeys_per_user=2, stdout=StringIO())
+        self.assertTrue(Journey.objects.filter(user__username='existing').exists())
+        self.assertTrue(Payment.objects.filter(user__username='existing').exists())
+        rider = User.objects.get(username='rider2')
+        self.client.force_authenticate(rider)
+        seeded = self.client.get('/api/journeys/summary/').data
+        rebuild_user_rollups(rider.id)
+        self.assertEqual(self.client.get('/api/journeys/summary/').data, seeded)
+
+
+class PaginationAndFieldsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client.force_authenticate(self.user)
+        for day in range(1, 8):
+            Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, day), fare=Decimal('60'))
+
+    def test_journeys_are_cursor_paginated_newest_first(self):
+        seen = []
+        url = '/api/journeys/?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['date'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [f'2025-04-0{day}' for day in range(7, 0, -1)])
+
+    def test_fields_parameter_limits_serialized_fields(self):
+        response = self.client.get('/api/journeys/', {'fields': 'id,fare'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'fare'})
+
+    def test_fields_parameter_is_ignored_on_writes(self):
+        response = self.client.post('/api/journeys/?fields=id', {
+            'user': self.user.id, 'route': 'Mirpur 10 - Farmgate', 'date': '2025-04-20', 'fare': '100.00',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['route'], 'Mirpur 10 - Farmgate')
+
+
+
+@override_settings(METRICS_SERVER_TIMING=True)
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 1), fare=Decimal('60'))
+        self.client.force_authenticate(self.user)
+
+    def test_requests_are_recorded_by_route(self):
+        requests_before = REQUESTS.values.get(('journey-list', 'GET', '200'), 0)
+        serialized_before = PHASE_TIME.values.get(('journey-list', 'serialize'), [None, 0, 0])[2]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/journeys/', {'expand': 'user'})
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, total;dur=')
+        self.assertEqual(REQUESTS.values[('journey-list', 'GET', '200')], requests_before + 1)
+        self.assertEqual(PHASE_TIME.values[('journey-list', 'serialize')][2], serialized_before + 1)
+
+        self.client.get('/api/nowhere/')
+        with override_settings(DEBUG=True):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('metro_http_requests_total{route="unmatched",method="GET",status="404"}', body)
+        self.assertIn('metro_http_response_size_bytes_bucket{route="journey-list",le="+Inf"}', body)
+        self.assertIn('# TYPE metro_db_queries_per_request histogram', body)
+        self.assertIn(('journey-list',), DB_QUERIES.values)
+
+    def test_unknown_methods_share_one_series_and_timing_can_be_turned_off(self):
+        with override_settings(METRICS_SERVER_TIMING=False):
+            response = APIClient().generic('BREW', '/api/journeys/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIn(('journey-list', 'other', str(response.status_code)), REQUESTS.values)
+        self.assertFalse(any(key[1] == 'BREW' for key in REQUESTS.values))
+
+    def test_histograms_render_cumulative_buckets(self):
+        histogram = Histogram('test_seconds', 'Test.', ('route',), buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('a"b',), value)
+        self.assertEqual(list(histogram.samples()), [
+            'test_seconds_bucket{route="a\\"b",le="0.1"} 2',
+            'test_seconds_bucket{route="a\\"b",le="1"} 3',
+            'test_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+            'test_seconds_sum{route="a\\"b"} 3.65',
+            'test_seconds_count{route="a\\"b"} 4',
+        ])
+
+    def test_metrics_endpoint_is_restricted(self):
+        # Without a token only loopback clients may scrape, and only in development.
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.9').status_code, 403)
+        self.assertEqual([message.id for message in check_metrics_token(None)], ['metro.W002'])
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret', REMOTE_ADDR='203.0.113.9')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertEqual(check_metrics_token(None), [])
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        # A cached response from an earlier test would leave nothing to sample.
+        cache.clear()
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 1), fare=Decimal('60'))
+        self.client.force_authenticate(self.user)
+        self.directory = tempfile.mkdtemp()
+
+    def test_slow_queries_are_logged_with_request_and_origin(self):
+        with override_settings(PROFILE_SLOW_QUERY_MS=0), self.assertLogs('metro.profiling', 'WARNING') as logs:
+            self.client.get('/api/journeys/')
+        message = next(line for line in logs.output if 'metro_journey' in line)
+        self.assertIn('in GET /api/journeys/ (journey-list) from metro/', message)
+        self.assertRegex(message, r'from metro/\w+\.py:\d+ in \w+')
+        with self.assertNoLogs('metro.profiling'):
+            self.client.get('/api/payments/')
+
+    def test_slow_query_values_are_only_logged_on_request(self):
+        update = lambda: User.objects.filter(pk=self.user.pk).update(email='secret@example.com')
+        with override_settings(PROFILE_SLOW_QUERY_MS=0), self.assertLogs('metro.profiling', 'WARNING') as logs:
+            update()
+        self.assertNotIn('secret@example.com', '\n'.join(logs.output))
+        self.assertIn('params (str, int)', '\n'.join(logs.output))
+        with override_settings(PROFILE_SLOW_QUERY_MS=0, PROFILE_SLOW_QUERY_PARAMS=True), \
+                self.assertLogs('metro.profiling', 'WARNING') as logs:
+            update()
+        self.assertIn('secret@example.com', '\n'.join(logs.output))
+
+    def test_sampled_requests_are_dumped_as_collapsed_stacks(self):
+        # The sampler needs the GIL while the request runs, which by default
+        # is only handed over every 5ms: longer than a fast request.
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(0.0001)
+        with override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_SAMPLE_INTERVAL=0.0002, PROFILE_DIR=self.directory,
+                               RESPONSE_CACHE_TIMEOUT=0):
+            for _ in range(10):
+                self.client.get('/api/journeys/', {'expand': 'user'})
+        dumps = list(Path(self.directory).glob('*.folded'))
+        self.assertTrue(dumps)
+        self.assertTrue(all(path.name.startswith('journey-list-') for path in dumps))
+        self.assertRegex(dumps[0].read_text(), r'^[^ ;]+(;[^ ;]+)* \d+\n')
+        with override_settings(PROFILE_SAMPLE_RATE=0, PROFILE_DIR=self.directory):
+            self.client.get('/api/journeys/')
+        self.assertEqual(len(list(Path(self.directory).glob('*.folded'))), len(dumps))
+
+    def test_report_merges_dumps(self):
+        dump_profile({'a:main;b:view;c:query': 3, 'a:main;b:view': 1}, 'journey-list', self.directory)
+        dump_profile({'a:main;b:view;c:query': 2}, 'admin:metro_journey_changelist', self.directory)
+        stacks, routes = load_profiles(self.directory)
+        self.assertEqual(stacks, {'a:main;b:view;c:query': 5, 'a:main;b:view': 1})
+        self.assertEqual(routes, {'journey-list': 4, 'admin_metro_journey_changelist': 2})
+        own, total = function_totals(stacks)
+        self.assertEqual((own['c:query'], own['b:view'], total['b:view'], total['a:main']), (5, 1, 6, 6))
+        self.assertEqual(load_profiles(self.directory, 'journey-list')[0]['a:main;b:view;c:query'], 3)
+
+        merged = Path(self.directory) / 'merged.txt'
+        out = StringIO()
+        call_command('profile_report', dir=self.directory, top=1, output=str(merged), stdout=out)
+        report = out.getvalue()
+        self.assertIn('6 samples', report)
+        functions = report.split('Hottest functions')[1].split('Hottest paths')[0]
+        self.assertEqual([line.strip() for line in functions.strip().splitlines()[1:]], ['83.3%  83.3%  c:query'])
+        self.assertEqual(merged.read_text().splitlines(), ['a:main;b:view;c:query 5', 'a:main;b:view 1'])
+
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client.force_authenticate(self.user)
+        payment = Payment.objects.create(user=self.user, method='bKash', reference='REF1', amount=Decimal('60'))
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 1),
+                               fare=Decimal('60'), payment=payment)
+        Journey.objects.create(user=self.user, route='Mirpur 10 - Farmgate', date=date(2025, 4, 2), fare=Decimal('40.5'))
+        LostItem.objects.create(title='Umbrella', description='Black', location='Farmgate', status='unclaimed',
+                                posted_by=self.user, image_url='lost_items/umbrella.jpg')
+        LostItem.objects.create(title='Wallet', description='Brown', location='Pallabi', status='claimed',
+                                posted_by=self.user)
+
+    def test_lists_match_the_model_serializers(self):
+        request = Request(APIRequestFactory().get('/'))
+        for url, serializer_class, queryset in (
+            ('/api/journeys/', JourneySerializer, Journey.objects.order_by('-date', '-id')),
+            ('/api/payments/', PaymentSerializer, Payment.objects.order_by('-timestamp')),
+            ('/api/lost-items/', LostItemSerializer, LostItem.objects.order_by('-id')),
+        ):
+            expected = serializer_class(queryset, many=True, context={'request': request}).data
+            self.assertEqual(self.client.get(url).json()['results'], json.loads(json.dumps(expected)), url)
+        item = self.client.get('/api/lost-items/').json()['results'][1]
+        self.assertEqual(item['image_url'], 'http://testserver/media/lost_items/umbrella.jpg')
+
+    def test_sparse_fields_still_paginate(self):
+        response = self.client.get('/api/journeys/', {'fields': 'fare', 'page_size': 1})
+        self.assertEqual(response.json()['results'], [{'fare': '40.50'}])
+        self.assertEqual(self.client.get(response.json()['next']).json()['results'], [{'fare': '60.00'}])
+
+    def test_orjson_renderer_matches_drf_and_parser_rejects_bad_json(self):
+        data = {
+            'when': datetime(2025, 4, 1, 8, 30, 0, 1500, tzinfo=dt_timezone.utc), 'day': date(2025, 4, 1),
+            'amount': Decimal('1.50'), 'label': gettext_lazy('Umbrella'), 'text': 'a\u2028b', 1: (1, None),
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        response = self.client.post('/api/journeys/', '{"route": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    def test_list_querysets_use_indexes(self):
+        user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        for prefix, viewset, basename in router.registry:
+            with self.subTest(endpoint=prefix):
+                self.assertNoFullScan(list_queryset(viewset, user))
+
+    def test_unindexed_sort_is_reported(self):
+        with self.assertRaises(AssertionError):
+            self.assertNoFullScan(Journey.objects.order_by('route')[:10])
+
+
+class QueryCountTests(QueryCountAssertions, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.admin = User.objects.create_superuser('staff', 'staff@example.com', 'pass12345', name='Staff')
+        for i in range(3):
+            payment = Payment.objects.create(user=self.user, method='bKash', reference=f'REF{i}', amount=Decimal('60'))
+            Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, i + 1),
+                                   fare=Decimal('60'), payment=payment)
+            LostItem.objects.create(title=f'Umbrella {i}', description='Black', location='Farmgate',
+                                    status='unclaimed', posted_by=self.admin)
+            UserLostReport.objects.create(user=self.user, title=f'Wallet {i}', description='Brown', contact='017')
+            Feedback.objects.create(user=self.user, rating=5, comment='Great')
+            Complaint.objects.create(user=self.user, title=f'Late {i}', description='Delayed', urgency='low')
+
+    def test_api_query_budget(self):
+        self.client.force_authenticate(self.user)
+        budget = [
+            ('/api/journeys/', None, 1),
+            ('/api/journeys/', {'expand': 'payment,user'}, 1),
+            ('/api/journeys/summary/', {'month': '2025-04'}, 7),
+            ('/api/payments/', {'expand': 'user'}, 1),
+            ('/api/lost-items/', {'expand': 'posted_by'}, 1),
+            ('/api/lost-reports/', {'expand': 'user'}, 1),
+            ('/api/feedback/', {'expand': 'user'}, 1),
+            ('/api/complaints/', {'expand': 'user'}, 1),
+        ]
+        for url, params, expected in budget:
+            with self.subTest(url=url, params=params):
+                self.assertEndpointQueries(url, expected, params)
+
+    def test_expanded_payment_is_nested(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/journeys/', {'expand': 'payment'})
+        self.assertEqual(response.data['results'][0]['payment']['method'], 'bKash')
+
+    def test_admin_changelist_query_budget(self):
+        self.client.force_login(self.admin)
+        for model, expected in [('journey', 5), ('payment', 5), ('lostitem', 5), ('complaint', 5)]:
+            with self.subTest(model=model):
+                self.assertEndpointQueries(f'/admin/metro/{model}/', expected)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client.force_authenticate(self.user)
+        self.umbrella = self.add_item('Black Umbrella', 'Folding, wooden handle', 'Farmgate Station')
+        self.wallet = self.add_item('Wallet', 'Brown leather, found next to an umbrella stand', 'Agargaon')
+        self.phone = self.add_item('Phone', 'Samsung with cracked screen', 'Umbrella shop, Mirpur 10')
+
+    def add_item(self, title, description, location):
+        return LostItem.objects.create(title=title, description=description, location=location,
+                                       status='unclaimed', posted_by=self.user)
+
+    def found(self, url, query):
+        response = self.client.get(url, {'q': query})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['next'])
+        return [row['id'] for row in response.json()['results']]
+
+    def test_matches_are_ranked_title_then_location_then_description(self):
+        ids = [self.umbrella.id, self.phone.id, self.wallet.id]
+        self.assertEqual(self.found('/api/lost-items/', 'umbrella'), ids)
+        self.assertEqual(self.found('/api/lost-items/', 'UMBRELLAS'), ids)
+        self.assertEqual(self.found('/api/lost-items/', 'umbr'), ids)
+        self.assertEqual(self.found('/api/lost-items/', 'brown umbrella'), [self.wallet.id])
+        self.assertEqual(self.found('/api/lost-items/', 'laptop'), [])
+        self.assertEqual(self.found('/api/lost-items/', '"*'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.umbrella.title = 'Blue Raincoat'
+        self.umbrella.save()
+        self.assertEqual(self.found('/api/lost-items/', 'raincoat'), [self.umbrella.id])
+        self.assertNotIn(self.umbrella.id, self.found('/api/lost-items/', 'black'))
+        self.wallet.delete()
+        self.assertEqual(self.found('/api/lost-items/', 'leather'), [])
+
+    def test_reports_are_searched_within_the_users_own(self):
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+        mine = UserLostReport.objects.create(user=self.user, title='Lost umbrella', description='Red', contact='017')
+        UserLostReport.objects.create(user=other, title='Lost umbrella', description='Red', contact='018')
+        self.assertEqual(self.found('/api/lost-reports/', 'umbrella'), [mine.id])
+
+    def test_rebuild_command_indexes_bulk_created_rows(self):
+        LostItem.objects.bulk_create([LostItem(title='Laptop', description='Grey', location='Pallabi',
+                                               status='unclaimed', posted_by=self.user)])
+        self.assertEqual(self.found('/api/lost-items/', 'laptop'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.found('/api/lost-items/', 'laptop')), 1)
+
+    def test_loaded_fixtures_are_indexed_by_the_rebuild(self):
+        fixture = Path(tempfile.mkdtemp()) / 'items.json'
+        fixture.write_text(json.dumps([{'model': 'metro.lostitem', 'pk': 900, 'fields': {
+            'title': 'Laptop', 'description': 'Grey', 'location': 'Pallabi', 'status': 'unclaimed',
+            'posted_by': self.user.id,
+        }}]))
+        call_command('loaddata', str(fixture), verbosity=0)
+        self.assertEqual(self.found('/api/lost-items/', 'laptop'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('/api/lost-items/', 'laptop'), [900])
+
+    def test_admin_search_uses_the_index(self):
+        admin = User.objects.create_superuser('staff', 'staff@example.com', 'pass12345', name='Staff')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/metro/lostitem/', {'q': 'umbrellas'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertNotIn('LIKE', ' '.join(str(response.context['cl'].queryset.query).split()).upper())
+
+
+@override_settings(TASK_QUEUE_EAGER=True)
+class LostItemMatchingTests(APITestCase):
+    def setUp(self):
+        invalidate_match_engine()
+        self.addCleanup(invalidate_match_engine)
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pass12345', name='Staff', is_admin=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.umbrella = self.add_item('Black umbrella', 'Folding, wooden handle', 'Farmgate Station')
+            self.wallet = self.add_item('Brown wallet', 'Leather, with ID cards', 'Agargaon Station')
+            self.phone = self.add_item('Samsung phone', 'Black case, cracked screen', 'Uttara North Station')
+
+    def add_item(self, title, description, location):
+        return LostItem.objects.create(title=title, description=description, location=location,
+                                       status='unclaimed', posted_by=self.staff)
+
+    def report(self, title, description, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return UserLostReport.objects.create(user=user or self.user, title=title, description=description,
+                                                 contact='017')
+
+    def matched_items(self, report):
+        return list(report.matches.order_by('-score').values_list('item_id', flat=True))
+
+    def test_reports_and_items_are_matched_as_they_arrive(self):
+        report = self.report('Lost my umbrella', 'Black, wooden handle, left on the train at Farmgate')
+        self.assertEqual(self.matched_items(report)[0], self.umbrella.id)
+        self.assertNotIn(self.wallet.id, self.matched_items(report))
+        scores = list(report.matches.order_by('-score').values_list('score', flat=True))
+        self.assertGreater(scores[0], 0.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            raincoat = self.add_item('Blue raincoat', 'Hooded', 'Shahbag Station')
+            second = self.add_item('Umbrella', 'Black, wooden handle', 'Farmgate')
+        self.assertEqual(list(raincoat.matches.all()), [])
+        self.assertEqual(self.matched_items(report)[:1], [second.id])
+
+    def test_claimed_items_stop_matching(self):
+        report = self.report('Umbrella', 'Black wooden handle')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.umbrella.status = 'claimed'
+            self.umbrella.save()
+        self.assertNotIn(self.umbrella.id, self.matched_items(report))
+        self.assertNotIn(self.umbrella.id, self.matched_items(self.report('Black umbrella', 'Wooden handle')))
+
+    def test_owner_and_staff_endpoints(self):
+        report = self.report('Wallet', 'Brown leather wallet with my ID cards')
+        other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'/api/lost-reports/{report.id}/matches/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['item']['title'], 'Brown wallet')
+        self.assertEqual(self.client.get('/api/lost-item-matches/').status_code, 403)
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/lost-reports/{report.id}/matches/').status_code, 404)
+
+        self.client.force_authenticate(self.staff)
+        response = self.client.get('/api/lost-item-matches/', {'report': report.id, 'expand': 'item'})
+        self.assertEqual([row['item']['id'] for row in response.data['results']], [self.wallet.id])
+        self.assertEqual(self.client.get('/api/lost-item-matches/', {'item': 'x'}).status_code, 400)
+
+    def test_rematch_command_agrees_with_incremental_matching(self):
+        for title, description in [('Umbrella', 'black'), ('Phone', 'Samsung, cracked'), ('Wallet', 'brown')]:
+            self.report(title, description)
+        incremental = set(LostItemMatch.objects.values_list('item_id', 'report_id'))
+        call_command('match_lost_items', stdout=StringIO())
+        self.assertEqual(set(LostItemMatch.objects.values_list('item_id', 'report_id')), incremental)
+
+    def test_sparse_scores_match_pairwise_cosine(self):
+        rng = random.Random(5)
+        words = [f'w{i}' for i in range(40)]
+        engine = MatchEngine()
+        documents = {}
+        for doc_id in range(1, 200):
+            documents[doc_id] = Counter(rng.choices(words, k=rng.randint(1, 8)))
+            engine.add('item', doc_id, documents[doc_id])
+        engine.refresh_norms()
+
+        def weigh(vector):
+            return {term: tf * engine.idf(term) for term, tf in vector.items()}
+
+        def cosine(a, b):
+            a, b = weigh(a), weigh(b)
+            dot = sum(weight * b.get(term, 0) for term, weight in a.items())
+            return dot / math.sqrt(sum(w * w for w in a.values()) * sum(w * w for w in b.values()))
+
+        for _ in range(20):
+            query = Counter(rng.choices(words, k=5))
+            expected = sorted(((cosine(query, vector), doc_id) for doc_id, vector in documents.items()),
+                              reverse=True)[:10]
+            top = engine.top('item', query, k=10, min_score=0)
+            self.assertEqual([doc_id for doc_id, score in top], [doc_id for score, doc_id in expected])
+            for (doc_id, score), (expected_score, _) in zip(top, expected):
+                self.assertAlmostEqual(score, expected_score)
+
+        queries = [Counter(rng.choices(words, k=5)) for _ in range(300)] + [Counter()]
+        self.assertEqual(engine.top_many('item', queries), [engine.top('item', query) for query in queries])
+
+
+
+@override_settings(TASK_QUEUE_EAGER=True)
+class LostItemImageTests(APITestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pass12345', name='Staff', is_admin=True)
+        self.client.force_authenticate(self.staff)
+
+    def photo(self, size=(3000, 2000)):
+        """A landscape JPEG tagged to display rotated a quarter turn, with a GPS position."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x8825] = {1: 'N', 2: (23.0, 45.0, 30.0)}
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 40, 40)).save(buffer, 'JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def upload(self, data, title='Red umbrella'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/lost-items/', {
+                'title': title, 'description': 'Folding', 'location': 'Farmgate Station', 'status': 'unclaimed',
+                'posted_by': self.staff.id, 'image_url': SimpleUploadedFile('IMG_0001.jpg', data, 'image/jpeg'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return LostItem.objects.get(pk=response.data['id'])
+
+    def test_upload_is_cleaned_and_rendered_under_its_digest(self):
+        data = self.photo()
+        item = self.upload(data)
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual((item.image_sha256, item.image_url.name), (digest, f'lost_items/{digest}/original.jpg'))
+        self.assertEqual(sorted(path.name for path in (self.media / 'lost_items').iterdir()), [digest])
+
+        with Image.open(self.media / item.image_url.name) as original:
+            self.assertEqual(original.size, (1365, 2048))
+            self.assertEqual(len(original.getexif()), 0)
+        for rendition, size in (('thumb', 320), ('medium', 1024)):
+            for extension in ('webp', 'jpeg'):
+                with Image.open(self.media / 'lost_items' / digest / f'{rendition}.{extension}') as image:
+                    self.assertEqual(max(image.size), size)
+                    self.assertEqual(len(image.getexif()), 0)
+
+        row = self.client.get('/api/lost-items/').json()['results'][0]
+        self.assertEqual(row['thumbnails']['thumb']['webp'], f'http://testserver/media/lost_items/{digest}/thumb.webp')
+        self.assertEqual(row['image_url'], f'http://testserver/media/lost_items/{digest}/original.jpg')
+        detail = self.client.get(f'/api/lost-items/{item.id}/').json()
+        self.assertEqual(detail['thumbnails'], row['thumbnails'])
+
+    def test_identical_uploads_share_files(self):
+        data = self.photo(size=(800, 600))
+        first, second = self.upload(data), self.upload(data, title='Another umbrella')
+        self.assertEqual(first.image_url.name, second.image_url.name)
+        self.assertEqual(len(list((self.media / 'lost_items').rglob('*.*'))), 5)
+
+    def test_replaced_photo_loses_its_thumbnails_until_processed(self):
+        item = self.upload(self.photo(size=(800, 600)))
+        item.image_url = SimpleUploadedFile('IMG_0002.jpg', self.photo(size=(600, 800)), 'image/jpeg')
+        with self.captureOnCommitCallbacks(execute=False):
+            item.save()
+        self.assertEqual(item.image_sha256, '')
+        self.assertIsNone(self.client.get(f'/api/lost-items/{item.id}/').json()['thumbnails'])
+
+
+
+attempts_by_key = Counter()
+
+
+@task(max_attempts=2, retry_delay=60)
+def fail_first_attempt(key):
+    attempts_by_key[key] += 1
+    if attempts_by_key[key] == 1:
+        raise RuntimeError('first attempt always fails')
+
+
+class TaskQueueTests(APITestCase):
+    def run_due_tasks(self):
+        return Worker(pool='inline', poll_interval=0).run(once=True)
+
+    def test_tasks_are_queued_with_the_transaction(self):
+        with transaction.atomic():
+            fail_first_attempt.delay('kept')
+        try:
+            with transaction.atomic():
+                fail_first_attempt.delay('rolled back')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(list(Task.objects.values_list('name', 'args', 'status')),
+                         [('metro.tests.fail_first_attempt', ['kept'], 'queued')])
+        self.assertEqual(claim('a', 10), [Task.objects.get().pk])
+        self.assertEqual(claim('b', 10), [])
+
+    def test_failed_attempts_are_retried_with_backoff(self):
+        row = fail_first_attempt.delay('retry')
+        with self.assertLogs('metro.tasks', 'ERROR'):
+            self.assertEqual(self.run_due_tasks(), 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('queued', 1))
+        self.assertIn('first attempt always fails', row.last_error)
+        self.assertGreater(row.run_after, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(self.run_due_tasks(), 0)
+
+        Task.objects.filter(pk=row.pk).update(run_after=timezone.now())
+        self.assertEqual(self.run_due_tasks(), 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.last_error), ('done', 2, ''))
+        stats = task_stats(timezone.now() - timedelta(minutes=1))['metro.tests.fail_first_attempt']
+        self.assertEqual((stats['done'], stats['failed'], stats['retried']), (1, 0, 1))
+        self.assertIsNotNone(stats['run_p95'])
+
+    def test_tasks_lost_with_their_worker_are_retried_until_exhausted(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        retried = Task.objects.create(name='metro.tests.fail_first_attempt', args=['lost'], status='running',
+                                      attempts=1, max_attempts=2, started_at=long_ago)
+        exhausted = Task.objects.create(name='metro.tests.fail_first_attempt', args=['lost'], status='running',
+                                        attempts=2, max_attempts=2, started_at=long_ago)
+        purged = Task.objects.create(name='metro.tests.fail_first_attempt', status='done',
+                                     finished_at=long_ago - timedelta(days=30))
+        with self.assertLogs('metro.tasks', 'WARNING'):
+            recover_and_purge()
+        self.assertEqual(Task.objects.get(pk=retried.pk).status, 'queued')
+        self.assertEqual(Task.objects.get(pk=exhausted.pk).status, 'failed')
+        self.assertFalse(Task.objects.filter(pk=purged.pk).exists())
+
+    def test_urgent_complaints_notify_staff_from_the_worker(self):
+        user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        User.objects.create_user('staff', 'staff@example.com', 'pass12345', name='Staff', is_admin=True)
+        self.client.force_authenticate(user)
+        for urgency in ('low', 'high'):
+            response = self.client.post('/api/complaints/', {
+                'user': user.id, 'title': f'{urgency} priority', 'description': 'Escalator stopped', 'urgency': urgency,
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(self.run_due_tasks(), 1)
+        self.assertEqual([(message.subject, message.to) for message in mail.outbox],
+                         [('Urgent complaint: high priority', ['staff@example.com'])])
+
+
+class BulkIngestionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+        self.client.force_authenticate(self.user)
+
+    def test_valid_rows_are_written_and_invalid_rows_reported(self):
+        foreign_payment = Payment.objects.create(user=self.other, method='Card', reference='X', amount=Decimal('60'))
+        rows = [
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-01', 'fare': '60.00'},
+            {'route': 'Pallabi - Agargaon', 'date': 'not-a-date', 'fare': '60.00'},
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-02', 'fare': '60.00', 'user': self.other.id},
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-03', 'fare': '60.00', 'payment': foreign_payment.id},
+            {'route': 'Mirpur 10 - Farmgate', 'date': '2025-04-04', 'fare': '100.00'},
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-05', 'fare': '60.00', 'user': True},
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-06', 'fare': '60.00', 'payment': False},
+        ]
+        response = self.client.post('/api/journeys/bulk/', rows, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 5, 6])
+        self.assertEqual(response.data['errors'][3]['errors'], {'user': ['Expected a user id.']})
+        self.assertIn('date', response.data['errors'][0]['errors'])
+        summary = self.client.get('/api/journeys/summary/').data
+        self.assertEqual((summary['total_journeys'], summary['total_fare']), (2, '160.00'))
+
+    def test_chunks_validate_with_constant_queries(self):
+        rows = [{'route': 'Pallabi - Agargaon', 'date': '2025-04-01', 'fare': '60.00'}] * 50
+        ingestor = JourneyBulkIngestor(self.user, chunk_size=100)
+        # One INSERT plus the rollup upsert, each inside a savepoint.
+        with self.assertNumQueries(7):
+            result = ingestor.ingest(rows)
+        self.assertEqual(result['created'], 50)
+
+    def test_payments_accept_ndjson_and_are_idempotent_on_reference(self):
+        body = '\n'.join([
+            '{"method": "bKash", "reference": "REF1", "amount": "60.00"}',
+            '{"method": "bKash", "reference": "REF1", "amount": "60.00"}',
+            '{"method": "Cash", "reference": "REF2", "amount": "60.00"}',
+            '',
+        ])
+        response = self.client.post('/api/payments/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['skipped']), (1, 1))
+        self.assertIn('method', response.data['errors'][0]['errors'])
+
+        response = self.client.post('/api/payments/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, 2))
+        self.assertEqual(Payment.objects.filter(reference='REF1').count(), 1)
+
+    def test_payment_written_concurrently_is_skipped_not_duplicated(self):
+        class RacingIngestor(PaymentBulkIngestor):
+            def resolve(ingestor, valid):
+                resolved = super().resolve(valid)
+                # Another upload of the same batch commits after the check.
+                Payment.objects.create(user=self.user, method='bKash', reference='REF1', amount=Decimal('60'))
+                return resolved
+
+        rows = [{'method': 'bKash', 'reference': reference, 'amount': '60.00'} for reference in ('REF1', 'REF2')]
+        result = RacingIngestor(self.user).ingest(rows)
+        self.assertEqual((result['created'], result['skipped'], result['errors']), (1, 1, []))
+        self.assertEqual(Payment.objects.filter(reference='REF1').count(), 1)
+        summary = self.client.get('/api/journeys/summary/').data
+        self.assertEqual((summary['total_payments'], summary['total_paid']), (2, '120.00'))
+
+        response = self.client.post('/api/payments/', {
+            'user': self.user.id, 'method': 'Nagad', 'reference': 'REF2', 'amount': '60.00',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class JourneyExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+        for day, route in [(1, 'Pallabi - Agargaon'), (2, 'Mirpur 10 - Farmgate'), (3, 'Pallabi - Agargaon')]:
+            Journey.objects.create(user=self.user, route=route, date=date(2025, 4, day), fare=Decimal('60'))
+        Journey.objects.create(user=self.other, route='Pallabi - Agargaon', date=date(2025, 4, 1), fare=Decimal('60'))
+        self.client.force_authenticate(self.user)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_own_journeys_with_filters(self):
+        response = self.client.get('/api/journeys/export/', {'date_from': '2025-04-02', 'route': 'Pallabi - Agargaon'})
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], 'id,date,route,fare,payment')
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['2025-04-03'])
+
+    def test_ndjson_export(self):
+        rows = [json.loads(line) for line in self.read(self.client.get('/api/journeys/export/', {'format': 'ndjson'})).splitlines()]
+        self.assertEqual([row['date'] for row in rows], ['2025-04-01', '2025-04-02', '2025-04-03'])
+        self.assertEqual(rows[0]['fare'], '60.00')
+
+    def test_bad_date_is_rejected(self):
+        self.assertEqual(self.client.get('/api/journeys/export/', {'date_to': 'April'}).status_code, 400)
+
+    def test_admin_export_covers_all_users_and_requires_admin(self):
+        self.assertEqual(self.client.get('/api/journeys/export/all/').status_code, 403)
+        self.user.is_admin = True
+        self.user.save()
+        lines = self.read(self.client.get('/api/journeys/export/all/')).splitlines()
+        self.assertEqual(lines[0], 'id,user,user_name,date,route,fare,payment')
+        self.assertEqual(len(lines), 5)
+
+
+class FareMatrixTests(APITestCase):
+    fixtures = ['mrt_line6']
+
+    def setUp(self):
+        invalidate_fare_matrix()
+        self.addCleanup(invalidate_fare_matrix)
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client.force_authenticate(self.user)
+
+    def test_fare_rule_rounds_up_and_clamps(self):
+        self.assertEqual(fare_for_distance(0.5), Decimal('20.00'))
+        self.assertEqual(fare_for_distance(4.4), Decimal('30.00'))
+        self.assertEqual(fare_for_distance(40), Decimal('100.00'))
+
+    def test_shortest_paths_across_a_transfer(self):
+        class Stop:
+            def __init__(self, id, code):
+                self.id, self.code, self.name = id, code, code
+        a, b, c, d = Stop(1, 'A'), Stop(2, 'B'), Stop(3, 'C'), Stop(4, 'D')
+        # A-B-C on one line, B-D on another, plus a slow direct A-C link.
+        matrix = FareMatrix([a, b, c, d], [(0, 1, 1, 60), (1, 2, 1, 60), (1, 3, 2, 90), (0, 2, 5, 100)])
+        self.assertEqual(matrix.lookup(a, c)['distance_km'], 2)
+        self.assertEqual(matrix.lookup(a, c)['travel_seconds'], 100)
+        self.assertEqual(matrix.lookup(d, c)['distance_km'], 3)
+
+    def test_fare_lookup_endpoint_uses_no_queries_once_loaded(self):
+        self.client.get('/api/fares/', {'from': 'UTN', 'to': 'MTJ'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/fares/', {'from': 'Uttara North', 'to': 'motijheel'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['fare'], '100.00')
+        self.assertEqual(response.data['from']['code'], 'UTN')
+        self.assertEqual(self.client.get('/api/fares/', {'from': 'UTN', 'to': 'Nowhere'}).status_code, 400)
+
+    def test_journey_fare_is_validated_against_the_matrix(self):
+        response = self.client.post('/api/journeys/', {
+            'user': self.user.id, 'route': 'Mirpur 10 - Farmgate', 'date': '2025-04-20', 'fare': '150.00',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fare', response.data)
+
+        response = self.client.post('/api/journeys/', {
+            'user': self.user.id, 'route': 'Mirpur 10 - Farmgate', 'date': '2025-04-20',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['fare'], '40.00')
+
+        response = self.client.post('/api/journeys/', {
+            'user': self.user.id, 'route': 'Mirpur 10 - Gulshan', 'date': '2025-04-20',
+        })
+        self.assertIn('route', response.data)
+
+    def test_network_edits_rebuild_the_matrix(self):
+        self.assertEqual(self.client.get('/api/fares/', {'from': 'UTN', 'to': 'UTC'}).data['fare'], '20.00')
+        LineStop.objects.filter(station__code='UTC').update(distance_km=Decimal('9'))
+        Station.objects.get(code='UTC').save()
+        self.assertEqual(self.client.get('/api/fares/', {'from': 'UTN', 'to': 'UTC'}).data['fare'], '50.00')
+
+    def test_invalidating_during_a_get_never_hands_out_none(self):
+        builds = []
+        shared = VersionedBuild('test-build', lambda: builds.append(1) or len(builds))
+
+        class InvalidateOnRelease:
+            # Another thread's invalidate() lands right after get() releases the lock.
+            lock, fired = threading.Lock(), False
+
+            def __enter__(self):
+                self.lock.acquire()
+
+            def __exit__(self, *exc_info):
+                self.lock.release()
+                if not self.fired:
+                    self.fired = True
+                    shared.invalidate()
+
+        shared._lock = InvalidateOnRelease()
+        self.assertEqual(shared.get(), 1)
+        self.assertEqual(shared.get(), 2)
+
+
+class TimetableTests(APITestCase):
+    fixtures = ['mrt_line6']
+
+    def setUp(self):
+        for invalidate in (invalidate_fare_matrix, invalidate_timetable):
+            invalidate()
+            self.addCleanup(invalidate)
+        self.line = Line.objects.get(code='MRT6')
+
+    def departures(self, **params):
+        response = self.client.get('/api/departures/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['departures']
+
+    def test_next_departures_are_in_time_order_for_the_service_day(self):
+        counts = import_gtfs(*synthesize_gtfs(self.line, first='06:30', last='07:30', headway=10))
+        self.assertEqual(counts, {'services': 1, 'trips': 14, 'stop_times': 14 * 16})
+
+        departures = self.departures(station='UTN', after='06:31', date='2025-04-21', limit=2)
+        self.assertEqual([d['departure'] for d in departures], ['06:40:00', '06:50:00'])
+        self.assertEqual(departures[0]['headsign'], 'Motijheel')
+        # The terminus only shows trains heading back out.
+        self.assertEqual({d['headsign'] for d in self.departures(station='MTJ', after='06:00', limit=20)},
+                         {'Uttara North'})
+        self.assertEqual(self.departures(station='UTN', after='07:31'), [])
+
+    def test_services_only_run_on_their_days(self):
+        import_gtfs(*synthesize_gtfs(self.line, service='WEEKDAY', days=('sunday', 'monday', 'tuesday')))
+        self.assertEqual(len(self.departures(station='UTN', after='06:00', date='2025-04-21')), 5)
+        self.assertEqual(self.departures(station='UTN', after='06:00', date='2025-04-25'), [])
+
+    def test_endpoint_uses_no_queries_once_loaded(self):
+        import_gtfs(*synthesize_gtfs(self.line))
+        self.departures(station='UTN', after='08:00')
+        with self.assertNumQueries(0):
+            self.departures(station='Agargaon', after='08:00')
+        response = self.client.get('/api/departures/', {'station': 'Nowhere', 'after': '8am', 'limit': '0'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'station', 'after', 'limit'})
+
+    def test_timetable_edits_rebuild_the_index(self):
+        import_gtfs(*synthesize_gtfs(self.line, first='06:30', last='06:30'))
+        self.assertEqual(self.departures(station='UTN', after='06:00')[0]['departure'], '06:30:00')
+        first = StopTime.objects.get(trip__code__endswith='-0-063000', sequence=1)
+        first.departure += 60
+        first.save()
+        self.assertEqual(self.departures(station='UTN', after='06:00')[0]['departure'], '06:31:00')
+        Trip.objects.all().delete()
+        self.assertEqual(self.departures(station='UTN', after='06:00'), [])
+
+    def test_new_stations_have_no_departures_until_scheduled(self):
+        import_gtfs(*synthesize_gtfs(self.line))
+        stale = get_timetable()
+        station = Station.objects.create(code='NEW', name='New Station')
+        LineStop.objects.create(line=self.line, station=station, sequence=17, distance_km=Decimal('1.2'),
+                                travel_seconds=120)
+        self.assertIsNot(get_timetable(), stale)
+        self.assertEqual(stale.next_departures(station, 0, 0), [])
+        self.assertEqual(self.departures(station='NEW', after='06:00'), [])
+
+    def test_import_command_reads_a_feed_directory(self):
+        calendar, trips, stop_times = synthesize_gtfs(self.line, first='06:30', last='06:45', headway=15)
+        with tempfile.TemporaryDirectory() as feed:
+            for name, rows in (('calendar', calendar), ('trips', trips), ('stop_times', stop_times)):
+                with open(Path(feed) / f'{name}.txt', 'w', newline='') as handle:
+                    writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                    writer.writerows(rows)
+            out = StringIO()
+            call_command('import_gtfs', feed, stdout=out)
+        self.assertIn('4 trips', out.getvalue())
+        self.assertEqual(len(get_timetable().trips), 4)
+
+
+class JourneyPlannerTests(APITestCase):
+    fixtures = ['mrt_line6']
+
+    def setUp(self):
+        for invalidate in (invalidate_fare_matrix, invalidate_timetable):
+            invalidate()
+            self.addCleanup(invalidate)
+        line = Line.objects.get(code='MRT6')
+        # A short branch from Farmgate, so some journeys need a transfer.
+        branch = Line.objects.create(code='BR', name='Tejgaon Branch')
+        tejgaon = Station.objects.create(code='TJG', name='Tejgaon')
+        LineStop.objects.create(line=branch, station=Station.objects.get(code='FMG'), sequence=1,
+                                distance_km=0, travel_seconds=0)
+        LineStop.objects.create(line=branch, station=tejgaon, sequence=2, distance_km=Decimal('1.5'),
+                                travel_seconds=150)
+        main = synthesize_gtfs(line, first='06:30', last='08:00', headway=10)
+        spur = synthesize_gtfs(branch, service='BRANCH', first='06:35', last='08:00', headway=15)
+        import_gtfs(*(a + b for a, b in zip(main, spur)))
+
+    def plan(self, status_code=200, **params):
+        response = self.client.get('/api/plan/', {'date': '2025-04-21', **params})
+        self.assertEqual(response.status_code, status_code, response.data)
+        return response.data
+
+    def test_direct_ride_takes_the_next_train(self):
+        plan = self.plan(**{'from': 'UTN', 'to': 'MTJ', 'after': '06:31'})
+        self.assertEqual((plan['departure'], plan['transfers'], plan['fare']), ('06:40:00', 0, '100.00'))
+        self.assertEqual(plan['legs'][0]['stops'], 15)
+        self.assertEqual(plan['arrival'], plan['legs'][0]['arrival'])
+
+    def test_transfer_boards_the_first_connection_after_arriving(self):
+        plan = self.plan(**{'from': 'Uttara North', 'to': 'Tejgaon', 'after': '06:30'})
+        self.assertEqual(plan['transfers'], 1)
+        first, second = plan['legs']
+        self.assertEqual((first['to']['code'], second['from']['code'], second['line']), ('FMG', 'FMG', 'BR'))
+        self.assertGreaterEqual(second['departure'], first['arrival'])
+        # Branch trains leave Farmgate every 15 minutes from 06:35.
+        branch_departures = ['06:35:00', '06:50:00', '07:05:00', '07:20:00', '07:35:00', '07:50:00']
+        self.assertEqual(second['departure'], min(t for t in branch_departures if t >= first['arrival']))
+
+    def test_planner_is_reused_and_answers_without_queries(self):
+        self.plan(**{'from': 'UTN', 'to': 'MTJ', 'after': '07:00'})
+        planner = get_planner(0)
+        with self.assertNumQueries(0):
+            self.plan(**{'from': 'MTJ', 'to': 'TJG', 'after': '07:00'})
+        self.assertIs(get_planner(0), planner)
+
+    def test_matches_a_connection_scan(self):
+        timetable = get_timetable()
+        connections = []
+        for trip in timetable.running_trips(0):
+            for stop in range(timetable.trip_offsets[trip], timetable.trip_offsets[trip + 1] - 1):
+                connections.append((timetable.departures[stop], timetable.arrivals[stop + 1], trip,
+                                    timetable.stop_stations[stop], timetable.stop_stations[stop + 1]))
+        connections.sort()
+        planner = get_planner(0)
+        stations = range(len(timetable.stations))
+        for origin in stations:
+            for after in (6 * 3600, 7 * 3600 + 123):
+                earliest = {origin: after}
+                boarded = set()
+                for departure, arrival, trip, a, b in connections:
+                    if trip in boarded or earliest.get(a, float('inf')) <= departure:
+                        boarded.add(trip)
+                        earliest[b] = min(earliest.get(b, float('inf')), arrival)
+                for destination in stations:
+                    if destination == origin:
+                        continue
+                    legs = planner.earliest_arrival(origin, destination, after)
+                    if destination not in earliest:
+                        self.assertIsNone(legs)
+                        continue
+                    route, trip, _, alight = legs[-1]
+                    base, count = planner.route_base[route], len(planner.route_trips[route])
+                    self.assertEqual(planner.arrivals[base + alight * count + trip], earliest[destination])
+
+    def test_errors_and_no_service(self):
+        self.plan(404, **{'from': 'UTN', 'to': 'MTJ', 'after': '23:00'})
+        errors = self.plan(400, **{'from': 'UTN', 'to': 'utn', 'date': 'tomorrow'})
+        self.assertEqual(set(errors), {'to', 'date'})
+
+    def test_stations_missing_from_the_timetable_are_a_400(self):
+        # Rows written without signals: the fare matrix is refreshed by hand, the timetable lags behind.
+        get_timetable()
+        station = Station.objects.bulk_create([Station(code='NEW', name='New Station')])[0]
+        LineStop.objects.bulk_create([LineStop(line=Line.objects.get(code='BR'), station=station, sequence=3,
+                                               distance_km=Decimal('1'), travel_seconds=100)])
+        invalidate_fare_matrix()
+        errors = self.plan(400, **{'from': 'UTN', 'to': 'NEW', 'after': '07:00'})
+        self.assertEqual(errors, {'to': 'No timetable for this station.'})
+
+
+class DatabaseConfigTests(TestCase):
+    def test_sqlite_is_the_default_and_tuned(self):
+        config = database_config({}, Path('/srv/metro'))
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], Path('/srv/metro/db.sqlite3'))
+        self.assertEqual(config['OPTIONS'], {'timeout': 20})
+        self.assertEqual(sqlite_pragmas({}), {'journal_mode': 'WAL', 'synchronous': 'NORMAL'})
+        self.assertEqual(sqlite_pragmas({'SQLITE_TUNING': 'off'}), {})
+        with self.assertRaises(ImproperlyConfigured):
+            sqlite_pragmas({'SQLITE_SYNCHRONOUS': 'OFF; DROP TABLE x'})
+
+    def test_postgres_keeps_connections_and_supports_pgbouncer(self):
+        config = database_config({'DB_ENGINE': 'postgres', 'DB_NAME': 'metro', 'DB_CONN_MAX_AGE': '300'}, Path('.'))
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS'], config['PORT']), (300, True, '5432'))
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', config)
+
+        config = database_config({'DB_ENGINE': 'postgres', 'DB_POOLER': 'pgbouncer'}, Path('.'))
+        self.assertTrue(config['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(config['PORT'], '6432')
+        for env in ({'DB_ENGINE': 'mysql'}, {'DB_ENGINE': 'postgres', 'DB_POOLER': 'pgpool'},
+                    {'DB_CONN_MAX_AGE': 'forever'}):
+            with self.assertRaises(ImproperlyConfigured):
+                database_config(env, Path('.'))
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pass12345', name='Other')
+        self.client.force_authenticate(self.user)
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 2), fare=Decimal('30'))
+
+    def test_unchanged_list_is_a_304_without_queries(self):
+        first = self.client.get('/api/journeys/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/journeys/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/journeys/')
+        self.assertEqual(response.content, first.content)
+        self.assertIn('private', response['Cache-Control'])
+
+        Journey.objects.create(user=self.user, route='Pallabi - Agargaon', date=date(2025, 4, 3), fare=Decimal('30'))
+        response = self.client.get('/api/journeys/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_private_lists_are_keyed_per_user(self):
+        mine = self.client.get('/api/journeys/')
+        self.client.force_authenticate(self.other)
+        theirs = self.client.get('/api/journeys/')
+        self.assertEqual(theirs.data['results'], [])
+        self.assertNotEqual(theirs['ETag'], mine['ETag'])
+        # Another user's writes leave my cached list alone.
+        Journey.objects.create(user=self.other, route='Pallabi - Agargaon', date=date(2025, 4, 3), fare=Decimal('30'))
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/journeys/', HTTP_IF_NONE_MATCH=mine['ETag']).status_code, 304)
+
+    def test_summary_follows_payments_and_bulk_writes(self):
+        etag = self.client.get('/api/journeys/summary/')['ETag']
+        Payment.objects.create(user=self.user, method='bKash', reference='R1', amount=Decimal('50'))
+        response = self.client.get('/api/journeys/summary/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.client.post('/api/journeys/bulk/', [
+            {'route': 'Pallabi - Agargaon', 'date': '2025-04-05', 'fare': '30.00'},
+        ], format='json')
+        response = self.client.get('/api/journeys/summary/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data['total_journeys']), (200, 2))
+
+    def test_public_lost_items_are_shared_and_invalidated_by_saves(self):
+        item = LostItem.objects.create(title='Umbrella', description='Black', location='Farmgate',
+                                       status='unclaimed', posted_by=self.other)
+        etag = self.client.get('/api/lost-items/')['ETag']
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/lost-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('public', response['Cache-Control'])
+
+        item.status = 'claimed'
+        item.save()
+        response = self.client.get('/api/lost-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['results'][0]['status'], 'claimed')
+        # Expanded users aren't tracked by the lost item version, so they're never cached.
+        self.assertNotIn('ETag', self.client.get('/api/lost-items/', {'expand': 'posted_by'}))
+
+    def test_evicted_version_counters_never_go_backwards(self):
+        name = response_version_name('journeys', self.user.pk)
+        before = bump_version(name)
+        cache.delete(version_key(name))
+        self.assertGreater(get_version(name), before)
+        cache.delete(version_key(name))
+        self.assertGreater(bump_version(name), before)
+
+    def test_deploy_check_flags_a_per_process_shared_cache(self):
+        self.assertEqual([message.id for message in check_shared_cache(None)], ['metro.W001'])
+        with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+            self.assertEqual(check_shared_cache(None), [])
+        shared = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}
+        with override_settings(CACHES={**settings.CACHES, 'shared': shared}, SHARED_CACHE='shared'):
+            self.assertEqual(check_shared_cache(None), [])
+        with override_settings(SHARED_CACHE='missing'):
+            self.assertEqual([message.id for message in check_shared_cache(None)], ['metro.E001'])
+
+
+class AsyncViewTests(APITestCase):
+    fixtures = ['mrt_line6']
+
+    def setUp(self):
+        for invalidate in (invalidate_fare_matrix, invalidate_timetable):
+            invalidate()
+            self.addCleanup(invalidate)
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for day in range(1, 6):
+            Journey.objects.create(user=self.user, route='Mirpur 10 - Farmgate', date=date(2025, 4, day // 2 + 1),
+                                   fare=Decimal('40'))
+
+    async def aget(self, url, data=None, token=True):
+        headers = {'Authorization': f'Token {self.token.key}'} if token else {}
+        return await self.async_client.get(url, data or {}, headers=headers)
+
+    async def test_journey_pages_match_the_drf_list(self):
+        expected = [row['id'] for row in (await sync_to_async(self.client.get)('/api/journeys/')).data['results']]
+        ids, url, params = [], '/api/async/journeys/', {'page_size': 2}
+        while url:
+            response = await self.aget(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url, params = response.json()['next'], None
+        self.assertEqual(ids, expected)
+        self.assertEqual((await self.aget('/api/async/journeys/', token=False)).status_code, 401)
+        self.assertEqual((await self.aget('/api/async/journeys/', {'cursor': 'junk'})).status_code, 404)
+
+    async def test_summary_and_lost_items(self):
+        params = {'month': '2025-04', 'recent': 3}
+        expected = (await sync_to_async(self.client.get)('/api/journeys/summary/', params)).json()
+        self.assertEqual((await self.aget('/api/async/journeys/summary/', params)).json(), expected)
+        await LostItem.objects.acreate(title='Umbrella', description='Black', location='Farmgate',
+                                       status='unclaimed', posted_by=self.user)
+        response = await self.aget('/api/async/lost-items/', {'expand': 'posted_by'}, token=False)
+        self.assertEqual(response.json()['results'][0]['posted_by']['name'], 'Rider')
+
+    async def test_next_departures(self):
+        line = await Line.objects.aget(code='MRT6')
+        await sync_to_async(import_gtfs)(*await sync_to_async(synthesize_gtfs)(line, first='06:30', last='07:00'))
+        params = {'station': 'UTN', 'after': '06:31', 'date': '2025-04-21', 'limit': 2}
+        response = await self.aget('/api/async/departures/', params)
+        self.assertEqual(response.json(), (await sync_to_async(self.client.get)('/api/departures/', params)).json())
+        self.assertEqual((await self.aget('/api/async/departures/', {'station': 'Nowhere'})).status_code, 400)
+
+
+@override_settings(DATABASE_REPLICAS={'replica': {}})
+class ReplicaRoutingTests(TransactionTestCase):
+    # Writes must commit for the replica connection to see them.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # DB_REPLICAS=mirror for these tests only: a second connection to the
+        # test database, added after the runner has set databases up.
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user('rider', 'rider@example.com', 'pass12345', name='Rider')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache.delete(pin_key(self.user.pk))
+        self.addCleanup(cache.delete, pin_key(self.user.pk))
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(primary), len(replica)
+
+    def test_reads_go_to_the_replica_until_the_user_writes(self):
+        Payment.objects.create(user=self.user, method='bKash', reference='R1', amount=Decimal('50'))
+        response, primary, replica = self.get('/api/payments/')
+        self.assertEqual((primary, len(response.data['results'])), (0, 1))
+        self.assertGreater(replica, 0)
+
+        response = self.client.post('/api/payments/', {
+            'user': self.user.id, 'method': 'Nagad', 'reference': 'R2', 'amount': '70.00',
+        })
+        self.assertEqual(response.status_code, 201)
+        response, primary, replica = self.get('/api/payments/')
+        self.assertEqual((replica, len(response.data['results'])), (0, 2))
+
+        cache.delete(pin_key(self.user.pk))
+        self.assertEqual(self.get('/api/payments/')[1], 0)
+
+    def test_unrouted_views_and_transactions_stay_on_the_primary(self):
+        self.assertEqual(self.get('/api/complaints/')[2], 0)
+        router = ReplicaRouter()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Payment), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Payment), 'default')
+        self.assertEqual(router.db_for_read(Payment), 'default')
+        self.assertEqual(router.db_for_write(Payment), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'metro'))
+
+    def test_pins_live_in_the_shared_cache(self):
+        shared = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pins'}
+        with override_settings(CACHES={**settings.CACHES, 'shared': shared}, SHARED_CACHE='shared'):
+            self.client.post('/api/payments/', {
+                'user': self.user.id, 'method': 'Nagad', 'reference': 'R2', 'amount': '70.00',
+            })
+            self.assertTrue(caches['shared'].get(pin_key(self.user.pk)))
+            self.assertIsNone(cache.get(pin_key(self.user.pk)))
+            self.assertEqual(self.get('/api/payments/')[2], 0)
+            caches['shared'].clear()
+        with override_settings(SHARED_CACHE='default'):
+            self.assertEqual([message.id for message in check_shared_cache(None)], ['metro.E002', 'metro.W001'])
+
+    def test_replica_aliases_from_the_environment(self):
+        primary = database_config({'DB_ENGINE': 'postgres', 'DB_HOST': 'db1'}, Path('.'))
+        replicas = replica_configs({'DB_REPLICAS': 'db2, db3:6543'}, primary)
+        self.assertEqual([(alias, config['HOST'], config['PORT']) for alias, config in replicas.items()],
+                         [('replica', 'db2', '5432'), ('replica2', 'db3', '6543')])
+        self.assertEqual(replica_configs({}, primary), {})
+        sqlite = database_config({}, Path('.'))
+        self.assertEqual(replica_configs({}, sqlite), {})
+        self.assertEqual(list(replica_configs({'DB_REPLICAS': 'mirror'}, sqlite)), ['replica'])
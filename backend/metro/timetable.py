@@ -0,0 +1,262 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+
+from .models import Line, Service, Station, StopTime, Trip
+from .versions import VersionedBuild
+
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+BATCH_SIZE = 5000
+
+
+def parse_time(value):
+    """``HH:MM[:SS]`` to seconds after midnight; hours may exceed 23 as in GTFS."""
+    parts = value.strip().split(':')
+    if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts):
+        raise ValueError(f'Invalid time "{value}", expected HH:MM[:SS].')
+    hours, minutes, seconds = (int(part) for part in parts + ['0'] * (3 - len(parts)))
+    if minutes > 59 or seconds > 59:
+        raise ValueError(f'Invalid time "{value}", expected HH:MM[:SS].')
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_time(seconds):
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+class DepartureIndex:
+    """Departures of one weekday, sorted by (station, departure time).
+
+    Flat arrays in CSR layout: the departures from station position ``p``
+    are ``times[offsets[p]:offsets[p + 1]]``, ascending, with the trip and
+    the trip's stop position alongside. "Next N after T" is a bisect into
+    that slice.
+    """
+
+    def __init__(self, station_count, rows):
+        rows.sort()
+        self.times = array('l', (row[1] for row in rows))
+        self.trips = array('l', (row[2] for row in rows))
+        self.stops = array('l', (row[3] for row in rows))
+        self.offsets = array('l', [0]) * (station_count + 1)
+        for row in rows:
+            self.offsets[row[0] + 1] += 1
+        for position in range(station_count):
+            self.offsets[position + 1] += self.offsets[position]
+
+    def __len__(self):
+        return len(self.times)
+
+    def next_departures(self, station, after, limit):
+        """Up to ``limit`` ``(departure, trip, stop)`` entries at or after ``after``."""
+        lo, hi = self.offsets[station], self.offsets[station + 1]
+        start = bisect_left(self.times, after, lo, hi)
+        return [
+            (self.times[i], self.trips[i], self.stops[i])
+            for i in range(start, min(start + limit, hi))
+        ]
+
+
+class Timetable:
+    """Every trip's stop sequence in flat arrays, plus a DepartureIndex per weekday.
+
+    Trip ``t`` calls at ``stop_stations[trip_offsets[t]:trip_offsets[t + 1]]``
+    (station positions), with matching ``arrivals`` and ``departures``.
+    """
+
+    def __init__(self, stations, trips, stop_times):
+        self.stations = list(stations)
+        self.positions = {station.id: position for position, station in enumerate(self.stations)}
+        self.trips = list(trips)
+        trip_positions = {trip['id']: position for position, trip in enumerate(self.trips)}
+
+        self.trip_offsets = array('l', [0]) * (len(self.trips) + 1)
+        self.stop_stations = array('l')
+        self.arrivals = array('l')
+        self.departures = array('l')
+        # stop_times arrive ordered by (trip, sequence), so each trip's stops are contiguous.
+        for trip_id, station_id, arrival, departure in stop_times:
+            self.trip_offsets[trip_positions[trip_id] + 1] += 1
+            self.stop_stations.append(self.positions[station_id])
+            self.arrivals.append(arrival)
+            self.departures.append(departure)
+        for position in range(len(self.trips)):
+            self.trip_offsets[position + 1] += self.trip_offsets[position]
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_database(cls):
+        stations = Station.objects.order_by('id')
+        trips = Trip.objects.order_by('id').values('id', 'code', 'headsign', 'line__code', 'service__days')
+        stop_times = StopTime.objects.order_by('trip_id', 'sequence').values_list(
+            'trip_id', 'station_id', 'arrival', 'departure'
+        ).iterator(chunk_size=BATCH_SIZE)
+        return cls(stations, trips, stop_times)
+
+    def __bool__(self):
+        return bool(self.trips)
+
+    def derived(self, key, build):
+        """Memoise ``build(self)`` under ``key`` for the lifetime of this timetable version."""
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = build(self)
+        return value
+
+    def running_trips(self, weekday):
+        """Positions of the trips whose service runs on ``weekday`` (Monday = 0)."""
+        return [position for position, trip in enumerate(self.trips) if trip['service__days'] & (1 << weekday)]
+
+    def index(self, weekday):
+        """DepartureIndex for trips running on ``weekday``, built on first use."""
+        return self.derived(('departures', weekday), lambda timetable: timetable.build_index(weekday))
+
+    def build_index(self, weekday):
+        rows = []
+        for position in self.running_trips(weekday):
+            # A trip's last stop only sets people down, so it is not a departure.
+            for stop in range(self.trip_offsets[position], self.trip_offsets[position + 1] - 1):
+                rows.append((self.stop_stations[stop], self.departures[stop], position, stop))
+        return DepartureIndex(len(self.stations), rows)
+
+    def next_departures(self, station, weekday, after, limit=5):
+        """Up to ``limit`` departures from ``station``; none if it isn't in this timetable yet."""
+        station_position = self.positions.get(station.id)
+        if station_position is None:
+            return []
+        results = []
+        for departure, position, stop in self.index(weekday).next_departures(station_position, after, limit):
+            trip = self.trips[position]
+            last = self.trip_offsets[position + 1] - 1
+            results.append({
+                'trip': trip['code'],
+                'line': trip['line__code'],
+                'headsign': trip['headsign'] or self.stations[self.stop_stations[last]].name,
+                'departure': format_time(departure),
+                'arrival_at_terminus': format_time(self.arrivals[last]),
+            })
+        return results
+
+
+timetable = VersionedBuild('timetable', Timetable.from_database)
+
+
+def get_timetable():
+    """Process-wide Timetable, rebuilt only when the timetable changes."""
+    return timetable.get()
+
+
+async def aget_timetable():
+    return await timetable.aget()
+
+
+def invalidate_timetable():
+    timetable.invalidate()
+
+
+def import_gtfs(calendar, trips, stop_times, batch_size=BATCH_SIZE):
+    """Replace the whole timetable with GTFS rows (dicts, as from ``csv.DictReader``).
+
+    ``route_id`` must match a Line code and ``stop_id`` a Station code.
+    ``stop_times`` may be any iterable and is written in batches, so large
+    feeds are never held in memory. Raises ValueError on unknown references.
+    """
+    lines = dict(Line.objects.values_list('code', 'id'))
+    stations = dict(Station.objects.values_list('code', 'id'))
+    counts = {'services': 0, 'trips': 0, 'stop_times': 0}
+
+    with transaction.atomic():
+        StopTime.objects.all().delete()
+        Trip.objects.all().delete()
+        Service.objects.all().delete()
+
+        services = Service.objects.bulk_create([
+            Service(
+                code=row['service_id'],
+                days=sum(1 << day for day, name in enumerate(WEEKDAYS) if row.get(name, '0').strip() == '1'),
+            )
+            for row in calendar
+        ])
+        service_ids = {service.code: service.id for service in services}
+        counts['services'] = len(services)
+
+        new_trips = []
+        for row in trips:
+            if row['route_id'] not in lines:
+                raise ValueError(f'Trip {row["trip_id"]}: unknown route "{row["route_id"]}".')
+            if row['service_id'] not in service_ids:
+                raise ValueError(f'Trip {row["trip_id"]}: unknown service "{row["service_id"]}".')
+            new_trips.append(Trip(
+                code=row['trip_id'],
+                line_id=lines[row['route_id']],
+                service_id=service_ids[row['service_id']],
+                headsign=row.get('trip_headsign', ''),
+            ))
+        trip_ids = {trip.code: trip.id for trip in Trip.objects.bulk_create(new_trips, batch_size=batch_size)}
+        counts['trips'] = len(trip_ids)
+
+        batch = []
+        for row in stop_times:
+            if row['trip_id'] not in trip_ids:
+                raise ValueError(f'Stop time for unknown trip "{row["trip_id"]}".')
+            if row['stop_id'] not in stations:
+                raise ValueError(f'Trip {row["trip_id"]}: unknown stop "{row["stop_id"]}".')
+            batch.append(StopTime(
+                trip_id=trip_ids[row['trip_id']],
+                station_id=stations[row['stop_id']],
+                sequence=int(row['stop_sequence']),
+                arrival=parse_time(row['arrival_time']),
+                departure=parse_time(row['departure_time']),
+            ))
+            if len(batch) >= batch_size:
+                StopTime.objects.bulk_create(batch)
+                counts['stop_times'] += len(batch)
+                batch = []
+        StopTime.objects.bulk_create(batch)
+        counts['stop_times'] += len(batch)
+
+    invalidate_timetable()
+    return counts
+
+
+def synthesize_gtfs(line, service='DAILY', days=WEEKDAYS, first='06:30', last='22:00', headway=8, dwell=30):
+    """GTFS rows for a regular service in both directions of ``line``.
+
+    Running times come from the line's LineStop ``travel_seconds``;
+    ``headway`` is in minutes and ``dwell`` in seconds.
+    """
+    stops = list(line.stops.select_related('station').order_by('sequence'))
+    calendar = [{'service_id': service, **{day: '1' if day in days else '0' for day in WEEKDAYS}}]
+    trips, stop_times = [], []
+    directions = (
+        # Each LineStop's travel_seconds is the run from the previous stop.
+        [(stop.station, stop.travel_seconds if i else 0) for i, stop in enumerate(stops)],
+        [(stop.station, stops[i + 1].travel_seconds if i + 1 < len(stops) else 0)
+         for i, stop in reversed(list(enumerate(stops)))],
+    )
+    for direction, calls in enumerate(directions):
+        headsign = calls[-1][0].name
+        start = parse_time(first)
+        while start <= parse_time(last):
+            trip_id = f'{line.code}-{service}-{direction}-{format_time(start).replace(":", "")}'
+            trips.append({'route_id': line.code, 'service_id': service, 'trip_id': trip_id, 'trip_headsign': headsign})
+            clock = start
+            for sequence, (station, run) in enumerate(calls, start=1):
+                arrival = clock + run
+                departure = arrival + dwell if 1 < sequence < len(calls) else arrival
+                stop_times.append({
+                    'trip_id': trip_id,
+                    'arrival_time': format_time(arrival),
+                    'departure_time': format_time(departure),
+                    'stop_id': station.code,
+                    'stop_sequence': str(sequence),
+                })
+                clock = departure
+            start += headway * 60
+    return calendar, trips, stop_times
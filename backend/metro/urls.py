@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'users', views.UserViewSet)
@@ -8,9 +8,20 @@ router.register(r'journeys', views.JourneyViewSet)
 router.register(r'payments', views.PaymentViewSet)
 router.register(r'lost-items', views.LostItemViewSet)
 router.register(r'lost-reports', views.UserLostReportViewSet)
+router.register(r'lost-item-matches', views.LostItemMatchViewSet)
 router.register(r'feedback', views.FeedbackViewSet)
 router.register(r'complaints', views.ComplaintViewSet)
+router.register(r'lines', views.LineViewSet)
+router.register(r'stations', views.StationViewSet)
 
 urlpatterns = [
+    path('fares/', views.FareLookupView.as_view(), name='fare-lookup'),
+    path('departures/', views.NextDeparturesView.as_view(), name='next-departures'),
+    path('plan/', views.JourneyPlanView.as_view(), name='journey-plan'),
+    # Async mirrors of the read-heavy endpoints for ASGI workers.
+    path('async/journeys/', async_views.journey_list, name='async-journey-list'),
+    path('async/journeys/summary/', async_views.journey_summary, name='async-journey-summary'),
+    path('async/lost-items/', async_views.lost_item_list, name='async-lost-item-list'),
+    path('async/departures/', async_views.next_departures, name='async-next-departures'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,88 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+
+def shared_cache():
+    """The ``SHARED_CACHE`` alias holding version counters, cached responses and replica pins."""
+    return caches[getattr(settings, 'SHARED_CACHE', None) or DEFAULT_CACHE_ALIAS]
+
+
+def version_key(name):
+    return f'metro:{name}-version'
+
+
+def get_version(name):
+    cache = shared_cache()
+    version = cache.get(version_key(name))
+    if version is None:
+        # Counters start at the current time rather than 0, so one that was
+        # evicted restarts above every value it had and can't revive old keys.
+        cache.add(version_key(name), time.time_ns(), None)
+        version = cache.get(version_key(name), 0)
+    return version
+
+
+async def aget_version(name):
+    cache = shared_cache()
+    version = await cache.aget(version_key(name))
+    if version is None:
+        await cache.aadd(version_key(name), time.time_ns(), None)
+        version = await cache.aget(version_key(name), 0)
+    return version
+
+
+def bump_version(name):
+    """Increment a named version counter shared by every worker using the cache."""
+    cache = shared_cache()
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        cache.add(version_key(name), time.time_ns(), None)
+        return cache.incr(version_key(name))
+
+
+class VersionedBuild:
+    """Process-wide value built once and rebuilt only when its version counter moves.
+
+    With ``SHARED_CACHE`` on a shared backend an ``invalidate()`` in one
+    worker makes every worker rebuild on its next ``get()``; with the
+    local-memory cache it only affects the current process.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        # (version, value), replaced as a whole so readers never see half of it.
+        self._built = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = get_version(self.name)
+        built = self._built
+        if built is None or built[0] != version:
+            with self._lock:
+                built = self._built
+                if built is None or built[0] != version:
+                    built = (version, self.build())
+                    self._built = built
+        return built[1]
+
+    async def aget(self):
+        """``get()`` for async views: the build, if one is due, runs in a worker thread."""
+        version = await aget_version(self.name)
+        built = self._built
+        if built is not None and built[0] == version:
+            return built[1]
+        return await sync_to_async(self.get)()
+
+    def invalidate(self):
+        bump_version(self.name)
+        # Forget the version, not the value: a get() already past its check
+        # still returns a built value, and the next one rebuilds.
+        with self._lock:
+            if self._built is not None:
+                self._built = (None, self._built[1])
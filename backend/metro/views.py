@@ -1,17 +1,162 @@
+from datetime import date
+
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from rest_framework import viewsets, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
-from .models import User, Journey, Payment, LostItem, UserLostReport, Feedback, Complaint
+from .fares import get_fare_matrix
+from .models import User, Journey, Payment, LostItem, UserLostReport, LostItemMatch, Feedback, Complaint, Line, Station
+from .caching import etag_matches, get_cached_response, response_cache_key, set_cached_response
+from .bulk import JourneyBulkIngestor, PaymentBulkIngestor
+from .exports import CSVRenderer, NDJSONRenderer, export_rows
+from .parsers import NDJSONParser, ORJSONParser
+from .permissions import IsMetroAdmin
+from .matching import MATCHES_PER_DOCUMENT
+from .planner import UnscheduledStation, plan_journey
+from .rollups import summary_params, user_summary
+from .search import search
+from .routers import is_pinned, pin_to_primary, start_replica_reads, stop_replica_reads
+from .timetable import get_timetable, parse_time
 from .serializers import (
     UserSerializer, JourneySerializer, PaymentSerializer,
-    LostItemSerializer, UserLostReportSerializer,
-    FeedbackSerializer, ComplaintSerializer
+    LostItemSerializer, UserLostReportSerializer, LostItemMatchSerializer, ReportMatchSerializer,
+    FeedbackSerializer, ComplaintSerializer,
+    LineSerializer, StationSerializer, values_reader
 )
 
+class ExpandRelatedMixin:
+    """Select the relations requested through ``?expand=`` in the same query."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        expansions = getattr(serializer_class, 'requested_expansions', None)
+        related = expansions(self.request) if expansions else []
+        return queryset.select_related(*related) if related else queryset
+
+class ReplicaReadMixin:
+    """Serve safe-method requests from a read replica.
+
+    A successful write pins its user to the primary for
+    ``DATABASE_REPLICA_PIN_SECONDS``, so they read their own writes even if
+    the replicas lag behind.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS and not is_pinned(request.user.pk):
+            self._replica_token = start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            self._replica_token = None
+            stop_replica_reads(token)
+        elif request.method not in permissions.SAFE_METHODS and response.status_code < 400 \
+                and request.user.is_authenticated:
+            pin_to_primary(request.user.pk)
+        return response
+
+class CachedResponseMixin:
+    """Cache ``list`` responses (and actions routed through ``cached_response``) until their data changes.
+
+    ``cache_kinds`` names the version counters a response depends on (see
+    ``metro.caching``); they are bumped by model signals. ``cache_scope`` is
+    ``'user'`` for data filtered to the requesting user, keyed per user, or
+    ``'public'`` for data everybody sees alike, keyed globally. Responses
+    carry a strong ETag, and a matching ``If-None-Match`` on a cached
+    response gets a 304 without touching the database or the serializer.
+    """
+    cache_kinds = ()
+    cache_scope = 'user'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        if self.cache_scope == 'public':
+            # Expanded relations depend on other tables' versions.
+            if request.query_params.get('expand'):
+                return None
+            return response_cache_key(request, self.cache_kinds)
+        return response_cache_key(request, self.cache_kinds + ('user',), request.user.pk)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        entry = get_cached_response(key) if key else None
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if key is None or response.status_code != status.HTTP_200_OK:
+                return response
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            entry = set_cached_response(key, response['Content-Type'], response.content)
+        else:
+            response = HttpResponse(entry[2], content_type=entry[1])
+
+        if etag_matches(request, entry[0]):
+            response = HttpResponseNotModified()
+        response['ETag'] = entry[0]
+        if self.cache_scope == 'public':
+            patch_cache_control(response, public=True, no_cache=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
+
+class ValuesListMixin:
+    """Build ``list`` pages from ``values_list()`` rows with the serializer's compiled ValuesReader.
+
+    The JSON is the same as the serializer's; requests with ``?expand=``
+    go through the serializer, which builds the nested objects.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if serializer_class.requested_expansions(request):
+            return super().list(request, *args, **kwargs)
+        reader = values_reader(serializer_class)
+        names = reader.field_names(request)
+        ordering = (self.ordering,) if isinstance(self.ordering, str) else self.ordering
+        # The cursor is read from the page's last row, so its columns are always fetched.
+        queryset = reader.rows(self.filter_queryset(self.get_queryset()), names,
+                               extra=[field.lstrip('-') for field in ordering])
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.serialize(page, names, request))
+        return Response(reader.serialize(queryset, names, request))
+
+class SearchMixin:
+    """``?q=`` on ``list``: full-text matches (see ``metro.search``), best first.
+
+    Ranked results aren't cursor paginated; the response has the list's
+    shape with the top ``page_size`` matches and no ``next`` page.
+    """
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return super().list(request, *args, **kwargs)
+        ids = search(self.queryset.model, query, self.paginator.get_page_size(request), **self.get_search_filters())
+        found = self.filter_queryset(self.get_queryset()).in_bulk(ids)
+        page = [found[pk] for pk in ids if pk in found]
+        return Response({'next': None, 'previous': None, 'results': self.get_serializer(page, many=True).data})
+
+    def get_search_filters(self):
+        return {}
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    ordering = 'id'
     
     def get_permissions(self):
         if self.action == 'create':
@@ -27,44 +172,268 @@ class UserViewSet(viewsets.ModelViewSet):
             'message': 'User created successfully'
         }, status=status.HTTP_201_CREATED)
 
-class JourneyViewSet(viewsets.ModelViewSet):
+class JourneyViewSet(CachedResponseMixin, ValuesListMixin, ReplicaReadMixin, ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = Journey.objects.all()
     serializer_class = JourneySerializer
+    ordering = ('-date', '-id')
     permission_classes = [permissions.IsAuthenticated]
+    cache_kinds = ('journey', 'payment')
 
     def get_queryset(self):
         return Journey.objects.filter(user=self.request.user)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        return self.cached_response(request, self.build_summary)
+
+    def build_summary(self, request):
+        params, errors = summary_params(request.query_params)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(user_summary(request.user.id, **params))
+
+    @action(detail=False, methods=['post'], parser_classes=[ORJSONParser, NDJSONParser])
+    def bulk(self, request):
+        return Response(JourneyBulkIngestor(request.user).ingest(request.data))
+
+    # Export column label -> values_list() lookup.
+    export_fields = {
+        'id': 'id', 'date': 'date', 'route': 'route', 'fare': 'fare', 'payment': 'payment',
+    }
+    admin_export_fields = {
+        'id': 'id', 'user': 'user', 'user_name': 'user__name', 'date': 'date',
+        'route': 'route', 'fare': 'fare', 'payment': 'payment',
+    }
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        return self.stream_export(self.get_queryset(), self.export_fields)
+
+    @action(detail=False, methods=['get'], url_path='export/all',
+            renderer_classes=[CSVRenderer, NDJSONRenderer], permission_classes=[IsMetroAdmin])
+    def export_all(self, request):
+        return self.stream_export(Journey.objects.all(), self.admin_export_fields)
+
+    def stream_export(self, queryset, fields):
+        """Stream ``queryset`` as CSV or NDJSON, filtered by ``date_from``, ``date_to`` and ``route``."""
+        params = self.request.query_params
+        filters = {}
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            if params.get(param):
+                try:
+                    filters[lookup] = date.fromisoformat(params[param])
+                except ValueError:
+                    raise ValidationError({param: 'Expected YYYY-MM-DD.'})
+        if params.get('route'):
+            filters['route'] = params['route']
+        queryset = queryset.filter(**filters).order_by('date', 'id')
+
+        renderer = self.request.accepted_renderer
+        rows = export_rows(queryset, list(fields.values()))
+        response = StreamingHttpResponse(
+            renderer.stream(list(fields), rows),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="journeys.{renderer.format}"'
+        return response
+
+class PaymentViewSet(CachedResponseMixin, ValuesListMixin, ReplicaReadMixin, ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    ordering = '-timestamp'
     permission_classes = [permissions.IsAuthenticated]
+    cache_kinds = ('payment',)
 
     def get_queryset(self):
         return Payment.objects.filter(user=self.request.user)
 
-class LostItemViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], parser_classes=[ORJSONParser, NDJSONParser])
+    def bulk(self, request):
+        return Response(PaymentBulkIngestor(request.user).ingest(request.data))
+
+class LostItemViewSet(CachedResponseMixin, SearchMixin, ValuesListMixin, ReplicaReadMixin, ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = LostItem.objects.all()
     serializer_class = LostItemSerializer
+    ordering = '-id'
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    cache_kinds = ('lostitem',)
+    cache_scope = 'public'
 
-class UserLostReportViewSet(viewsets.ModelViewSet):
+class UserLostReportViewSet(SearchMixin, ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = UserLostReport.objects.all()
     serializer_class = UserLostReportSerializer
+    ordering = '-submitted_at'
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return UserLostReport.objects.filter(user=self.request.user)
 
-class FeedbackViewSet(viewsets.ModelViewSet):
+    def get_search_filters(self):
+        return {'user_id': self.request.user.pk}
+
+    @action(detail=True, methods=['get'])
+    def matches(self, request, pk=None):
+        """Found items that may be what this report describes, best match first."""
+        matches = self.get_object().matches.select_related('item').order_by('-score')[:MATCHES_PER_DOCUMENT]
+        return Response(ReportMatchSerializer(matches, many=True, context=self.get_serializer_context()).data)
+
+class LostItemMatchViewSet(ExpandRelatedMixin, viewsets.ReadOnlyModelViewSet):
+    """Every candidate match, for staff; narrow with ``?report=`` and ``?item=``."""
+    queryset = LostItemMatch.objects.all()
+    serializer_class = LostItemMatchSerializer
+    ordering = '-id'
+    permission_classes = [IsMetroAdmin]
+
+    def get_queryset(self):
+        queryset = LostItemMatch.objects.all()
+        for param in ('report', 'item'):
+            value = self.request.query_params.get(param)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({param: 'Expected an id.'})
+                queryset = queryset.filter(**{f'{param}_id': int(value)})
+        return queryset
+
+class FeedbackViewSet(ReplicaReadMixin, ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
+    ordering = '-created_at'
     permission_classes = [permissions.IsAuthenticated]
 
-class ComplaintViewSet(viewsets.ModelViewSet):
+class ComplaintViewSet(ExpandRelatedMixin, viewsets.ModelViewSet):
     queryset = Complaint.objects.all()
     serializer_class = ComplaintSerializer
+    ordering = '-submitted_at'
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         return Complaint.objects.filter(user=self.request.user)
+
+class LineViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Line.objects.all()
+    serializer_class = LineSerializer
+    ordering = 'id'
+    permission_classes = [permissions.AllowAny]
+
+class StationViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Station.objects.prefetch_related('lines')
+    serializer_class = StationSerializer
+    ordering = 'id'
+    permission_classes = [permissions.AllowAny]
+
+class FareLookupView(APIView):
+    """O(1) fare lookup: ``/api/fares/?from=<station>&to=<station>`` by id, code or name."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        matrix = get_fare_matrix()
+        stations = {}
+        errors = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            stations[param] = matrix.station(value) if value else None
+            if stations[param] is None:
+                errors[param] = 'Unknown station.' if value else 'This parameter is required.'
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = matrix.lookup(stations['from'], stations['to'])
+        if result is None:
+            return Response({'detail': 'No connection between these stations.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'from': {'id': stations['from'].id, 'code': stations['from'].code, 'name': stations['from'].name},
+            'to': {'id': stations['to'].id, 'code': stations['to'].code, 'name': stations['to'].name},
+            'fare': str(result['fare']),
+            'distance_km': result['distance_km'],
+            'travel_seconds': result['travel_seconds'],
+        })
+
+
+def read_station(params, name, errors, matrix):
+    """Resolve ``?<name>=`` (station id, code or name) through the fare matrix's index."""
+    value = params.get(name)
+    station = matrix.station(value) if value else None
+    if station is None:
+        errors[name] = 'Unknown station.' if value else 'This parameter is required.'
+    return station
+
+
+def read_service_time(params, errors):
+    """``?after=HH:MM[:SS]&date=YYYY-MM-DD``, defaulting to the server's current local time."""
+    now = timezone.localtime()
+    after = day = None
+    try:
+        after = parse_time(params.get('after') or now.strftime('%H:%M:%S'))
+    except ValueError as exc:
+        errors['after'] = str(exc)
+    try:
+        day = date.fromisoformat(params['date']) if params.get('date') else now.date()
+    except ValueError:
+        errors['date'] = 'Expected YYYY-MM-DD.'
+    return day, after
+
+
+class NextDeparturesView(APIView):
+    """Next trains from a station: ``/api/departures/?station=<id|code|name>``.
+
+    Optional ``after=HH:MM[:SS]``, ``date=YYYY-MM-DD`` and ``limit``
+    (default 5, max 50).
+    """
+    permission_classes = [permissions.AllowAny]
+    max_limit = 50
+
+    def get(self, request):
+        data, errors = self.departures(request.query_params, get_fare_matrix(), get_timetable())
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+    @classmethod
+    def departures(cls, params, matrix, timetable):
+        """``(data, errors)`` for a departures query; no database access."""
+        errors = {}
+        station = read_station(params, 'station', errors, matrix)
+        day, after = read_service_time(params, errors)
+        limit = params.get('limit', '5')
+        if not limit.isdigit() or not 0 < int(limit) <= cls.max_limit:
+            errors['limit'] = f'Expected an integer between 1 and {cls.max_limit}.'
+        if errors:
+            return None, errors
+        return {
+            'station': {'id': station.id, 'code': station.code, 'name': station.name},
+            'date': day.isoformat(),
+            'departures': timetable.next_departures(station, day.weekday(), after, int(limit)),
+        }, None
+
+
+class JourneyPlanView(APIView):
+    """Earliest arrival between two stations: ``/api/plan/?from=&to=[&after=HH:MM&date=YYYY-MM-DD]``."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        errors = {}
+        matrix = get_fare_matrix()
+        origin = read_station(request.query_params, 'from', errors, matrix)
+        destination = read_station(request.query_params, 'to', errors, matrix)
+        day, after = read_service_time(request.query_params, errors)
+        if origin is not None and origin == destination:
+            errors['to'] = 'Origin and destination are the same station.'
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            itinerary = plan_journey(origin, destination, day.weekday(), after)
+        except UnscheduledStation as exc:
+            errors = {field: 'No timetable for this station.'
+                      for field, station in (('from', origin), ('to', destination)) if station in exc.stations}
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if itinerary is None:
+            return Response({'detail': 'No more trains reach this station today.'}, status=status.HTTP_404_NOT_FOUND)
+        fare = matrix.lookup(origin, destination)
+        return Response({
+            'from': {'id': origin.id, 'code': origin.code, 'name': origin.name},
+            'to': {'id': destination.id, 'code': destination.code, 'name': destination.name},
+            'date': day.isoformat(),
+            'fare': str(fare['fare']) if fare else None,
+            **itinerary,
+        })
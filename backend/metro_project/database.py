@@ -0,0 +1,112 @@
+"""Environment-driven ``DATABASES`` configuration.
+
+``DB_ENGINE=sqlite`` (the default) keeps the single-node ``db.sqlite3``
+setup, tuned for concurrent workers; ``DB_ENGINE=postgres`` needs the
+optional ``psycopg`` (or ``psycopg2``) package.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+POOLERS = {'none', 'pgbouncer'}
+
+
+def env_bool(env, name, default):
+    value = env.get(name)
+    return default if value in (None, '') else value.strip().lower() in TRUE_VALUES
+
+
+def env_int(env, name, default):
+    value = env.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f'{name} must be an integer, got "{value}".')
+
+
+def database_config(env, base_dir):
+    """The ``default`` database from ``DB_*`` variables."""
+    engine = env.get('DB_ENGINE', 'sqlite').strip().lower()
+    if engine in ('postgres', 'postgresql'):
+        pooler = env.get('DB_POOLER', 'none').strip().lower()
+        if pooler not in POOLERS:
+            raise ImproperlyConfigured(f'DB_POOLER must be one of {", ".join(sorted(POOLERS))}, got "{pooler}".')
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env.get('DB_NAME', 'metro'),
+            'USER': env.get('DB_USER', ''),
+            'PASSWORD': env.get('DB_PASSWORD', ''),
+            'HOST': env.get('DB_HOST', 'localhost'),
+            'PORT': env.get('DB_PORT', '6432' if pooler == 'pgbouncer' else '5432'),
+            # Keep connections open across requests instead of paying a TCP and
+            # auth handshake per request; health checks drop ones the server
+            # (or pooler) has closed before they are reused.
+            'CONN_MAX_AGE': env_int(env, 'DB_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': env_bool(env, 'DB_CONN_HEALTH_CHECKS', True),
+            'OPTIONS': {'connect_timeout': env_int(env, 'DB_CONNECT_TIMEOUT', 5)},
+        }
+        if pooler == 'pgbouncer':
+            # In transaction pooling a named cursor may outlive the server
+            # connection it was declared on, so iterator() must not use one.
+            config['DISABLE_SERVER_SIDE_CURSORS'] = True
+        return config
+    if engine in ('sqlite', 'sqlite3'):
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env.get('DB_NAME') or base_dir / 'db.sqlite3',
+            'CONN_MAX_AGE': env_int(env, 'DB_CONN_MAX_AGE', 0),
+            # Seconds a writer waits for the database lock before raising
+            # "database is locked".
+            'OPTIONS': {'timeout': env_int(env, 'SQLITE_BUSY_TIMEOUT', 20)},
+        }
+    raise ImproperlyConfigured(f'DB_ENGINE must be "sqlite" or "postgres", got "{engine}".')
+
+
+def replica_configs(env, primary):
+    """Read-replica aliases (``replica``, ``replica2``, ...) from ``DB_REPLICAS``.
+
+    For PostgreSQL this is a comma-separated list of ``host[:port]``
+    replicas sharing the primary's credentials. With either engine,
+    ``mirror`` adds one ``replica`` alias that is a second connection to the
+    primary, to try the routing path in development. The default, ``none``,
+    turns replicas off.
+    """
+    is_sqlite = primary['ENGINE'].endswith('sqlite3')
+    value = env.get('DB_REPLICAS', 'none').strip()
+    if value.lower() in ('', 'none'):
+        return {}
+    if value.lower() == 'mirror':
+        hosts = [None]
+    elif is_sqlite:
+        raise ImproperlyConfigured('DB_REPLICAS must be "mirror" or "none" with SQLite.')
+    else:
+        hosts = [host.strip() for host in value.split(',') if host.strip()]
+
+    replicas = {}
+    for number, host in enumerate(hosts, start=1):
+        config = {**primary, 'OPTIONS': dict(primary.get('OPTIONS', {})), 'TEST': {'MIRROR': 'default'}}
+        if host is not None:
+            config['HOST'], _, port = host.partition(':')
+            config['PORT'] = port or primary['PORT']
+        replicas['replica' if number == 1 else f'replica{number}'] = config
+    return replicas
+
+
+def sqlite_pragmas(env):
+    """PRAGMAs applied to every new SQLite connection (see ``metro.signals``).
+
+    WAL lets readers run alongside the single writer, and with it
+    ``synchronous=NORMAL`` only syncs at checkpoints, which is still safe
+    against application crashes.
+    """
+    if not env_bool(env, 'SQLITE_TUNING', True):
+        return {}
+    pragmas = {
+        'journal_mode': env.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': env.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    }
+    for name, value in pragmas.items():
+        if not value.isalnum():
+            raise ImproperlyConfigured(f'Invalid SQLite {name} "{value}".')
+    return pragmas
@@ -2,6 +2,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from .database import database_config, replica_configs, sqlite_pragmas
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +27,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware.
+    "metro.metrics.MetricsMiddleware",
+    "metro.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -38,12 +43,18 @@ MIDDLEWARE = [
 ROOT_URLCONF = "metro_project.urls"
 AUTH_USER_MODEL = "metro.User"
 
+# DB_ENGINE=sqlite (default) or postgres; see metro_project/database.py for
+# the DB_* / SQLITE_* variables.
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database_config(os.environ, BASE_DIR),
 }
+# Safe-method requests on ReplicaReadMixin views read from these aliases,
+# except for users who wrote within the last DATABASE_REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = replica_configs(os.environ, DATABASES["default"])
+DATABASES.update(DATABASE_REPLICAS)
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS", 5))
+DATABASE_ROUTERS = ["metro.routers.ReplicaRouter"]
+SQLITE_PRAGMAS = sqlite_pragmas(os.environ)
 
 TEMPLATES = [
     {
@@ -78,6 +89,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Email logins resolve the user in one query; ModelBackend keeps username
+# logins working for the Django admin.
+AUTHENTICATION_BACKENDS = [
+    "authentication.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# Password hashing profile, selected with PASSWORD_HASHER_PROFILE. The first
+# hasher encodes new passwords; the rest still verify (and upgrade) old hashes.
+# The "argon2" profile needs the optional argon2-cffi package.
+PASSWORD_HASHER_PROFILES = {
+    "default": [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    ],
+    "argon2": [
+        "authentication.hashers.TunableArgon2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    ],
+}
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[os.environ.get("PASSWORD_HASHER_PROFILE", "default")]
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 2))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 102400))
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 8))
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
@@ -126,18 +168,115 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "if-none-match",
 ]
+CORS_EXPOSE_HEADERS = ["etag", "server-timing"]
 
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "authentication.token_cache.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "metro.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "metro.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "metro.pagination.MetroCursorPagination",
+    "PAGE_SIZE": 50,
+    # Token buckets per user (or IP) for the API, and per IP and per account
+    # for the credential endpoints; see authentication/throttling.py.
+    "DEFAULT_THROTTLE_CLASSES": ["authentication.throttling.EndpointClassThrottle"],
+    "DEFAULT_THROTTLE_RATES": {
+        "read": os.environ.get("THROTTLE_READ_RATE", "1200/min"),
+        "write": os.environ.get("THROTTLE_WRITE_RATE", "120/min"),
+        "login": os.environ.get("THROTTLE_LOGIN_RATE", "30/min"),
+        "login-account": os.environ.get("THROTTLE_LOGIN_ACCOUNT_RATE", "10/min"),
+        "register": os.environ.get("THROTTLE_REGISTER_RATE", "20/hour"),
+    },
+    # Proxies in front of the app that append to X-Forwarded-For; 0 trusts
+    # only the socket address, so clients can't pick their own IP.
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
+}
+
+# Per-request metrics (metro.metrics): Server-Timing response headers (by
+# default only with DEBUG, as they expose DB time and query counts), and a
+# Prometheus /metrics endpoint that requires `Authorization: Bearer
+# <METRICS_TOKEN>`. Without a token only loopback clients may scrape, and
+# only while DEBUG is on.
+METRICS_SERVER_TIMING = os.environ.get("METRICS_SERVER_TIMING", "1" if DEBUG else "0") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+
+# Opt-in profiling (metro.profiling). SQL slower than PROFILE_SLOW_QUERY_MS is
+# logged with its request and calling code, and with its parameter values
+# only if PROFILE_SLOW_QUERY_PARAMS=1 (they can hold passwords or emails).
+# A PROFILE_SAMPLE_RATE fraction of requests (0-1) has its stack sampled
+# every PROFILE_SAMPLE_INTERVAL seconds into collapsed-stack files in
+# PROFILE_DIR; see `manage.py profile_report`.
+PROFILE_SLOW_QUERY_MS = float(os.environ["PROFILE_SLOW_QUERY_MS"]) if os.environ.get("PROFILE_SLOW_QUERY_MS") else None
+PROFILE_SLOW_QUERY_PARAMS = os.environ.get("PROFILE_SLOW_QUERY_PARAMS", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or str(BASE_DIR / "profiles")
+
+# Version counters, cached responses and read-your-writes pins live in the
+# CACHES alias named by SHARED_CACHE. With more than one worker process it
+# must be shared by all of them (REDIS_URL adds a Redis alias, "shared"), or
+# each worker keeps serving data the others have changed; `manage.py check
+# --deploy` warns while it is the per-process default.
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+if os.environ.get("REDIS_URL"):
+    CACHES["shared"] = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.environ["REDIS_URL"]}
+SHARED_CACHE = os.environ.get("SHARED_CACHE") or ("shared" if "shared" in CACHES else "default")
+
+# In-process throttle buckets; SHARED_CACHE names a CACHES alias shared by all
+# workers to enforce the rates across processes as well.
+THROTTLE = {
+    "SHARDS": 64,
+    "MAX_KEYS_PER_SHARD": 4096,
+    "SHARED_CACHE": os.environ.get("THROTTLE_SHARED_CACHE") or None,
+}
+
+# Token -> user cache used by CachedTokenAuthentication. Set SHARED_CACHE to a
+# CACHES alias shared by all workers to skip the token lookup across processes.
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": 10000,
+    "LOCAL_TTL": 30,
+    "SHARED_CACHE": os.environ.get("TOKEN_AUTH_SHARED_CACHE") or None,
+    "SHARED_TTL": 300,
+}
+
+# Seconds a cached list response may live; version counters bumped by model
+# signals invalidate it sooner when the underlying rows change.
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+
+# Background tasks (metro.tasks), run by `manage.py run_tasks`. EAGER runs
+# each task inline once its transaction commits instead, e.g. in tests.
+TASK_QUEUE_EAGER = os.environ.get("TASK_QUEUE_EAGER", "0") == "1"
+# Seconds before a running task is presumed lost with its worker and retried.
+TASK_TIMEOUT = 600
+# Seconds finished tasks are kept for `manage.py task_stats`.
+TASK_RETENTION = 7 * 24 * 3600
+
+# Mail for staff notifications; printed to the console unless configured.
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "metro@localhost")
+
+# Distance-based fare rule used to precompute the all-pairs fare matrix.
+METRO_FARES = {
+    "PER_KM": "5.00",
+    "MINIMUM": "20.00",
+    "MAXIMUM": "100.00",
+    "ROUND_TO": "10.00",
 }
 
 # CSRF Trusted Origins
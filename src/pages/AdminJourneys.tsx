@@ -314,24 +314,36 @@ const AdminJourneys: React.FC = () => {
     toast.success(`Payment status updated to ${newStatus}`);
   };
 
-  // Export to CSV
-  const exportToCSV = (data: any[]) => {
-    let csvContent = "ID,Date,User ID,User Name,From,To,Status,Fare,Payment Method,Payment Status\n";
+  // Download the all-users journeys export streamed by the server
+  const exportAllJourneys = async () => {
+    const token = localStorage.getItem('token');
+    const params = new URLSearchParams();
+    if (startDate) params.set('date_from', format(startDate, 'yyyy-MM-dd'));
+    if (endDate) params.set('date_to', format(endDate, 'yyyy-MM-dd'));
     
-    data.forEach(journey => {
-      csvContent += `${journey.id},${journey.date},${journey.userId},${journey.userName},${journey.startStation},${journey.endStation},${journey.status},${journey.fare},${journey.paymentMethod},${journey.paymentStatus}\n`;
-    });
-    
-    // Create a download link
-    const blob = new Blob([csvContent], { type: "text/csv;charset=utf-8;" });
-    const url = URL.createObjectURL(blob);
-    const link = document.createElement("a");
-    link.setAttribute("href", url);
-    link.setAttribute("download", `journeys-export-${new Date().toISOString()}.csv`);
-    link.style.visibility = "hidden";
-    document.body.appendChild(link);
-    link.click();
-    document.body.removeChild(link);
+    try {
+      const response = await fetch(`http://localhost:8000/api/journeys/export/all/?${params}`, {
+        headers: {
+          'Authorization': `Token ${token}`
+        }
+      });
+      if (!response.ok) {
+        throw new Error('Export failed');
+      }
+      
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement("a");
+      link.setAttribute("href", url);
+      link.setAttribute("download", `journeys-export-${new Date().toISOString()}.csv`);
+      link.style.visibility = "hidden";
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error exporting journeys:', error);
+      toast.error("Failed to export journeys");
+    }
   };
 
   // View journey details
@@ -445,7 +457,7 @@ const AdminJourneys: React.FC = () => {
               </div>
               <Button 
                 variant="outline"
-                onClick={() => exportToCSV(filteredJourneys)}
+                onClick={exportAllJourneys}
                 disabled={filteredJourneys.length === 0}
                 className="sm:self-start"
               >
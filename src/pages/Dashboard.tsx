@@ -28,23 +28,37 @@ interface Journey {
   id: number;
   date: string;
   route: string;
-  fare: number;
+  fare: string;
   payment: number | null;
+  payment_method: string | null;
 }
 
 interface Payment {
   id: number;
   method: string;
   reference: string;
-  amount: number;
+  amount: string;
   timestamp: string;
 }
 
+interface JourneySummary {
+  payment_methods: { method: string; payments: number; amount: string }[];
+  month: {
+    month: string;
+    journeys: number;
+    spent: string;
+    routes: { route: string; journeys: number; spent: string }[];
+  };
+  recent: {
+    journeys: Journey[];
+    payments: Payment[];
+  };
+}
+
 const Dashboard = () => {
   const [activeTab, setActiveTab] = useState("overview");
   const [isLoading, setIsLoading] = useState(true);
-  const [journeys, setJourneys] = useState<Journey[]>([]);
-  const [payments, setPayments] = useState<Payment[]>([]);
+  const [summary, setSummary] = useState<JourneySummary | null>(null);
   const [userData, setUserData] = useState<any>(null);
   const [isAdmin, setIsAdmin] = useState(false);
   const { toast } = useToast();
@@ -81,29 +95,21 @@ const Dashboard = () => {
           return;
         }
         
-        // Fetch journeys
-        const journeysResponse = await fetch('http://localhost:8000/api/journeys/', {
+        // Monthly and per-method totals, aggregated on the server, plus the
+        // newest journeys (with their payment method) and payments
+        const now = new Date();
+        const month = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}`;
+        const summaryResponse = await fetch(`http://localhost:8000/api/journeys/summary/?month=${month}&recent=5`, {
           headers: {
             'Authorization': `Token ${token}`,
           }
         });
         
-        // Fetch payments
-        const paymentsResponse = await fetch('http://localhost:8000/api/payments/', {
-          headers: {
-            'Authorization': `Token ${token}`,
-          }
-        });
-        
-        if (!journeysResponse.ok || !paymentsResponse.ok) {
+        if (!summaryResponse.ok) {
           throw new Error('Failed to fetch data');
         }
         
-        const journeysData = await journeysResponse.json();
-        const paymentsData = await paymentsResponse.json();
-        
-        setJourneys(journeysData);
-        setPayments(paymentsData);
+        setSummary(await summaryResponse.json());
       } catch (error) {
         console.error('Error fetching data:', error);
         toast({
@@ -119,52 +125,24 @@ const Dashboard = () => {
     fetchData();
   }, [navigate, toast]);
   
-  // Calculate monthly statistics
-  const currentMonth = new Date().getMonth();
-  const currentYear = new Date().getFullYear();
-  
-  const monthlyJourneys = journeys.filter(journey => {
-    const journeyDate = new Date(journey.date);
-    return journeyDate.getMonth() === currentMonth && journeyDate.getFullYear() === currentYear;
-  });
-  
-  const totalSpent = monthlyJourneys.reduce((total, journey) => {
-    const fareValue = typeof journey.fare === 'string' ? parseFloat(journey.fare) : journey.fare;
-    return total + fareValue;
-  }, 0);
-  
-  // Calculate most frequent route
-  const routeCounts: Record<string, number> = {};
-  monthlyJourneys.forEach(journey => {
-    routeCounts[journey.route] = (routeCounts[journey.route] || 0) + 1;
-  });
-  
-  let mostFrequentRoute = "";
-  let maxCount = 0;
-  
-  Object.entries(routeCounts).forEach(([route, count]) => {
-    if (count > maxCount) {
-      mostFrequentRoute = route;
-      maxCount = count;
-    }
-  });
+  // Monthly statistics come pre-aggregated from the summary endpoint
+  const topRoute = summary?.month.routes[0];
+  const totalSpent = summary ? parseFloat(summary.month.spent) : 0;
   
   const monthlyStats = {
-    journeys: monthlyJourneys.length,
+    journeys: summary?.month.journeys ?? 0,
     totalSpent,
-    mostFrequentRoute,
-    mostFrequentCount: maxCount,
+    mostFrequentRoute: topRoute?.route ?? "",
+    mostFrequentCount: topRoute?.journeys ?? 0,
   };
   
+  const journeys = summary?.recent.journeys ?? [];
+  const payments = summary?.recent.payments ?? [];
+  
   // Get payment methods distribution
   const paymentMethodCounts: Record<string, { count: number, amount: number }> = {};
-  payments.forEach(payment => {
-    if (!paymentMethodCounts[payment.method]) {
-      paymentMethodCounts[payment.method] = { count: 0, amount: 0 };
-    }
-    paymentMethodCounts[payment.method].count += 1;
-    const paymentAmount = typeof payment.amount === 'string' ? parseFloat(payment.amount) : payment.amount;
-    paymentMethodCounts[payment.method].amount += paymentAmount;
+  summary?.payment_methods.forEach(({ method, payments, amount }) => {
+    paymentMethodCounts[method] = { count: payments, amount: parseFloat(amount) };
   });
 
   return (
@@ -256,33 +234,27 @@ const Dashboard = () => {
                 <CardContent>
                   <div className="space-y-4">
                     {journeys.length > 0 ? (
-                      journeys.slice().reverse().slice(0, 3).map((journey) => {
-                        const payment = journey.payment 
-                          ? payments.find(p => p.id === journey.payment) 
-                          : null;
-                          
-                        return (
-                          <div key={journey.id} className="flex items-center justify-between p-4 bg-gray-50 rounded-md">
-                            <div className="flex items-center">
-                              <div className="bg-metro-green rounded-full p-2 mr-4">
-                                <MapPin className="h-5 w-5 text-white" />
-                              </div>
-                              <div>
-                                <p className="font-medium">{journey.route}</p>
-                                <p className="text-sm text-gray-500">{journey.date}</p>
-                              </div>
+                      journeys.slice(0, 3).map((journey) => (
+                        <div key={journey.id} className="flex items-center justify-between p-4 bg-gray-50 rounded-md">
+                          <div className="flex items-center">
+                            <div className="bg-metro-green rounded-full p-2 mr-4">
+                              <MapPin className="h-5 w-5 text-white" />
                             </div>
-                            <div className="text-right">
-                              <p className="font-medium">{journey.fare} Tk</p>
-                              {payment && (
-                                <div className="mt-1">
-                                  <PaymentBadge method={payment.method} />
-                                </div>
-                              )}
+                            <div>
+                              <p className="font-medium">{journey.route}</p>
+                              <p className="text-sm text-gray-500">{journey.date}</p>
                             </div>
                           </div>
-                        );
-                      })
+                          <div className="text-right">
+                            <p className="font-medium">{journey.fare} Tk</p>
+                            {journey.payment_method && (
+                              <div className="mt-1">
+                                <PaymentBadge method={journey.payment_method} />
+                              </div>
+                            )}
+                          </div>
+                        </div>
+                      ))
                     ) : (
                       <div className="text-center py-8 text-gray-500">
                         <p>No journey records found</p>
@@ -404,26 +376,20 @@ const Dashboard = () => {
                           </tr>
                         </thead>
                         <tbody className="bg-white divide-y divide-gray-200">
-                          {journeys.slice().reverse().slice(0, 5).map((journey) => {
-                            const payment = journey.payment 
-                              ? payments.find(p => p.id === journey.payment) 
-                              : null;
-                              
-                            return (
-                              <tr key={journey.id}>
-                                <td className="px-6 py-4 whitespace-nowrap">{journey.date}</td>
-                                <td className="px-6 py-4">{journey.route}</td>
-                                <td className="px-6 py-4 whitespace-nowrap">{journey.fare} Tk</td>
-                                <td className="px-6 py-4 whitespace-nowrap">
-                                  {payment ? (
-                                    <PaymentBadge method={payment.method} />
-                                  ) : (
-                                    <span className="text-red-500 text-sm">Unpaid</span>
-                                  )}
-                                </td>
-                              </tr>
-                            );
-                          })}
+                          {journeys.slice(0, 5).map((journey) => (
+                            <tr key={journey.id}>
+                              <td className="px-6 py-4 whitespace-nowrap">{journey.date}</td>
+                              <td className="px-6 py-4">{journey.route}</td>
+                              <td className="px-6 py-4 whitespace-nowrap">{journey.fare} Tk</td>
+                              <td className="px-6 py-4 whitespace-nowrap">
+                                {journey.payment_method ? (
+                                  <PaymentBadge method={journey.payment_method} />
+                                ) : (
+                                  <span className="text-red-500 text-sm">Unpaid</span>
+                                )}
+                              </td>
+                            </tr>
+                          ))}
                         </tbody>
                       </table>
                     </div>
@@ -455,7 +421,7 @@ const Dashboard = () => {
                           </tr>
                         </thead>
                         <tbody className="bg-white divide-y divide-gray-200">
-                          {payments.slice().reverse().slice(0, 5).map((payment) => (
+                          {payments.slice(0, 5).map((payment) => (
                             <tr key={payment.id}>
                               <td className="px-6 py-4 whitespace-nowrap">
                                 {new Date(payment.timestamp).toLocaleDateString()}
@@ -123,7 +123,7 @@ const Journeys: React.FC = () => {
             // If successful, use that data
             if (journeyResponse.ok) {
               const journeyData = await journeyResponse.json();
-              setJourneys(journeyData.map((item: any) => ({
+              setJourneys(journeyData.results.map((item: any) => ({
                 id: item.id.toString(),
                 date: item.date || new Date().toISOString(),
                 startStation: item.start_station || "Unknown",
@@ -327,6 +327,38 @@ const Journeys: React.FC = () => {
     return format(new Date(dateString), "PPP p");
   };
 
+  // Download the journeys export streamed by the server
+  const exportJourneys = async () => {
+    const token = localStorage.getItem('token');
+    const params = new URLSearchParams();
+    if (startDate) params.set('date_from', format(startDate, 'yyyy-MM-dd'));
+    if (endDate) params.set('date_to', format(endDate, 'yyyy-MM-dd'));
+    
+    try {
+      const response = await fetch(`http://localhost:8000/api/journeys/export/?${params}`, {
+        headers: {
+          'Authorization': `Token ${token}`
+        }
+      });
+      if (!response.ok) {
+        throw new Error('Export failed');
+      }
+      
+      const url = URL.createObjectURL(await response.blob());
+      const link = document.createElement("a");
+      link.setAttribute("href", url);
+      link.setAttribute("download", `journeys-${new Date().toISOString()}.csv`);
+      link.style.visibility = "hidden";
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error exporting journeys:', error);
+      toast.error("Failed to export journeys");
+    }
+  };
+
   // Export to CSV
   const exportToCSV = (data: any[], type: string) => {
     let csvContent = "";
@@ -454,7 +486,7 @@ const Journeys: React.FC = () => {
 
                       <Button
                         variant="outline"
-                        onClick={() => exportToCSV(filteredJourneys, "journeys")}
+                        onClick={exportJourneys}
                         disabled={filteredJourneys.length === 0}
                       >
                         <Download className="h-4 w-4 mr-2" />
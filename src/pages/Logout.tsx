@@ -7,6 +7,17 @@ const Logout = () => {
   const { toast } = useToast();
 
   useEffect(() => {
+    // Revoke the token on the server; local logout proceeds regardless
+    const token = localStorage.getItem("token");
+    if (token) {
+      fetch('http://localhost:8000/api/auth/logout/', {
+        method: 'POST',
+        headers: {
+          'Authorization': `Token ${token}`,
+        }
+      }).catch((error) => console.error('Error revoking token:', error));
+    }
+    
     // Clear user data from localStorage
     localStorage.removeItem("token");
     localStorage.removeItem("user");
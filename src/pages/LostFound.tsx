@@ -1,5 +1,5 @@
 
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import Layout from "@/components/layout/Layout";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
@@ -59,7 +59,19 @@ const lostItemsData = [
   },
 ];
 
-const LostFoundItem = ({ item }: { item: typeof lostItemsData[0] }) => {
+type LostItem = typeof lostItemsData[0];
+
+interface ApiLostItem {
+  id: number;
+  title: string;
+  description: string;
+  location: string;
+  image_url: string | null;
+  thumbnails: Record<string, { webp: string; jpeg: string }> | null;
+  status: string;
+}
+
+const LostFoundItem = ({ item }: { item: LostItem }) => {
   const [showDetails, setShowDetails] = useState(false);
   
   return (
@@ -154,8 +166,39 @@ const LostFoundPage = () => {
     contact: "",
   });
   const [showReportDialog, setShowReportDialog] = useState(false);
-  
-  const filteredItems = lostItemsData.filter(item => 
+  const [searchResults, setSearchResults] = useState<LostItem[] | null>(null);
+
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    // Ranked full-text search on the server, once typing pauses.
+    const timer = setTimeout(() => {
+      fetch(`http://localhost:8000/api/lost-items/?${new URLSearchParams({ q: query })}`)
+        .then((response) => response.json())
+        .then((data) =>
+          setSearchResults(
+            (data.results ?? []).map((item: ApiLostItem) => ({
+              id: String(item.id),
+              title: item.title,
+              description: item.description,
+              location: item.location,
+              // Small renditions once the upload is processed; the full photo only until then.
+              imageUrl: item.thumbnails?.medium.webp ?? item.image_url ?? "/placeholder.svg",
+              status: item.status,
+              date: "",
+            }))
+          )
+        )
+        .catch((error) => console.error("Error searching lost items:", error));
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Until the server answers (or if it can't be reached), filter the local list.
+  const filteredItems = searchResults ?? lostItemsData.filter(item => 
     item.title.toLowerCase().includes(searchTerm.toLowerCase()) || 
     item.description.toLowerCase().includes(searchTerm.toLowerCase()) ||
     item.location.toLowerCase().includes(searchTerm.toLowerCase())
@@ -2,11 +2,60 @@ import Layout from "@/components/layout/Layout";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 import { Button } from "@/components/ui/button";
-import { Clock, MapPin, Calendar, Download } from "lucide-react";
-import { useState } from "react";
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from "@/components/ui/select";
+import { Clock, MapPin, Calendar, Download, TrainFront } from "lucide-react";
+import { useEffect, useState } from "react";
+
+interface Station {
+  id: number;
+  code: string;
+  name: string;
+}
+
+interface Departure {
+  trip: string;
+  line: string;
+  headsign: string;
+  departure: string;
+  arrival_at_terminus: string;
+}
+
+const pad = (value: number) => String(value).padStart(2, "0");
 
 const Schedule = () => {
   const [activeTab, setActiveTab] = useState("weekday");
+  const [stations, setStations] = useState<Station[]>([]);
+  const [station, setStation] = useState("");
+  const [departures, setDepartures] = useState<Departure[]>([]);
+
+  useEffect(() => {
+    fetch("http://localhost:8000/api/stations/?page_size=500")
+      .then((response) => response.json())
+      .then((data) => setStations(data.results ?? []))
+      .catch((error) => console.error("Error fetching stations:", error));
+  }, []);
+
+  useEffect(() => {
+    if (!station) return;
+    // Ask in the rider's local time, which is what the timetable is written in.
+    const now = new Date();
+    const params = new URLSearchParams({
+      station,
+      after: `${pad(now.getHours())}:${pad(now.getMinutes())}`,
+      date: `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`,
+      limit: "5",
+    });
+    fetch(`http://localhost:8000/api/departures/?${params}`)
+      .then((response) => response.json())
+      .then((data) => setDepartures(data.departures ?? []))
+      .catch((error) => console.error("Error fetching departures:", error));
+  }, [station]);
 
   // Sample schedule data
   const weekdaySchedule = [
@@ -127,6 +176,40 @@ const Schedule = () => {
           </CardContent>
         </Card>
 
+        <Card className="mb-8">
+          <CardHeader>
+            <CardTitle className="flex items-center">
+              <TrainFront className="mr-2 h-5 w-5 text-metro-green" />
+              Next Trains
+            </CardTitle>
+            <CardDescription>Upcoming departures from a station</CardDescription>
+          </CardHeader>
+          <CardContent>
+            <Select value={station} onValueChange={setStation}>
+              <SelectTrigger className="w-full md:w-72">
+                <SelectValue placeholder="Choose a station" />
+              </SelectTrigger>
+              <SelectContent>
+                {stations.map((item) => (
+                  <SelectItem key={item.code} value={item.code}>{item.name}</SelectItem>
+                ))}
+              </SelectContent>
+            </Select>
+            {station && (
+              <ul className="mt-4 divide-y border rounded-md">
+                {departures.length === 0 ? (
+                  <li className="p-4 text-sm text-gray-600">No more trains today.</li>
+                ) : departures.map((item) => (
+                  <li key={item.trip} className="p-4 flex justify-between">
+                    <span className="font-medium">{item.departure.slice(0, 5)}</span>
+                    <span className="text-gray-600">towards {item.headsign}</span>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </CardContent>
+        </Card>
+
         <Card>
           <CardHeader>
             <CardTitle className="flex items-center">